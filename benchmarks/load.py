@@ -0,0 +1,186 @@
+"""
+Load test of the webhook of the recipes against stand-in servers of Bring and Mealie.
+
+The integration is started as a separate process, exactly like in production, and is pointed at the stub servers.
+Concurrent webhooks are fired at it and the latency percentiles are written as JSON:
+
+    python -m benchmarks.load --requests 500 --concurrency 20 --latency 0.05 --jitter 0.02 --error-rate 0.01
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import os
+import platform
+import signal
+import socket
+import statistics
+import subprocess  # nosec: B404
+import sys
+import time
+
+import aiohttp
+from benchmarks.payloads import create_recipe_ingredients, create_recipe_request
+from benchmarks.stub_servers import Faults, StubServers
+
+NUMBER_OF_DIFFERENT_RECIPES = 10
+STARTUP_TIMEOUT_SECONDS = 30
+
+
+def find_free_port(host: str) -> int:
+    with socket.socket() as free_socket:
+        free_socket.bind((host, 0))
+        return free_socket.getsockname()[1]
+
+
+def start_integration(
+    stub_servers: StubServers, host: str, port: int, arguments: argparse.Namespace
+) -> subprocess.Popen:
+    environment = {
+        **os.environ,
+        "LOG_LEVEL": "WARNING",
+        "HTTP_HOST": host,
+        "HTTP_PORT": str(port),
+        "HTTP_SERVER_MODE": arguments.server_mode,
+        "BRING_USERNAME": "load@example.com",
+        "BRING_PASSWORD": "load",  # nosec: B105
+        "BRING_LIST_NAME": stub_servers.bring.list_name,
+        "BRING_API_BASE_URL": stub_servers.bring_api_base_url,
+        "MEALIE_BASE_URL": stub_servers.mealie_url,
+        "MEALIE_API_KEY": "load",
+    }
+    for setting in arguments.env:
+        name, _, value = setting.partition("=")
+        environment[name] = value
+    # The logs of the integration must not end up in the JSON on stdout
+    return subprocess.Popen(  # nosec: B603
+        [sys.executable, "-m", "source.mealie_bring_api"], env=environment, stdout=sys.stderr
+    )
+
+
+async def wait_until_ready(integration: subprocess.Popen, base_url: str) -> None:
+    deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            if integration.poll() is not None:
+                raise RuntimeError(f"The integration exited with code {integration.returncode} during the startup")
+            try:
+                async with session.get(f"{base_url}/status") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientConnectionError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"The integration was not ready after {STARTUP_TIMEOUT_SECONDS}s")
+
+
+async def fire_webhooks(base_url: str, arguments: argparse.Namespace) -> tuple[list[float], dict[int, int], float]:
+    bodies = [
+        json.dumps(create_recipe_request(create_recipe_ingredients(arguments.ingredients, seed)))
+        for seed in range(NUMBER_OF_DIFFERENT_RECIPES)
+    ]
+    latencies = []
+    status_codes = collections.Counter()
+    semaphore = asyncio.Semaphore(arguments.concurrency)
+
+    async def fire(session: aiohttp.ClientSession, request_number: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                async with session.post(
+                    f"{base_url}/",
+                    data=bodies[request_number % NUMBER_OF_DIFFERENT_RECIPES],
+                    headers={"Content-Type": "application/json"},
+                ) as response:
+                    await response.read()
+                    status_codes[response.status] += 1
+            except aiohttp.ClientError:
+                status_codes[0] += 1
+            latencies.append(time.perf_counter() - start)
+
+    connector = aiohttp.TCPConnector(limit=arguments.concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(fire(session, request_number) for request_number in range(arguments.requests)))
+        duration_seconds = time.perf_counter() - start
+    return latencies, dict(status_codes), duration_seconds
+
+
+def summarize_latencies(latencies: list[float]) -> dict:
+    # The 99 cut points of the percentiles, the interpolation needs at least two values
+    percentiles = statistics.quantiles(latencies * 2 if len(latencies) == 1 else latencies, n=100, method="inclusive")
+    return {
+        "p50_seconds": percentiles[49],
+        "p95_seconds": percentiles[94],
+        "p99_seconds": percentiles[98],
+        "max_seconds": max(latencies),
+        "mean_seconds": statistics.fmean(latencies),
+    }
+
+
+def run_load_test(arguments: argparse.Namespace) -> dict:
+    stub_servers = StubServers(arguments.host)
+    stub_servers.start()
+    port = find_free_port(arguments.host)
+    base_url = f"http://{arguments.host}:{port}"
+    integration = start_integration(stub_servers, arguments.host, port, arguments)
+    try:
+        asyncio.run(wait_until_ready(integration, base_url))
+        # The faults start after the startup, a failed login would only test the startup of the integration
+        faults = Faults(arguments.latency, arguments.jitter, arguments.error_rate, arguments.rate_limit)
+        stub_servers.inject_faults(faults, faults)
+        latencies, status_codes, duration_seconds = asyncio.run(fire_webhooks(base_url, arguments))
+    finally:
+        integration.send_signal(signal.SIGTERM)
+        integration.wait(STARTUP_TIMEOUT_SECONDS)
+        stub_servers.stop()
+
+    return {
+        "python": platform.python_version(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "parameters": {
+            "requests": arguments.requests,
+            "concurrency": arguments.concurrency,
+            "ingredients": arguments.ingredients,
+            "server_mode": arguments.server_mode,
+            "env": arguments.env,
+            "faults": vars(faults),
+        },
+        "duration_seconds": duration_seconds,
+        "requests_per_second": arguments.requests / duration_seconds,
+        "latency": summarize_latencies(latencies),
+        "status_codes": status_codes,
+        "bring": stub_servers.bring.to_dict(),
+        "mealie": stub_servers.mealie.to_dict(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="Number of webhooks to send")
+    parser.add_argument("--concurrency", type=int, default=10, help="Number of webhooks in flight at the same time")
+    parser.add_argument("--ingredients", type=int, default=20, help="Number of ingredients per recipe")
+    parser.add_argument("--server-mode", choices=("flask", "async"), default="flask", help="HTTP_SERVER_MODE to use")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latency of the stub servers in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Maximum deviation from the latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests the stubs answer with 503")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Requests per second before the stubs send 429")
+    parser.add_argument(
+        "--env", action="append", default=[], metavar="NAME=VALUE", help="Additional configuration of the integration"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="The interface to bind the integration and the stubs to")
+    parser.add_argument("--output", help="The file to write the results to, defaults to stdout")
+    arguments = parser.parse_args()
+
+    report = run_load_test(arguments)
+
+    if arguments.output:
+        with open(arguments.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
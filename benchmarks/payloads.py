@@ -0,0 +1,93 @@
+import random
+import uuid
+
+FOODS = ["Apfel", "Butter", "Ei", "Mehl", "Milch", "Zucker", "Salz", "Zwiebel", "Karotte", "Tomate", "Reis", "Käse"]
+UNITS = [
+    {"name": "Gramm", "plural_name": "Gramm", "abbreviation": "g", "use_abbreviation": True},
+    {"name": "Kilogramm", "plural_name": "Kilogramm", "abbreviation": "kg", "use_abbreviation": False},
+    {"name": "Teelöffel", "plural_name": "Teelöffel", "abbreviation": "TL", "use_abbreviation": True},
+    {"name": "Stück", "plural_name": "Stücke", "abbreviation": "", "use_abbreviation": False},
+    None,
+]
+
+
+def create_recipe_ingredient(random_generator: random.Random) -> dict:
+    food_name = random_generator.choice(FOODS)
+    unit = random_generator.choice(UNITS)
+    if unit is not None:
+        unit = {**unit, "id": f"unit-{unit['name']}"}
+    return {
+        "display": food_name,
+        "food": {
+            "id": f"food-{food_name}",
+            "name": food_name,
+            "plural_name": None,
+            # Mealie sends the IDs of the households of the instance with every food
+            "households_with_ingredient_food": [],
+            "label": {
+                "name": "Vorrat",
+                "color": "#E0E0E0",
+                "id": str(uuid.UUID(int=random_generator.getrandbits(128))),
+            },
+        },
+        "note": random_generator.choice(["", "", "fein gehackt", "zimmerwarm"]),
+        "quantity": random_generator.choice([None, 0.5, 1.0, 2.0, 250.0]),
+        "unit": unit,
+        "original_text": f"{food_name} (original)",
+        "reference_id": str(uuid.UUID(int=random_generator.getrandbits(128))),
+    }
+
+
+def create_recipe_ingredients(number_of_ingredients: int, seed: int = 0) -> list[dict]:
+    random_generator = random.Random(seed)  # nosec: B311
+    return [create_recipe_ingredient(random_generator) for _ in range(number_of_ingredients)]
+
+
+def create_nested_recipe_ingredients(depth: int, width: int, seed: int = 0) -> list[dict]:
+    """A recipe with `width` ingredients that references `depth` levels of sub recipes of the same size."""
+    random_generator = random.Random(seed)  # nosec: B311
+
+    def create_level(remaining_depth: int) -> list[dict]:
+        ingredients = [create_recipe_ingredient(random_generator) for _ in range(width)]
+        if remaining_depth == 0:
+            return ingredients
+        referenced_recipe = {
+            "name": f"Sub recipe {remaining_depth}",
+            "recipe_ingredient": create_level(remaining_depth - 1),
+        }
+        return ingredients + [{"food": None, "quantity": 2.0, "referenced_recipe": referenced_recipe}]
+
+    return create_level(depth)
+
+
+def create_recipe_request(recipe_ingredients: list[dict]) -> dict:
+    """The payload of the webhook of Mealie, including the fields that are not needed to add the ingredients."""
+    return {
+        "action": {"action_type": "post", "title": "Bring"},
+        "content": {
+            "id": str(uuid.UUID(int=len(recipe_ingredients))),
+            "name": f"Benchmark recipe with {len(recipe_ingredients)} ingredients",
+            "description": "Lorem ipsum dolor sit amet " * 20,
+            "recipe_servings": 4.0,
+            "recipe_ingredient": recipe_ingredients,
+            "recipe_instructions": [{"id": str(index), "text": "Umrühren. " * 30} for index in range(20)],
+            "nutrition": {"calories": "500", "fat_content": "20", "protein_content": "15"},
+            "settings": {"public": True, "show_nutrition": False},
+            "assets": [],
+            "notes": [],
+        },
+        "recipe_scale": 1.0,
+    }
+
+
+def create_shopping_list_items(number_of_items: int, shopping_list_id: str, seed: int = 0) -> list[dict]:
+    random_generator = random.Random(seed)  # nosec: B311
+    return [
+        {
+            **create_recipe_ingredient(random_generator),
+            "id": str(uuid.UUID(int=random_generator.getrandbits(128))),
+            "shoppingListId": shopping_list_id,
+            "checked": False,
+        }
+        for _ in range(number_of_items)
+    ]
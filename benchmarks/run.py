@@ -0,0 +1,211 @@
+"""
+Benchmarks of the hot paths on synthetic Mealie payloads, the results are written as JSON.
+
+    python -m benchmarks.run --output results.json
+"""
+
+import argparse
+import copy
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from collections.abc import Callable
+
+# The log lines of every request would otherwise dominate the measurements
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from benchmarks.payloads import (  # noqa: E402
+    create_nested_recipe_ingredients,
+    create_recipe_ingredients,
+    create_recipe_request,
+    create_shopping_list_items,
+)
+from benchmarks.stub_servers import StubServers  # noqa: E402
+from source.ingredient import Ingredient  # noqa: E402
+from source.mealie_bring_api import MealieBringAPI  # noqa: E402
+
+SHOPPING_LIST_UUID = "00000000-0000-0000-0000-0000000005e1"
+
+
+def measure(
+    name: str, function: Callable[[], object], repeat: int, setup: Callable[[], object] = None, **parameters: int
+) -> dict:
+    durations = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+
+    median_seconds = statistics.median(durations)
+    result = {
+        "name": name,
+        "parameters": parameters,
+        "repeat": repeat,
+        "min_seconds": min(durations),
+        "median_seconds": median_seconds,
+        "mean_seconds": statistics.fmean(durations),
+        "per_second": 1 / median_seconds if median_seconds else None,
+    }
+    print(f"{name} {parameters}: {median_seconds * 1000:.3f}ms", file=sys.stderr)
+    return result
+
+
+def flatten_with_deepcopy(ingredients: list[dict], multiplier: float = 1.0) -> list[dict]:
+    """The flattening of referenced recipes before it used views, which copied every ingredient."""
+    result = []
+    for ingredient in ingredients:
+        if referenced_recipe := ingredient.get("referenced_recipe"):
+            result.extend(
+                flatten_with_deepcopy(referenced_recipe["recipe_ingredient"], multiplier * ingredient["quantity"])
+            )
+        else:
+            ingredient_copy = copy.deepcopy(ingredient)
+            if ingredient_copy["quantity"]:
+                ingredient_copy["quantity"] *= multiplier
+            result.append(ingredient_copy)
+    return result
+
+
+def configure_environment(stub_servers: StubServers) -> None:
+    os.environ.update(
+        {
+            "BRING_USERNAME": "benchmark@example.com",
+            "BRING_PASSWORD": "benchmark",  # nosec: B105
+            "BRING_LIST_NAME": stub_servers.bring.list_name,
+            "BRING_API_BASE_URL": stub_servers.bring_api_base_url,
+            "BRING_CACHE_FILE": "",
+            "BRING_AGGREGATION_WINDOW_SECONDS": "0",
+            "MEALIE_BASE_URL": stub_servers.mealie_url,
+            "MEALIE_API_KEY": "benchmark",
+            "MEALIE_SHOPPING_LIST_UUID": SHOPPING_LIST_UUID,
+        }
+    )
+
+
+def run_benchmarks(repeat: int) -> list[dict]:
+    stub_servers = StubServers()
+    stub_servers.start()
+    configure_environment(stub_servers)
+    mealie_bring_api = MealieBringAPI()
+    try:
+        return _run_benchmarks(mealie_bring_api, stub_servers, repeat)
+    finally:
+        mealie_bring_api._run_coroutine(mealie_bring_api.bring_handler.logout())
+        mealie_bring_api._run_coroutine(mealie_bring_api.mealie_handler.close())
+        mealie_bring_api.loop.call_soon_threadsafe(mealie_bring_api.loop.stop)
+        stub_servers.stop()
+
+
+def _run_benchmarks(mealie_bring_api: MealieBringAPI, stub_servers: StubServers, repeat: int) -> list[dict]:
+    results = []
+
+    for number_of_ingredients in (10, 100, 1000):
+        recipe_request = create_recipe_request(create_recipe_ingredients(number_of_ingredients))
+        results.append(
+            measure(
+                "process_recipe_data",
+                lambda: mealie_bring_api.process_recipe_data(recipe_request),
+                repeat,
+                ingredients=number_of_ingredients,
+            )
+        )
+
+    nested_recipe_request = create_recipe_request(create_nested_recipe_ingredients(depth=5, width=20))
+    results.append(
+        measure(
+            "process_recipe_data_nested",
+            lambda: mealie_bring_api.process_recipe_data(nested_recipe_request),
+            repeat,
+            depth=5,
+            width=20,
+        )
+    )
+
+    nested_recipe_ingredients = create_nested_recipe_ingredients(depth=5, width=20)
+    results.append(
+        measure(
+            "extract_ingredients_data_from_recipe_data",
+            lambda: mealie_bring_api._extract_ingredients_data_from_recipe_data(nested_recipe_ingredients),
+            repeat,
+            depth=5,
+            width=20,
+        )
+    )
+    results.append(
+        measure(
+            "extract_ingredients_data_with_deepcopy",
+            lambda: flatten_with_deepcopy(nested_recipe_ingredients),
+            repeat,
+            depth=5,
+            width=20,
+        )
+    )
+
+    recipe_ingredients = create_recipe_ingredients(1000)
+    results.append(
+        measure(
+            "ingredient_from_raw_data",
+            lambda: [Ingredient.from_raw_data(recipe_ingredient) for recipe_ingredient in recipe_ingredients],
+            repeat,
+            ingredients=len(recipe_ingredients),
+        )
+    )
+
+    client = mealie_bring_api.app.test_client()
+    for number_of_ingredients in (10, 100, 1000):
+        body = json.dumps(create_recipe_request(create_recipe_ingredients(number_of_ingredients)))
+        results.append(
+            measure(
+                "flask_recipe_endpoint",
+                lambda: client.post("/", data=body, content_type="application/json"),
+                repeat,
+                ingredients=number_of_ingredients,
+            )
+        )
+
+    for number_of_items in (100, 1000, 5000):
+        items = create_shopping_list_items(number_of_items, SHOPPING_LIST_UUID)
+
+        def fill_shopping_list() -> None:
+            stub_servers.mealie.items = list(items)
+
+        results.append(
+            measure(
+                "move_shopping_list",
+                mealie_bring_api._move_ingredients_from_shopping_list_to_bring,
+                repeat,
+                setup=fill_shopping_list,
+                items=number_of_items,
+            )
+        )
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20, help="How often every benchmark is run")
+    parser.add_argument("--output", help="The file to write the results to, defaults to stdout")
+    arguments = parser.parse_args()
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "results": run_benchmarks(arguments.repeat),
+    }
+
+    if arguments.output:
+        with open(arguments.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
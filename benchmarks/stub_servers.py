@@ -0,0 +1,246 @@
+import asyncio
+import json
+import random
+import threading
+import time
+import uuid
+from collections.abc import Awaitable, Callable, Coroutine
+from dataclasses import dataclass
+from typing import Any, TypeVar
+
+from aiohttp import web
+
+T = TypeVar("T")
+
+
+@dataclass
+class Faults:
+    latency_seconds: float = 0.0
+    # The latency varies uniformly by up to this many seconds in both directions
+    jitter_seconds: float = 0.0
+    error_rate: float = 0.0
+    # 0 disables the rate limit
+    requests_per_second: float = 0.0
+
+
+class FaultInjector:
+    """Delays, fails and rate limits the requests to a stub server like a real upstream under load would."""
+
+    def __init__(self, seed: int = 0):
+        self.faults = Faults()
+        self.random_generator = random.Random(seed)  # nosec: B311
+        self.tokens = 0.0
+        self.tokens_updated_at = time.monotonic()
+        self.requests = 0
+        self.injected_errors = 0
+        self.rate_limited = 0
+
+    def inject(self, faults: Faults) -> None:
+        self.faults = faults
+        self.tokens = faults.requests_per_second
+        self.tokens_updated_at = time.monotonic()
+
+    @web.middleware
+    async def middleware(
+        self, request: web.Request, handler: Callable[[web.Request], Awaitable[web.StreamResponse]]
+    ) -> web.StreamResponse:
+        self.requests += 1
+        if self._is_rate_limited():
+            self.rate_limited += 1
+            return web.Response(status=429, headers={"Retry-After": "1"})
+
+        latency = self.faults.latency_seconds + self.random_generator.uniform(
+            -self.faults.jitter_seconds, self.faults.jitter_seconds
+        )
+        if latency > 0:
+            await asyncio.sleep(latency)
+
+        if self.random_generator.random() < self.faults.error_rate:
+            self.injected_errors += 1
+            return web.Response(status=503)
+        return await handler(request)
+
+    def _is_rate_limited(self) -> bool:
+        if self.faults.requests_per_second <= 0:
+            return False
+        # Token bucket with a burst of one second worth of requests
+        now = time.monotonic()
+        self.tokens = min(
+            self.tokens + (now - self.tokens_updated_at) * self.faults.requests_per_second,
+            self.faults.requests_per_second,
+        )
+        self.tokens_updated_at = now
+        if self.tokens < 1:
+            return True
+        self.tokens -= 1
+        return False
+
+    def to_dict(self) -> dict:
+        return {"requests": self.requests, "injected_errors": self.injected_errors, "rate_limited": self.rate_limited}
+
+
+class StubBring:
+    """Answers the requests the Bring API client sends to log in, find the list and add items to it."""
+
+    def __init__(self, list_name: str = "Benchmark", list_uuid: str = "00000000-0000-0000-0000-00000000b1a5"):
+        self.list_name = list_name
+        self.list_uuid = list_uuid
+        self.user_uuid = str(uuid.uuid4())
+        self.items: dict[str, str] = {}
+        self.logins = 0
+        self.batch_updates = 0
+        self.notifications = 0
+        self.fault_injector = FaultInjector()
+
+    def create_app(self) -> web.Application:
+        app = web.Application(client_max_size=0, middlewares=[self.fault_injector.middleware])
+        app.router.add_post("/rest/v2/bringauth", self.login)
+        app.router.add_get("/rest/v2/bringusers/{user_uuid}", self.get_user_account)
+        app.router.add_get("/rest/bringusersettings/{user_uuid}", self.get_user_settings)
+        app.router.add_get("/rest/bringusers/{user_uuid}/lists", self.load_lists)
+        app.router.add_put("/rest/v2/bringlists/{list_uuid}/items", self.batch_update_list)
+        app.router.add_post("/rest/v2/bringnotifications/lists/{list_uuid}", self.notify)
+        app.router.add_get("/rest/v2/bringlists/{list_uuid}", self.get_list)
+        return app
+
+    async def login(self, _request: web.Request) -> web.Response:
+        self.logins += 1
+        return web.json_response(
+            {
+                "uuid": self.user_uuid,
+                "publicUuid": self.user_uuid,
+                "bringListUUID": self.list_uuid,
+                "access_token": "stub-access-token",  # nosec: B105
+                "refresh_token": "stub-refresh-token",  # nosec: B105
+                "token_type": "Bearer",  # nosec: B105
+                "expires_in": 86400,
+            }
+        )
+
+    async def get_user_account(self, _request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "email": "stub@example.com",
+                "emailVerified": True,
+                "premiumConfiguration": {},
+                "publicUserUuid": self.user_uuid,
+                "userLocale": {"language": "de", "country": "DE"},
+                "userUuid": self.user_uuid,
+            }
+        )
+
+    async def get_user_settings(self, _request: web.Request) -> web.Response:
+        return web.json_response({"usersettings": [], "userlistsettings": []})
+
+    async def load_lists(self, _request: web.Request) -> web.Response:
+        return web.json_response({"lists": [{"listUuid": self.list_uuid, "name": self.list_name, "theme": "home"}]})
+
+    async def batch_update_list(self, request: web.Request) -> web.Response:
+        self.batch_updates += 1
+        for change in (await request.json())["changes"]:
+            self.items[change["itemId"]] = change["spec"]
+        return web.Response()
+
+    async def notify(self, _request: web.Request) -> web.Response:
+        self.notifications += 1
+        return web.Response()
+
+    async def get_list(self, request: web.Request) -> web.Response:
+        purchase = [{"uuid": name, "itemId": name, "specification": spec} for name, spec in self.items.items()]
+        return web.json_response(
+            {
+                "uuid": request.match_info["list_uuid"],
+                "status": "REGISTERED",
+                "items": {"purchase": purchase, "recently": []},
+            }
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "logins": self.logins,
+            "batch_updates": self.batch_updates,
+            "notifications": self.notifications,
+            "items": len(self.items),
+            **self.fault_injector.to_dict(),
+        }
+
+
+class StubMealie:
+    """Serves a shopping list with the pagination of Mealie and deletes items in bulk."""
+
+    def __init__(self):
+        self.items: list[dict] = []
+        self.fault_injector = FaultInjector()
+
+    def create_app(self) -> web.Application:
+        app = web.Application(middlewares=[self.fault_injector.middleware])
+        app.router.add_get("/api/households/shopping/items", self.get_items)
+        app.router.add_delete("/api/households/shopping/items", self.delete_items)
+        return app
+
+    async def get_items(self, request: web.Request) -> web.Response:
+        per_page = int(request.query.get("perPage", -1))
+        if per_page == -1:
+            return web.Response(text=json.dumps({"items": self.items}), content_type="application/json")
+        page = int(request.query.get("page", 1))
+        body = {
+            "page": page,
+            "per_page": per_page,
+            "total_pages": max(-(-len(self.items) // per_page), 1),
+            "items": self.items[(page - 1) * per_page : page * per_page],
+        }
+        return web.Response(text=json.dumps(body), content_type="application/json")
+
+    async def delete_items(self, request: web.Request) -> web.Response:
+        ids_to_delete = set(request.query.getall("ids"))
+        self.items = [item for item in self.items if item["id"] not in ids_to_delete]
+        return web.json_response({"message": f"Deleted {len(ids_to_delete)} items"})
+
+    def to_dict(self) -> dict:
+        return {"items": len(self.items), **self.fault_injector.to_dict()}
+
+
+class StubServers:
+    """Runs the stub servers on an event loop in a thread of their own, so they do not share the loop under test."""
+
+    def __init__(self, host: str = "127.0.0.1"):
+        self.host = host
+        self.bring = StubBring()
+        self.mealie = StubMealie()
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = threading.Thread(target=self.loop.run_forever, name="StubServers", daemon=True)
+        self.runners: list[web.AppRunner] = []
+        self.bring_url = ""
+        self.mealie_url = ""
+
+    @property
+    def bring_api_base_url(self) -> str:
+        return f"{self.bring_url}/rest/"
+
+    def start(self) -> None:
+        self.loop_thread.start()
+        self.bring_url = self._run(self._start_app(self.bring.create_app()))
+        self.mealie_url = self._run(self._start_app(self.mealie.create_app()))
+
+    def inject_faults(self, bring_faults: Faults, mealie_faults: Faults) -> None:
+        self.loop.call_soon_threadsafe(self.bring.fault_injector.inject, bring_faults)
+        self.loop.call_soon_threadsafe(self.mealie.fault_injector.inject, mealie_faults)
+
+    def stop(self) -> None:
+        for runner in self.runners:
+            self._run(runner.cleanup())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.loop_thread.join()
+        self.loop.close()
+
+    async def _start_app(self, app: web.Application) -> str:
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, self.host, 0)
+        await site.start()
+        self.runners.append(runner)
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{self.host}:{port}"
+
+    def _run(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
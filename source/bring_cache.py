@@ -0,0 +1,67 @@
+import json
+import os
+import time
+
+from source.logger_mixin import LoggerMixin
+
+
+class BringCache(LoggerMixin):
+    """Stores the resolved Bring lists and the session of the last login on disk to skip the login after a restart."""
+
+    def __init__(self, path: str, ttl_seconds: float):
+        super().__init__()
+
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+
+    def load(self, username: str, list_names: list[str]) -> dict | None:
+        try:
+            with open(self.path, encoding="utf-8") as cache_file:
+                cache = json.load(cache_file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            self.log.warning(f"Ignoring the unreadable Bring cache {self.path}: {e}")
+            return None
+
+        if cache.get("username") != username or cache.get("list_names") != list_names:
+            self.log.info("The Bring cache belongs to a different user or lists, ignoring it")
+            return None
+        if time.time() - cache.get("created_at", 0) > self.ttl_seconds:
+            self.log.info("The Bring cache is expired, ignoring it")
+            return None
+        if cache.get("expires_at", 0) < time.time():
+            self.log.info("The Bring token in the cache is expired, ignoring it")
+            return None
+
+        return cache
+
+    def store(self, username: str, list_names: list[str], list_uuids: dict[str, str], session: dict) -> None:
+        cache = {
+            "created_at": time.time(),
+            "username": username,
+            "list_names": list_names,
+            "list_uuids": list_uuids,
+            **session,
+        }
+        # Several workers may store the cache at the same time
+        temporary_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            # The cache contains the access token, so only the current user may read it
+            file_descriptor = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(file_descriptor, "w", encoding="utf-8") as cache_file:
+                json.dump(cache, cache_file)
+            os.replace(temporary_path, self.path)
+        except OSError as e:
+            self.log.warning(f"Could not write the Bring cache {self.path}: {e}")
+            return
+        self.log.debug(f"Stored the Bring session and lists in {self.path}")
+
+    def invalidate(self) -> None:
+        try:
+            os.remove(self.path)
+            self.log.info("Invalidated the Bring cache")
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.log.warning(f"Could not delete the Bring cache {self.path}: {e}")
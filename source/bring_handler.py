@@ -1,60 +1,262 @@
 import asyncio
 import ssl
-import sys
+import time
+from collections.abc import Awaitable, Callable, Iterable
+from typing import TypeVar
 
 import aiohttp
 import certifi
-from bring_api import Bring, BringItemOperation, BringNotificationType
+from bring_api import (
+    Bring,
+    BringAuthException,
+    BringItemOperation,
+    BringNotificationType,
+    BringRequestException,
+)
+from source.bring_cache import BringCache
+from source.bring_rate_limiter import BringRateLimiter
 from source.environment_variable_getter import EnvironmentVariableGetter
 from source.ingredient import Ingredient
 from source.logger_mixin import LoggerMixin
+from source.metrics import (
+    BRING_BATCH_UPDATE_SECONDS,
+    BRING_FETCH_SECONDS,
+    BRING_NOTIFY_SECONDS,
+    UPSTREAM_ERRORS,
+    Histogram,
+)
+from yarl import URL
+
+# The headers the Bring API client sets on login, they identify the session
+SESSION_HEADERS = ("Authorization", "X-BRING-USER-UUID", "X-BRING-PUBLIC-USER-UUID", "X-BRING-COUNTRY")
+
+T = TypeVar("T")
 
 
 class BringHandler(LoggerMixin):
-    def __init__(self, loop: asyncio.AbstractEventLoop):
+    def __init__(self):
         super().__init__()
 
         self.bring = None
         self.session = None
-        self.list_uuid = loop.run_until_complete(self.determine_list_uuid())
+        self.username = EnvironmentVariableGetter.get("BRING_USERNAME")
+        self.list_name = EnvironmentVariableGetter.get("BRING_LIST_NAME")
+        # Allows pointing the handler at a stand-in of the Bring API, e.g. for load tests
+        self.api_base_url = EnvironmentVariableGetter.get("BRING_API_BASE_URL", "")
+        self.cache = self._create_cache()
+        # The list in BRING_LIST_NAME comes first, it is used if no other list is given
+        self.list_names = [self.list_name]
+        self.list_uuids: dict[str, str] = {}
+
+        self.skip_unchanged_items = (
+            EnvironmentVariableGetter.get("BRING_SKIP_UNCHANGED_ITEMS", "false").lower() == "true"
+        )
+        self.list_index_ttl_seconds = float(EnvironmentVariableGetter.get("BRING_LIST_INDEX_TTL_SECONDS", 30))
+        self.list_indexes: dict[str, dict[str, str]] = {}
+        self.list_indexes_loaded_at: dict[str, float] = {}
+        self.rate_limiter = self._create_rate_limiter()
+        # Concurrent requests that find the session invalid log in again only once
+        self.login_lock = asyncio.Lock()
+
+    async def connect(self, additional_list_names: Iterable[str] = ()) -> None:
+        """Log in once and resolve all lists, so every list shares the session and its connection pool."""
+        self.list_names = list(dict.fromkeys([self.list_name, *additional_list_names]))
+        self.list_uuids = await self.determine_list_uuids()
+
+    @staticmethod
+    def _create_cache() -> BringCache | None:
+        cache_file = EnvironmentVariableGetter.get("BRING_CACHE_FILE", "")
+        if not cache_file:
+            return None
+        return BringCache(cache_file, float(EnvironmentVariableGetter.get("BRING_CACHE_TTL_SECONDS", 86400)))
+
+    @staticmethod
+    def _create_rate_limiter() -> BringRateLimiter:
+        return BringRateLimiter(
+            rate_per_second=float(EnvironmentVariableGetter.get("BRING_RATE_LIMIT_PER_SECOND", 0)),
+            burst=int(EnvironmentVariableGetter.get("BRING_RATE_LIMIT_BURST", 10)),
+            max_concurrency=max(int(EnvironmentVariableGetter.get("BRING_MAX_CONCURRENCY", 10)), 1),
+            latency_target_seconds=float(EnvironmentVariableGetter.get("BRING_LATENCY_TARGET_SECONDS", 5)),
+            retries=int(EnvironmentVariableGetter.get("BRING_THROTTLE_RETRIES", 3)),
+        )
+
+    async def _create_session(self) -> None:
+        if self.session is not None:
+            await self.session.close()
 
-    async def _login(self) -> None:
         ssl_context = ssl.create_default_context(cafile=certifi.where())
         self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=ssl_context))
-        self.bring = Bring(
-            self.session,
-            EnvironmentVariableGetter.get("BRING_USERNAME"),
-            EnvironmentVariableGetter.get("BRING_PASSWORD"),
-        )
+        self.bring = Bring(self.session, self.username, EnvironmentVariableGetter.get("BRING_PASSWORD"))
+        if self.api_base_url:
+            self.bring.url = URL(self.api_base_url)
+
+    async def _login(self) -> None:
+        await self._create_session()
 
         self.log.info("Attempting the login into Bring")
         await self.bring.login()
         self.log.info("Login successful")
 
     async def logout(self) -> None:
+        if self.session is None:
+            return
         self.log.debug("Logging out from Bring")
         await self.session.close()
 
-    async def determine_list_uuid(self) -> str:
+    async def determine_list_uuids(self) -> dict[str, str]:
+        if self.cache is not None and (cache := self.cache.load(self.username, self.list_names)) is not None:
+            await self._restore_session(cache)
+            self.log.info(f"Restored the login and the lists {cache['list_uuids']} from cache")
+            return cache["list_uuids"]
+
         await self._login()
 
-        list_name = EnvironmentVariableGetter.get("BRING_LIST_NAME")
+        list_uuids = await self._find_list_uuids()
+        self._store_in_cache(list_uuids)
+        return list_uuids
+
+    async def _find_list_uuids(self) -> dict[str, str]:
+        list_uuids_by_lower_name = {
+            bring_list.name.lower(): bring_list.listUuid for bring_list in (await self.bring.load_lists()).lists
+        }
 
-        list_name_lower = list_name.lower()
-        for bring_list in (await self.bring.load_lists()).lists:
-            if bring_list.name.lower() == list_name_lower:
-                bring_list_uuid = bring_list.listUuid
-                self.log.info(f'Found the list with the name "{list_name}" (UUID: {bring_list_uuid})')
-                return bring_list_uuid
+        list_uuids = {}
+        for list_name in self.list_names:
+            if (list_uuid := list_uuids_by_lower_name.get(list_name.lower())) is None:
+                raise RuntimeError(f'Can not find a list with the name "{list_name}"')
+            self.log.info(f'Found the list with the name "{list_name}" (UUID: {list_uuid})')
+            list_uuids[list_name] = list_uuid
+        return list_uuids
 
-        self.log.critical(f'Can not find a list with the name "{list_name}"')
-        sys.exit(1)
+    def _store_in_cache(self, list_uuids: dict[str, str]) -> None:
+        if self.cache is None:
+            return
 
-    async def add_items(self, ingredients: list[Ingredient]) -> None:
-        await self.bring.batch_update_list(
-            self.list_uuid, [ingredient.to_dict() for ingredient in ingredients], BringItemOperation.ADD
+        self.cache.store(
+            self.username,
+            self.list_names,
+            list_uuids,
+            {
+                "user_uuid": self.bring.uuid,
+                "public_user_uuid": self.bring.public_uuid,
+                "headers": {header: self.bring.headers[header] for header in SESSION_HEADERS},
+                "user_locale": self.bring.user_locale,
+                "user_list_settings": self.bring.user_list_settings,
+                # The Bring API client offers no public way to access the refresh token
+                "refresh_token": self.bring._Bring__refresh_token,
+                "expires_at": self.bring._expires_at,
+            },
         )
 
-    async def notify_users_about_changes_in_list(self) -> None:
-        self.log.debug("Notifying users about changes in shopping list")
-        await self.bring.notify(self.list_uuid, BringNotificationType.CHANGED_LIST)
+    async def _restore_session(self, cache: dict) -> None:
+        await self._create_session()
+
+        self.bring.uuid = cache["user_uuid"]
+        self.bring.public_uuid = cache["public_user_uuid"]
+        self.bring.headers.update(cache["headers"])
+        self.bring.user_locale = cache["user_locale"]
+        self.bring.user_list_settings = cache["user_list_settings"]
+        self.bring._Bring__refresh_token = cache["refresh_token"]
+        # The setter of the Bring API client expects the remaining lifetime of the token
+        self.bring._expires_at = int(cache["expires_at"] - time.time())
+        # The translations are read from files shipped with the Bring API client
+        await self.bring.reload_article_translations()
+
+    async def _login_again(self, failed_bring: Bring | None = None) -> None:
+        async with self.login_lock:
+            # Another request already logged in again while this one waited, its session is used
+            if failed_bring is not None and self.bring is not failed_bring:
+                return
+            await self._replace_session()
+
+    async def _replace_session(self) -> None:
+        if self.cache is not None:
+            self.cache.invalidate()
+
+        await self._login()
+
+        self.list_uuids = await self._find_list_uuids()
+        self._store_in_cache(self.list_uuids)
+        self.list_indexes.clear()
+
+    async def _run_with_login_retry(self, request: Callable[[], Awaitable[T]]) -> T:
+        bring = self.bring
+        try:
+            return await request()
+        except (BringAuthException, BringRequestException) as e:
+            if not self._is_session_or_list_invalid(e):
+                raise
+            self.log.warning(f"Request to Bring failed ({e}), logging in again")
+            await self._login_again(bring)
+            return await request()
+
+    async def _send(self, latency: Histogram, request: Callable[[], Awaitable[T]]) -> T:
+        # Only the request itself is timed, the wait for the rate limiter has its own metric
+        async def timed_request() -> T:
+            with latency.time():
+                return await request()
+
+        try:
+            return await self.rate_limiter.run(lambda: self._run_with_login_retry(timed_request))
+        except Exception:
+            UPSTREAM_ERRORS.inc("bring")
+            raise
+
+    @staticmethod
+    def _is_session_or_list_invalid(exception: Exception) -> bool:
+        if isinstance(exception, BringAuthException):
+            return True
+        # Bring answers with 404 if the list (e.g. a cached one) does not exist anymore
+        cause = exception.__cause__
+        return isinstance(cause, aiohttp.ClientResponseError) and cause.status == 404
+
+    async def add_items(self, ingredients: list[Ingredient], list_name: str | None = None) -> bool:
+        """Add the ingredients to the list (by default the one in BRING_LIST_NAME) and return whether it changed."""
+        list_name = list_name or self.list_name
+        if self.skip_unchanged_items:
+            list_index = await self._get_list_index(list_name)
+            number_of_ingredients = len(ingredients)
+            ingredients = [
+                ingredient
+                for ingredient in ingredients
+                if list_index.get(ingredient.name) != (ingredient.specification or "")
+            ]
+            if not ingredients:
+                self.log.info(f"All {number_of_ingredients} items are already on the list, skipping the update")
+                return False
+            self.log.debug(f"Skipping {number_of_ingredients - len(ingredients)} items that are already on the list")
+
+        await self._send(
+            BRING_BATCH_UPDATE_SECONDS,
+            lambda: self.bring.batch_update_list(
+                self.list_uuids[list_name],
+                [ingredient.to_dict() for ingredient in ingredients],
+                BringItemOperation.ADD,
+            ),
+        )
+
+        if (list_index := self.list_indexes.get(list_name)) is not None:
+            list_index.update({ingredient.name: ingredient.specification or "" for ingredient in ingredients})
+        return True
+
+    async def _get_list_index(self, list_name: str) -> dict[str, str]:
+        list_index = self.list_indexes.get(list_name)
+        if (
+            list_index is not None
+            and time.monotonic() - self.list_indexes_loaded_at[list_name] < self.list_index_ttl_seconds
+        ):
+            return list_index
+
+        self.log.debug(f'Loading the items on the list "{list_name}"')
+        bring_list = await self._send(BRING_FETCH_SECONDS, lambda: self.bring.get_list(self.list_uuids[list_name]))
+        self.list_indexes[list_name] = {item.itemId: item.specification for item in bring_list.items.purchase}
+        self.list_indexes_loaded_at[list_name] = time.monotonic()
+        return self.list_indexes[list_name]
+
+    async def notify_users_about_changes_in_list(self, list_name: str | None = None) -> None:
+        list_name = list_name or self.list_name
+        self.log.debug(f'Notifying users about changes in the list "{list_name}"')
+        await self._send(
+            BRING_NOTIFY_SECONDS,
+            lambda: self.bring.notify(self.list_uuids[list_name], BringNotificationType.CHANGED_LIST),
+        )
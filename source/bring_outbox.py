@@ -0,0 +1,186 @@
+import asyncio
+import json
+import sqlite3
+import time
+from collections.abc import Awaitable, Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, TypeVar
+
+from source.ingredient import Ingredient
+from source.logger_mixin import LoggerMixin
+
+T = TypeVar("T")
+
+MAX_RETRY_SECONDS = 300
+# Columns that were added after the first version of the outbox
+MIGRATED_COLUMNS = {
+    "list_name": "TEXT",
+    "claimed_until": "REAL",
+    "attempts": "INTEGER NOT NULL DEFAULT 0",
+    "next_attempt_at": "REAL",
+    "last_error": "TEXT",
+    "dead_at": "REAL",
+}
+
+
+class BringOutbox(LoggerMixin):
+    """Journal of the ingredients that still have to be added to Bring, so they survive failures and restarts."""
+
+    def __init__(self, path: str, retry_seconds: float, claim_seconds: float = 0, max_attempts: int = 10):
+        super().__init__()
+
+        self.path = path
+        # Every entry is retried on its own, the wait doubles with every failed attempt
+        self.retry_seconds = retry_seconds
+        # An entry that failed this often is kept as dead letter and not retried anymore, 0 retries it forever
+        self.max_attempts = max_attempts
+        # When several workers share the outbox, an entry is claimed by the worker sending it for this long.
+        # 0 disables the claims, as a single process knows its entries in flight
+        self.claim_seconds = claim_seconds
+        # Autocommit, every write is a transaction of its own. The workers share the file, WAL lets them read while
+        # another one writes and the timeout is how long a write waits for the lock of another worker
+        self.connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=10)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, created_at REAL NOT NULL, ingredients TEXT NOT NULL, list_name TEXT)"
+        )
+        # Outboxes of older versions only contain entries for the list in BRING_LIST_NAME
+        columns = [column[1] for column in self.connection.execute("PRAGMA table_info(outbox)")]
+        for column, column_type in MIGRATED_COLUMNS.items():
+            if column not in columns:
+                self.connection.execute(f"ALTER TABLE outbox ADD COLUMN {column} {column_type}")
+        # Entries that are currently sent by a request must not be replayed at the same time
+        self.in_flight: set[int] = set()
+        self.failed = asyncio.Event()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="BringOutbox")
+
+    async def _run(self, function: Callable[..., T], *args: Any) -> T:
+        """
+        Run a call of the outbox in its thread, so waiting for the lock of another worker does not block the event
+        loop. The calls share one connection and the entries in flight, so they run one by one.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def append(self, ingredients: list[Ingredient], list_name: str | None = None) -> int:
+        return await self._run(self._append, ingredients, list_name)
+
+    async def mark_done(self, entry_id: int) -> None:
+        await self._run(self._delete, entry_id)
+
+    async def mark_failed(self, entry_id: int, error: Exception) -> None:
+        await self._record_failure(entry_id, error)
+        self.failed.set()
+
+    async def pending(self) -> list[tuple[int, list[Ingredient], str | None]]:
+        """The entries that still have to be added to Bring, whether their next attempt is due or not."""
+        return await self._run(self._select_pending, None)
+
+    async def _record_failure(self, entry_id: int, error: Exception) -> None:
+        attempts = await self._run(self._count_failed_attempt, entry_id, repr(error))
+        if self.max_attempts and attempts >= self.max_attempts:
+            self.log.error(
+                f"Giving up on the update of Bring {entry_id} from the outbox after {attempts} attempts, "
+                f"it is kept as dead letter: {error!r}"
+            )
+
+    def _append(self, ingredients: list[Ingredient], list_name: str | None) -> int:
+        serialized_ingredients = json.dumps([[ingredient.name, ingredient.specification] for ingredient in ingredients])
+        entry_id = self.connection.execute(
+            "INSERT INTO outbox (created_at, ingredients, list_name, claimed_until) VALUES (?, ?, ?, ?)",
+            (time.time(), serialized_ingredients, list_name, time.time() + self.claim_seconds),
+        ).lastrowid
+        self.in_flight.add(entry_id)
+        return entry_id
+
+    def _delete(self, entry_id: int) -> None:
+        self.connection.execute("DELETE FROM outbox WHERE id = ?", (entry_id,))
+        self.in_flight.discard(entry_id)
+
+    def _claim(self, entry_id: int) -> bool:
+        """False if another worker is sending the entry right now."""
+        claimed = self.connection.execute(
+            "UPDATE outbox SET claimed_until = ? WHERE id = ? AND (claimed_until IS NULL OR claimed_until <= ?)",
+            (time.time() + self.claim_seconds, entry_id, time.time()),
+        ).rowcount
+        if claimed:
+            self.in_flight.add(entry_id)
+        return bool(claimed)
+
+    def _count_failed_attempt(self, entry_id: int, error: str) -> int:
+        """Release the entry and schedule its next attempt, returns the number of failed attempts."""
+        self.in_flight.discard(entry_id)
+        row = self.connection.execute("SELECT attempts FROM outbox WHERE id = ?", (entry_id,)).fetchone()
+        if row is None:
+            return 0
+        attempts = row[0] + 1
+        now = time.time()
+        self.connection.execute(
+            "UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ?, dead_at = ?, claimed_until = NULL "
+            "WHERE id = ?",
+            (
+                attempts,
+                now + min(self.retry_seconds * 2 ** (attempts - 1), MAX_RETRY_SECONDS),
+                error,
+                now if self.max_attempts and attempts >= self.max_attempts else None,
+                entry_id,
+            ),
+        )
+        return attempts
+
+    def _select_pending(self, due_at: float | None) -> list[tuple[int, list[Ingredient], str | None]]:
+        now = time.time()
+        entries = self.connection.execute(
+            "SELECT id, ingredients, list_name FROM outbox "
+            "WHERE dead_at IS NULL AND (claimed_until IS NULL OR claimed_until <= ?) "
+            "AND (? IS NULL OR next_attempt_at IS NULL OR next_attempt_at <= ?) ORDER BY id",
+            (now, due_at, due_at),
+        ).fetchall()
+        return [
+            (entry_id, [Ingredient(name, specification) for name, specification in json.loads(ingredients)], list_name)
+            for entry_id, ingredients, list_name in entries
+            if entry_id not in self.in_flight
+        ]
+
+    def _next_attempt_at(self, replayed_at: float) -> float | None:
+        # Entries that were already due when the replay started are sent by another worker right now
+        return self.connection.execute(
+            "SELECT MIN(next_attempt_at) FROM outbox WHERE dead_at IS NULL AND next_attempt_at > ?", (replayed_at,)
+        ).fetchone()[0]
+
+    async def replay_forever(self, send: Callable[[list[Ingredient], str | None], Awaitable[Any]]) -> None:
+        while True:
+            replayed_at = time.time()
+            await self._replay(send, replayed_at)
+            # Nothing to do until a request fails, the next attempt of an entry is due, or the claims of a crashed
+            # worker expire
+            next_attempt_at = await self._run(self._next_attempt_at, replayed_at)
+            await self._wait_for_failure(None if next_attempt_at is None else next_attempt_at - time.time())
+            self.failed.clear()
+
+    async def _wait_for_failure(self, timeout: float | None) -> None:
+        timeouts = [seconds for seconds in (timeout, self.claim_seconds or None) if seconds is not None]
+        try:
+            await asyncio.wait_for(self.failed.wait(), min(timeouts, default=None))
+        except asyncio.TimeoutError:
+            pass
+
+    async def _replay(self, send: Callable[[list[Ingredient], str | None], Awaitable[Any]], due_at: float) -> None:
+        pending_entries = await self._run(self._select_pending, due_at)
+        if pending_entries:
+            self.log.info(f"Replaying {len(pending_entries)} pending updates of Bring from the outbox")
+        for entry_id, ingredients, list_name in pending_entries:
+            if not await self._run(self._claim, entry_id):
+                continue
+            try:
+                await send(ingredients, list_name)
+            except Exception as e:
+                # The other entries are still sent, this one is retried on its own once its backoff expired
+                self.log.warning(f"Could not replay the update of Bring {entry_id} from the outbox: {e!r}")
+                await self._record_failure(entry_id, e)
+                continue
+            await self.mark_done(entry_id)
+
+    def close(self) -> None:
+        self.executor.shutdown()
+        self.connection.close()
@@ -0,0 +1,172 @@
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+import aiohttp
+from source.logger_mixin import LoggerMixin
+from source.metrics import BRING_RATE_LIMITER_WAIT_SECONDS, BRING_THROTTLED
+
+T = TypeVar("T")
+
+# Bring answers with these when it is overloaded or throttles us
+THROTTLE_STATUS_CODES = (429, 500, 502, 503, 504)
+BACKOFF_SECONDS = 1
+MAX_BACKOFF_SECONDS = 60
+# A burst of failing requests that were sent at the same time only counts as one congestion signal
+DECREASE_COOLDOWN_SECONDS = 1
+
+
+def get_throttle_status(exception: BaseException) -> int | None:
+    """The status code if the request failed because Bring is overloaded or throttles us, otherwise None."""
+    cause = exception.__cause__
+    if isinstance(cause, aiohttp.ClientResponseError) and cause.status in THROTTLE_STATUS_CODES:
+        return cause.status
+    return None
+
+
+def get_retry_after_seconds(exception: BaseException) -> float | None:
+    cause = exception.__cause__
+    if not isinstance(cause, aiohttp.ClientResponseError) or not cause.headers:
+        return None
+    try:
+        return float(cause.headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+
+
+class BringRateLimiter(LoggerMixin):
+    """
+    Limits the requests to Bring with a token bucket and limits the requests in flight with an additive increase,
+    multiplicative decrease (AIMD) window: every request below the latency target widens the window, a throttled,
+    failed or slow request halves it. Callers wait for their turn instead of failing, throttled requests are retried.
+    """
+
+    def __init__(
+        self,
+        rate_per_second: float,
+        burst: int,
+        max_concurrency: int,
+        latency_target_seconds: float,
+        retries: int,
+    ):
+        super().__init__()
+
+        # A rate of 0 disables the token bucket, the window still applies
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.latency_target_seconds = latency_target_seconds
+        self.retries = retries
+
+        self.tokens = float(burst)
+        self.tokens_updated_at = time.monotonic()
+        self.concurrency_limit = float(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.paused_until = 0.0
+        self.decreased_at = 0.0
+        self.slot_released = asyncio.Condition()
+
+        self.throttled = 0
+        self.retried = 0
+
+    async def run(self, request: Callable[[], Awaitable[T]]) -> T:
+        attempt = 0
+        while True:
+            with BRING_RATE_LIMITER_WAIT_SECONDS.time():
+                await self._acquire()
+            start = time.monotonic()
+            try:
+                result = await request()
+            except Exception as e:
+                if (status := get_throttle_status(e)) is None:
+                    raise
+                self._on_throttled(status, get_retry_after_seconds(e), attempt)
+                if attempt >= self.retries:
+                    raise
+            else:
+                self._on_success(time.monotonic() - start)
+                return result
+            finally:
+                await self._release()
+
+            attempt += 1
+            self.retried += 1
+            self.log.info(f"Retrying the throttled request to Bring (attempt {attempt} of {self.retries})")
+
+    async def _acquire(self) -> None:
+        self.waiting += 1
+        acquired = False
+        try:
+            async with self.slot_released:
+                await self.slot_released.wait_for(lambda: self.in_flight < int(self.concurrency_limit))
+                self.in_flight += 1
+                acquired = True
+            # The slot is taken before the token, so a request waiting for a token does not hold back the others
+            await self._take_token()
+        except BaseException:
+            # A caller cancelled while waiting for a slot never took one
+            if acquired:
+                await self._release()
+            raise
+        finally:
+            self.waiting -= 1
+
+    async def _release(self) -> None:
+        async with self.slot_released:
+            self.in_flight -= 1
+            self.slot_released.notify_all()
+
+    async def _take_token(self) -> None:
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            if not self.rate_per_second:
+                return
+            self.tokens = min(self.tokens + (now - self.tokens_updated_at) * self.rate_per_second, self.burst)
+            self.tokens_updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate_per_second)
+
+    def _on_success(self, latency_seconds: float) -> None:
+        if latency_seconds > self.latency_target_seconds:
+            BRING_THROTTLED.inc("latency")
+            self._decrease(f"the request took {latency_seconds:.1f}s")
+            return
+        # Grows the window by one request once all requests of the current window succeeded
+        self.concurrency_limit = min(self.concurrency_limit + 1 / self.concurrency_limit, self.max_concurrency)
+
+    def _on_throttled(self, status: int, retry_after_seconds: float | None, attempt: int) -> None:
+        self.throttled += 1
+        BRING_THROTTLED.inc("rate_limited" if status == 429 else "server_error")
+        self._decrease(f"Bring answered with {status}")
+        # All requests wait, sending more would only prolong the throttling
+        pause_seconds = retry_after_seconds or min(BACKOFF_SECONDS * 2**attempt, MAX_BACKOFF_SECONDS)
+        self.paused_until = max(self.paused_until, time.monotonic() + pause_seconds)
+
+    def _decrease(self, reason: str) -> None:
+        now = time.monotonic()
+        if now - self.decreased_at < DECREASE_COOLDOWN_SECONDS:
+            return
+        self.decreased_at = now
+        self.concurrency_limit = max(self.concurrency_limit / 2, 1)
+        self.log.warning(f"Reducing the requests to Bring in flight to {int(self.concurrency_limit)} as {reason}")
+
+    def to_dict(self) -> dict:
+        return {
+            "rate_per_second": self.rate_per_second,
+            "burst": self.burst,
+            "tokens": round(self.tokens, 3) if self.rate_per_second else None,
+            "concurrency_limit": int(self.concurrency_limit),
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "paused_for_seconds": round(max(self.paused_until - time.monotonic(), 0), 3),
+            "throttled": self.throttled,
+            "retried": self.retried,
+        }
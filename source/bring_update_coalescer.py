@@ -0,0 +1,55 @@
+import asyncio
+
+from source.bring_handler import BringHandler
+from source.ingredient import Ingredient
+from source.logger_mixin import LoggerMixin
+
+
+class BringUpdateCoalescer(LoggerMixin):
+    """Merges the ingredients of requests for a list arriving within a short window into one update and notification."""
+
+    def __init__(self, bring_handler: BringHandler, window_seconds: float):
+        super().__init__()
+
+        self.bring_handler = bring_handler
+        self.window_seconds = window_seconds
+        # Keyed by the name of the Bring list, None is the list in BRING_LIST_NAME
+        self.pending: dict[str | None, list[tuple[list[Ingredient], asyncio.Future]]] = {}
+        self.flush_tasks: dict[str | None, asyncio.Task] = {}
+
+    async def add(self, ingredients: list[Ingredient], list_name: str | None = None) -> int:
+        """Wait until the ingredients are on the Bring list and return the number of requests coalesced with them."""
+        future = asyncio.get_running_loop().create_future()
+        self.pending.setdefault(list_name, []).append((ingredients, future))
+        if list_name not in self.flush_tasks:
+            self.flush_tasks[list_name] = asyncio.ensure_future(self._flush_after_window(list_name))
+        return await future
+
+    async def flush(self) -> None:
+        for list_name in list(self.pending):
+            if (flush_task := self.flush_tasks.get(list_name)) is not None:
+                flush_task.cancel()
+            await self._flush(list_name)
+
+    async def _flush_after_window(self, list_name: str | None) -> None:
+        await asyncio.sleep(self.window_seconds)
+        await self._flush(list_name)
+
+    async def _flush(self, list_name: str | None) -> None:
+        self.flush_tasks.pop(list_name, None)
+        batch = self.pending.pop(list_name, [])
+        if not batch:
+            return
+
+        ingredients = [ingredient for ingredients_of_request, _ in batch for ingredient in ingredients_of_request]
+        try:
+            if await self.bring_handler.add_items(ingredients, list_name):
+                await self.bring_handler.notify_users_about_changes_in_list(list_name)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.log.info(f"Coalesced {len(batch)} requests with {len(ingredients)} ingredients into one update of Bring")
+        for _, future in batch:
+            future.set_result(len(batch))
@@ -1,128 +1,238 @@
-from __future__ import annotations
-
-import dataclasses
-import uuid
-from typing import Optional
-
-
-@dataclasses.dataclass
-class Quantity:
-    value: Optional[float]
-    scale: float = 1.0
-
-    @property
-    def scaled_value(self) -> Optional[float]:
-        if self.value is None:
-            return None
-        return self.value * self.scale
-
-    @property
-    def is_one(self) -> bool:
-        return self.scaled_value == 1
-
-    @property
-    def formatted(self) -> str:
-        if self.scaled_value is None or self.scaled_value == 0:
-            return ""
-        # Convert to integer if it's a whole number
-        value = int(self.scaled_value) if self.scaled_value.is_integer() else self.scaled_value
-        return str(value)
-
-
-@dataclasses.dataclass
-class Ingredient:
-    name: str
-    specification: str | None = None
-
-    @staticmethod
-    def from_raw_data(raw_data: dict, recipe_scale: float = 1.0) -> Ingredient:
-        quantity = Quantity(raw_data["quantity"], recipe_scale)
-
-        return Ingredient(
-            name=Ingredient._get_name(raw_data, quantity),
-            specification=Ingredient._get_specification(raw_data, quantity),
-        )
-
-    @staticmethod
-    def _get_name(raw_data: dict, quantity: Quantity) -> str:
-        if raw_data["food"] is None:
-            return raw_data["display"].capitalize()
-
-        food = raw_data["food"]
-        plural_name = get_value_of_dict_with_different_naming_conventions(food, "plural_name")
-        if not quantity.is_one and plural_name:
-            return plural_name.capitalize()
-        return food["name"].capitalize()
-
-    @staticmethod
-    def _get_specification(raw_data: dict, quantity: Quantity) -> str:
-        specification = f"{quantity.formatted}{Ingredient._get_unit_formatted(raw_data, quantity)}"
-        note = Ingredient._get_note(raw_data)
-
-        if specification == "" and note == "":
-            return ""
-        if specification == "":
-            return note
-        if note == "":
-            return specification
-        return f"{specification} {note}"
-
-    @staticmethod
-    def _get_unit_formatted(raw_data: dict, quantity: Quantity) -> str:
-        unit_raw = raw_data["unit"]
-        if unit_raw is None:
-            return ""
-
-        use_abbreviation = get_value_of_dict_with_different_naming_conventions(unit_raw, "use_abbreviation")
-        if not quantity.is_one:
-            # The API of Mealie has different naming conventions depending on the endpoint
-            plural_abbreviation = get_value_of_dict_with_different_naming_conventions(unit_raw, "plural_abbreviation")
-            if plural_abbreviation and use_abbreviation:
-                return plural_abbreviation
-
-            plural_name = get_value_of_dict_with_different_naming_conventions(unit_raw, "plural_name")
-            if plural_name:
-                # For None quantity case, don't add a leading space if formatted is empty
-                prefix = " " if quantity.formatted else ""
-                return f"{prefix}{plural_name}"
-
-        if unit_raw.get("abbreviation") and use_abbreviation:
-            return unit_raw["abbreviation"]
-        if unit_raw.get("name"):
-            return f" {unit_raw['name']}"
-
-        return ""
-
-    @staticmethod
-    def _get_note(raw_data: dict) -> str:
-        if not raw_data["note"] or not raw_data["food"]:
-            return ""
-
-        return f"({raw_data['note']})"
-
-    @staticmethod
-    def in_household(raw_data: dict) -> bool:
-        return len(raw_data["food"].get("households_with_ingredient_food", [])) > 0
-
-    def to_dict(self) -> dict:
-        return {
-            "itemId": self.name,
-            "spec": self.specification,
-            "uuid": str(uuid.uuid4()),
-        }
-
-
-@dataclasses.dataclass
-class IngredientWithAmountsDisabled(Ingredient):
-    """Ingredient class for items where amounts are disabled."""
-
-    @staticmethod
-    def from_raw_data(raw_data: dict, _recipe_scale: float = 1.0) -> Ingredient:
-        """Create an ingredient with amounts disabled from raw data."""
-        return IngredientWithAmountsDisabled(name=raw_data["display"])
-
-
-def get_value_of_dict_with_different_naming_conventions(input_dict: dict, key: str) -> str:
-    key_parts = key.split("_")
-    key_as_camel_case = key_parts[0] + "".join(key_part.capitalize() for key_part in key_parts[1:])
-    return input_dict.get(key) or input_dict.get(key_as_camel_case)
+from __future__ import annotations
+
+import dataclasses
+import functools
+import uuid
+from collections.abc import Iterator, Mapping
+from typing import Any, Optional
+
+MAX_CACHED_UNITS = 1024
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Quantity:
+    value: Optional[float]
+    scale: float = 1.0
+    # Derived once on construction as they are read several times while formatting an ingredient
+    scaled_value: Optional[float] = dataclasses.field(init=False, compare=False)
+    is_one: bool = dataclasses.field(init=False, compare=False)
+    formatted: str = dataclasses.field(init=False, compare=False)
+
+    def __post_init__(self):
+        scaled_value = None if self.value is None else self.value * self.scale
+        object.__setattr__(self, "scaled_value", scaled_value)
+        object.__setattr__(self, "is_one", scaled_value == 1)
+        object.__setattr__(self, "formatted", self._format(scaled_value))
+
+    @staticmethod
+    def _format(scaled_value: Optional[float]) -> str:
+        if scaled_value is None or scaled_value == 0:
+            return ""
+        # Convert to integer if it's a whole number
+        value = int(scaled_value) if scaled_value.is_integer() else scaled_value
+        return str(value)
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class UnitNames:
+    """The ways a unit is rendered, resolved once per unit as the same units are used in most recipes."""
+
+    singular: str
+    plural_abbreviation: Optional[str]
+    plural_name: Optional[str]
+
+    @staticmethod
+    def of(unit_raw: dict) -> UnitNames:
+        if unit_raw.get("id") is None:
+            return UnitNames.from_raw_data(unit_raw)
+
+        # A unit that was renamed in Mealie (or switched to its abbreviation) is resolved again
+        cache_key = (
+            unit_raw["id"],
+            unit_raw.get("name"),
+            unit_raw.get("abbreviation"),
+            get_value_of_dict_with_different_naming_conventions(unit_raw, "plural_name"),
+            get_value_of_dict_with_different_naming_conventions(unit_raw, "plural_abbreviation"),
+            get_value_of_dict_with_different_naming_conventions(unit_raw, "use_abbreviation"),
+        )
+        unit_names = _cached_unit_names.get(cache_key)
+        if unit_names is None:
+            if len(_cached_unit_names) >= MAX_CACHED_UNITS:
+                _cached_unit_names.clear()
+            unit_names = _cached_unit_names[cache_key] = UnitNames.from_raw_data(unit_raw)
+        return unit_names
+
+    @staticmethod
+    def from_raw_data(unit_raw: dict) -> UnitNames:
+        use_abbreviation = get_value_of_dict_with_different_naming_conventions(unit_raw, "use_abbreviation")
+
+        if unit_raw.get("abbreviation") and use_abbreviation:
+            singular = unit_raw["abbreviation"]
+        elif unit_raw.get("name"):
+            singular = f" {unit_raw['name']}"
+        else:
+            singular = ""
+
+        # The API of Mealie has different naming conventions depending on the endpoint
+        plural_abbreviation = get_value_of_dict_with_different_naming_conventions(unit_raw, "plural_abbreviation")
+        return UnitNames(
+            singular=singular,
+            plural_abbreviation=plural_abbreviation if use_abbreviation else None,
+            plural_name=get_value_of_dict_with_different_naming_conventions(unit_raw, "plural_name"),
+        )
+
+    def formatted(self, quantity: Quantity) -> str:
+        if quantity.is_one:
+            return self.singular
+        if self.plural_abbreviation:
+            return self.plural_abbreviation
+        if self.plural_name:
+            # For None quantity case, don't add a leading space if formatted is empty
+            prefix = " " if quantity.formatted else ""
+            return f"{prefix}{self.plural_name}"
+        return self.singular
+
+
+_cached_unit_names: dict[tuple, UnitNames] = {}
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Ingredient:
+    name: str
+    specification: str | None = None
+
+    @staticmethod
+    def from_raw_data(raw_data: dict, recipe_scale: float = 1.0) -> Ingredient:
+        quantity = Quantity(raw_data["quantity"], recipe_scale)
+
+        return Ingredient(
+            name=Ingredient._get_name(raw_data, quantity),
+            specification=Ingredient._get_specification(raw_data, quantity),
+        )
+
+    @staticmethod
+    def _get_name(raw_data: dict, quantity: Quantity) -> str:
+        if raw_data["food"] is None:
+            return raw_data["display"].capitalize()
+
+        food = raw_data["food"]
+        plural_name = get_value_of_dict_with_different_naming_conventions(food, "plural_name")
+        if not quantity.is_one and plural_name:
+            return plural_name.capitalize()
+        return food["name"].capitalize()
+
+    @staticmethod
+    def _get_specification(raw_data: dict, quantity: Quantity) -> str:
+        specification = f"{quantity.formatted}{Ingredient._get_unit_formatted(raw_data, quantity)}"
+        note = Ingredient._get_note(raw_data)
+
+        if specification == "" and note == "":
+            return ""
+        if specification == "":
+            return note
+        if note == "":
+            return specification
+        return f"{specification} {note}"
+
+    @staticmethod
+    def _get_unit_formatted(raw_data: dict, quantity: Quantity) -> str:
+        unit_raw = raw_data["unit"]
+        if unit_raw is None:
+            return ""
+
+        return UnitNames.of(unit_raw).formatted(quantity)
+
+    @staticmethod
+    def _get_note(raw_data: dict) -> str:
+        if not raw_data["note"] or not raw_data["food"]:
+            return ""
+
+        return f"({raw_data['note']})"
+
+    @staticmethod
+    def in_household(raw_data: dict) -> bool:
+        return len(raw_data["food"].get("households_with_ingredient_food", [])) > 0
+
+    def to_dict(self) -> dict:
+        return {
+            "itemId": self.name,
+            "spec": self.specification,
+            "uuid": str(uuid.uuid4()),
+        }
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class IngredientWithAmountsDisabled(Ingredient):
+    """Ingredient class for items where amounts are disabled."""
+
+    @staticmethod
+    def from_raw_data(raw_data: dict, _recipe_scale: float = 1.0) -> Ingredient:
+        """Create an ingredient with amounts disabled from raw data."""
+        return IngredientWithAmountsDisabled(name=raw_data["display"])
+
+
+class ScaledIngredientData(Mapping):
+    """Read-only view of the raw data of an ingredient of a referenced recipe with its quantity multiplied."""
+
+    __slots__ = ("raw_data", "multiplier")
+
+    def __init__(self, raw_data: Mapping, multiplier: float):
+        self.raw_data = raw_data
+        self.multiplier = multiplier
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.raw_data[key]
+        if key == "quantity" and value:
+            return value * self.multiplier
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.raw_data)
+
+    def __len__(self) -> int:
+        return len(self.raw_data)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.raw_data!r}, multiplier={self.multiplier})"
+
+
+def merge_duplicate_ingredients(raw_ingredients: list[Mapping]) -> list[Mapping]:
+    """Sum up the quantities of ingredients with the same food and unit, so Bring gets one item with the total."""
+    merged_ingredients: dict[tuple, Mapping] = {}
+    for raw_data in raw_ingredients:
+        if raw_data["food"] is None:
+            # Without a food there is nothing to reliably compare, so the ingredient is kept as it is
+            merged_ingredients[(id(raw_data),)] = raw_data
+            continue
+
+        unit_name = raw_data["unit"]["name"].lower() if raw_data["unit"] else None
+        key = (raw_data["food"]["name"].lower(), unit_name)
+        if key not in merged_ingredients:
+            merged_ingredients[key] = raw_data
+            continue
+
+        merged_ingredient = merged_ingredients[key]
+        notes = [note for note in (merged_ingredient["note"], raw_data["note"]) if note]
+        merged_ingredients[key] = {
+            **merged_ingredient,
+            "quantity": _sum_quantities(merged_ingredient["quantity"], raw_data["quantity"]),
+            "note": ", ".join(dict.fromkeys(notes)),
+        }
+
+    return list(merged_ingredients.values())
+
+
+def _sum_quantities(first: Optional[float], second: Optional[float]) -> Optional[float]:
+    if first is None and second is None:
+        return None
+    return (first or 0) + (second or 0)
+
+
+def get_value_of_dict_with_different_naming_conventions(input_dict: dict, key: str) -> str:
+    return input_dict.get(key) or input_dict.get(_to_camel_case(key))
+
+
+@functools.cache
+def _to_camel_case(key: str) -> str:
+    key_parts = key.split("_")
+    return key_parts[0] + "".join(key_part.capitalize() for key_part in key_parts[1:])
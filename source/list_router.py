@@ -0,0 +1,46 @@
+import json
+
+from source.environment_variable_getter import EnvironmentVariableGetter
+from source.logger_mixin import LoggerMixin
+
+
+def load_routes(name_of_variable: str) -> dict[str, str]:
+    routes = EnvironmentVariableGetter.get(name_of_variable, "{}")
+    try:
+        routes = json.loads(routes)
+    except ValueError as e:
+        raise RuntimeError(f'The environment variable "{name_of_variable}" is not valid JSON: {e}') from None
+    if not isinstance(routes, dict) or not all(isinstance(value, str) for value in routes.values()):
+        raise RuntimeError(f'The environment variable "{name_of_variable}" must map names to names of Bring lists')
+    return routes
+
+
+class ListRouter(LoggerMixin):
+    """
+    Maps the webhooks of recipes and the shopping lists of Mealie to the Bring lists their ingredients are added to.
+    None stands for the list in BRING_LIST_NAME.
+    """
+
+    def __init__(self):
+        super().__init__()
+
+        self.recipe_routes = load_routes("BRING_LIST_ROUTES")
+        self.shopping_list_routes = load_routes("MEALIE_SHOPPING_LIST_ROUTES")
+        for route, list_name in self.recipe_routes.items():
+            self.log.info(f'Adding the ingredients of recipes sent to "?list={route}" to the list "{list_name}"')
+        for shopping_list_uuid, list_name in self.shopping_list_routes.items():
+            self.log.info(f'Moving the items of the shopping list {shopping_list_uuid} to the list "{list_name}"')
+
+    @property
+    def list_names(self) -> list[str]:
+        """The names of all Bring lists that can be routed to, except the default list."""
+        return list(dict.fromkeys([*self.recipe_routes.values(), *self.shopping_list_routes.values()]))
+
+    def list_for_recipe(self, route: str | None) -> str | None:
+        """Raises a KeyError if the route is not configured."""
+        if not route:
+            return None
+        return self.recipe_routes[route]
+
+    def list_for_shopping_list(self, shopping_list_uuid: str | None) -> str | None:
+        return self.shopping_list_routes.get(shopping_list_uuid)
@@ -1,20 +1,53 @@
 import asyncio
-import copy
+import json
 import logging
+import os
 import signal
 import sys
 import threading
+import time
+from collections.abc import Awaitable, Callable, Coroutine, Mapping
+from concurrent.futures import ThreadPoolExecutor
 from types import FrameType
-from typing import Union
+from typing import Any, TypeVar, Union
 
+from aiohttp import web
 from flask import Blueprint, Flask, request
 from source.bring_handler import BringHandler
+from source.bring_outbox import BringOutbox
+from source.bring_update_coalescer import BringUpdateCoalescer
 from source.environment_variable_getter import EnvironmentVariableGetter
-from source.ingredient import Ingredient, IngredientWithAmountsDisabled
+from source.ingredient import (
+    Ingredient,
+    IngredientWithAmountsDisabled,
+    ScaledIngredientData,
+    merge_duplicate_ingredients,
+)
+from source.list_router import ListRouter
 from source.logger_mixin import LoggerMixin
 from source.mealie_handler import MealieHandler
-
-MOVE_INGREDIENTS_DEBOUNCE_SECONDS = 2
+from source.metrics import (
+    CONTENT_TYPE,
+    DEBOUNCE_WAIT_SECONDS,
+    EVENT_LOOP_WAIT_SECONDS,
+    INGREDIENTS_PER_REQUEST,
+    MOVE_DEBOUNCE_EVENTS,
+    RECIPE_PARSE_SECONDS,
+    render_metrics,
+)
+from source.recipe_payload import extract_recipe_data
+from source.recipe_queue import RecipeQueue
+from source.startup_tracker import STATUS_READY, StartupTracker
+from source.worker_state import WorkerState
+from source.worker_supervisor import WorkerSupervisor
+
+MOVE_LEASE_SECONDS = 300
+MOVE_LEASE_POLL_SECONDS = 0.5
+OUTBOX_CLAIM_SECONDS = 60
+SERVER_MODES = ("flask", "async")
+STARTUP_MODES = ("blocking", "lazy")
+
+T = TypeVar("T")
 
 
 class MealieBringAPI:
@@ -22,25 +55,76 @@ class MealieBringAPI:
         self.host = EnvironmentVariableGetter.get("HTTP_HOST", "0.0.0.0")  # nosec: B104
         self.port = int(EnvironmentVariableGetter.get("HTTP_PORT", 8742))
         self.basepath = EnvironmentVariableGetter.get("HTTP_BASE_PATH", "")
+        self.max_body_size = int(EnvironmentVariableGetter.get("HTTP_MAX_BODY_SIZE", 5 * 1024 * 1024))
+
+        # Set by the WorkerSupervisor if HTTP_WORKERS is greater than 1
+        self.worker_id = EnvironmentVariableGetter.get("HTTP_WORKER_ID", "")
 
         self.logger = self._create_logger()
+        self.server_mode = self._get_mode("HTTP_SERVER_MODE", SERVER_MODES)
+        self.startup_mode = self._get_mode("STARTUP_MODE", STARTUP_MODES)
+        self.worker_state = self._create_worker_state()
+        self.worker_state_executor: ThreadPoolExecutor | None = None
+
         self.loop = self._create_event_loop()
-        self.loop_lock = threading.Lock()
-        self.bring_handler = self._create_bring_handler(self.loop)
+        self.list_router = ListRouter()
+        self.bring_handler = self._create_bring_handler()
         self.mealie_handler = MealieHandler()
-        self.move_debounce_lock = threading.Lock()
-        self.move_debounce_timer: threading.Timer | None = None
+        self.bring_update_coalescer = BringUpdateCoalescer(
+            self.bring_handler, float(EnvironmentVariableGetter.get("BRING_AGGREGATION_WINDOW_SECONDS", 0))
+        )
+        self.recipe_queue = self._create_recipe_queue()
+        self.bring_outbox = self._create_bring_outbox()
+        self.outbox_replay_task: asyncio.Task | None = None
+        self.startup_tracker = StartupTracker()
+        self.startup_tracker.register("Bring")
+        if self.mealie_handler.mealie_is_setup:
+            self.startup_tracker.register("Mealie")
+        self.startup_retry_seconds = float(EnvironmentVariableGetter.get("STARTUP_RETRY_SECONDS", 5))
+        self.handshake_retry_tasks: list[asyncio.Task] = []
+        self.pending_moves_resumed = False
+        self.move_debounce_seconds = float(EnvironmentVariableGetter.get("MOVE_INGREDIENTS_DEBOUNCE_SECONDS", 2))
+        self.move_max_wait_seconds = float(EnvironmentVariableGetter.get("MOVE_INGREDIENTS_MAX_WAIT_SECONDS", 30))
+        # Keyed by the UUID of the shopping list that changed, None stands for all shopping lists.
+        # The timers live on the event loop and are only touched from there, so they need no lock
+        self.move_debounce_timers: dict[str | None, asyncio.TimerHandle] = {}
+        self.move_debounce_started_at: dict[str | None, float] = {}
+        self.debounced_moves: set[asyncio.Task] = set()
+        self.move_schedulings: set[asyncio.Task] = set()
+        self.running_moves: set[str | None] = set()
+        self.moves_changed = asyncio.Condition()
         self.app = self._create_app()
+        self.async_app_runner: web.AppRunner | None = None
+        # The loop runs for the whole lifetime of the process, so all requests share one Bring session
+        self.loop_thread = self._start_event_loop_thread(self.loop)
+        if self.recipe_queue is not None:
+            self._run_coroutine(self.recipe_queue.start())
+
+        if self.startup_mode == "lazy":
+            # The webserver binds right away, the handshakes are finished in the background
+            asyncio.run_coroutine_threadsafe(self._connect_handlers(), self.loop)
+        else:
+            self._run_coroutine(self._connect_handlers())
+            if self.startup_tracker.status != STATUS_READY:
+                sys.exit(1)
 
         signal.signal(signal.SIGTERM, self._handle_stop_signal)
         signal.signal(signal.SIGINT, self._handle_stop_signal)
 
-    @staticmethod
-    def _create_logger() -> LoggerMixin:
+    def _create_logger(self) -> LoggerMixin:
         logger = LoggerMixin()
-        logger.log = logging.getLogger("Main")
+        logger.log = logging.getLogger(f"Worker {self.worker_id}" if self.worker_id else "Main")
         return logger
 
+    def _get_mode(self, name_of_variable: str, modes: tuple[str, ...]) -> str:
+        mode = EnvironmentVariableGetter.get(name_of_variable, modes[0]).lower()
+        if mode not in modes:
+            self.logger.log.critical(
+                f'Unknown value "{mode}" for {name_of_variable}, must be one of {", ".join(modes)}'
+            )
+            sys.exit(1)
+        return mode
+
     @staticmethod
     def _create_event_loop() -> asyncio.AbstractEventLoop:
         loop = asyncio.new_event_loop()
@@ -48,39 +132,245 @@ class MealieBringAPI:
         return loop
 
     @staticmethod
-    def _create_bring_handler(loop: asyncio.AbstractEventLoop) -> BringHandler:
-        return BringHandler(loop)
+    def _start_event_loop_thread(loop: asyncio.AbstractEventLoop) -> threading.Thread:
+        loop_thread = threading.Thread(target=loop.run_forever, name="EventLoop", daemon=True)
+        loop_thread.start()
+        return loop_thread
+
+    @staticmethod
+    def _create_bring_handler() -> BringHandler:
+        return BringHandler()
+
+    def _create_recipe_queue(self) -> RecipeQueue | None:
+        max_size = int(EnvironmentVariableGetter.get("RECIPE_QUEUE_SIZE", 0))
+        if max_size <= 0:
+            return None
+        return RecipeQueue(
+            self._add_ingredients_to_bring_async,
+            max_size,
+            int(EnvironmentVariableGetter.get("RECIPE_QUEUE_WORKERS", 2)),
+        )
+
+    def _create_bring_outbox(self) -> BringOutbox | None:
+        outbox_file = EnvironmentVariableGetter.get("BRING_OUTBOX_FILE", "")
+        if not outbox_file:
+            return None
+        return BringOutbox(
+            outbox_file,
+            float(EnvironmentVariableGetter.get("BRING_OUTBOX_RETRY_SECONDS", 5)),
+            # All workers share the outbox, so every entry is replayed by one of them
+            OUTBOX_CLAIM_SECONDS if self.worker_id else 0,
+            int(EnvironmentVariableGetter.get("BRING_OUTBOX_MAX_ATTEMPTS", 10)),
+        )
+
+    def _create_worker_state(self) -> WorkerState | None:
+        if not self.worker_id:
+            return None
+        return WorkerState(EnvironmentVariableGetter.get("WORKER_STATE_FILE"), f"{self.worker_id}-{os.getpid()}")
+
+    async def _connect_handlers(self) -> None:
+        # All Bring lists share one login
+        handshakes: dict[str, Callable[[], Awaitable[None]]] = {
+            "Bring": lambda: self.bring_handler.connect(self.list_router.list_names)
+        }
+        if self.mealie_handler.mealie_is_setup:
+            handshakes["Mealie"] = self.mealie_handler.connect
+        await asyncio.gather(*(self.startup_tracker.run(name, connect()) for name, connect in handshakes.items()))
+        self.logger.log.info(f"Startup finished, status is {self.startup_tracker.status}")
+        await self._start_connected_tasks()
+
+        if self.startup_mode == "lazy":
+            # The webserver is already running, so a failed handshake is retried instead of exiting
+            self.handshake_retry_tasks = [
+                asyncio.ensure_future(self._retry_handshake(name, connect))
+                for name, connect in handshakes.items()
+                if not self.startup_tracker.is_successful(name)
+            ]
+
+    async def _retry_handshake(self, name: str, connect: Callable[[], Awaitable[None]]) -> None:
+        await self.startup_tracker.retry(name, connect, self.startup_retry_seconds)
+        self.logger.log.info(f"Connected to {name}, status is {self.startup_tracker.status}")
+        await self._start_connected_tasks()
+
+    async def _start_connected_tasks(self) -> None:
+        """Start what needs the connections, runs again after every handshake that succeeded on a retry."""
+        if (
+            self.bring_outbox is not None
+            and self.outbox_replay_task is None
+            and self.startup_tracker.is_successful("Bring")
+        ):
+            # Replays what could not be added before the last shutdown and retries what fails from now on
+            self.outbox_replay_task = asyncio.ensure_future(
+                self.bring_outbox.replay_forever(self.bring_update_coalescer.add)
+            )
+
+        if (
+            self.worker_state is not None
+            and not self.pending_moves_resumed
+            and all(self.startup_tracker.is_successful(name) for name in ("Bring", "Mealie"))
+        ):
+            self.pending_moves_resumed = True
+            # Takes over the moves of a crashed worker, the moves of the other workers are only claimed once
+            for shopping_list_uuid, delay in (await self._run_in_worker_state(self.worker_state.pending_moves)).items():
+                self._start_move_debounce_timer(shopping_list_uuid, delay)
 
     def _create_app(self) -> Flask:
         base_bp = Blueprint("base_bp", __name__, url_prefix=self.basepath)
 
         @base_bp.route("/", methods=["POST"])
-        def copy_ingredients_from_recipe_to_bring() -> str:
-            data = request.get_json(force=True)
-            self.logger.log.info(f'Received recipe "{data["content"]["name"]}" from "{request.remote_addr}"')
+        def copy_ingredients_from_recipe_to_bring() -> tuple[str, int]:
+            if not self.startup_tracker.is_successful("Bring"):
+                return self._handle_not_connected("Bring")
 
-            self._add_ingredients_to_bring(self.process_recipe_data(data))
+            route = request.args.get("list")
+            try:
+                list_name = self.list_router.list_for_recipe(route)
+            except KeyError:
+                return self._handle_unknown_route(route)
 
-            return "OK"
+            try:
+                ingredients = self._parse_recipe_request(request.get_data(as_text=True), request.remote_addr)
+            except ValueError as e:
+                return self._handle_invalid_recipe_request(e)
 
-        @base_bp.route("/move-ingredients-from-shopping-list", methods=["POST"])
-        def move_ingredients_from_shopping_list_to_bring() -> str | tuple[str, int]:
-            if not self.mealie_handler.mealie_is_setup:
-                self.logger.log.warning("Mealie is not setup! See the logs above for more information.")
-                return "", 400
+            return self._run_coroutine(self._handle_recipe_async(ingredients, list_name))
 
-            self._schedule_move_ingredients_from_shopping_list()
-
-            return "OK"
+        @base_bp.route("/move-ingredients-from-shopping-list", methods=["POST"])
+        def move_ingredients_from_shopping_list_to_bring() -> tuple[str, int]:
+            return self._handle_move_ingredients_request(request.get_data(as_text=True))
 
         @base_bp.route("/status", methods=["GET"])
-        def status_handler() -> str:
-            self.logger.log.debug("Got a status request")
-            return "OK"
+        def status_handler() -> tuple[dict, int]:
+            return self._handle_status_request()
+
+        @base_bp.route("/metrics", methods=["GET"])
+        def metrics_handler() -> tuple[str, int, dict]:
+            return render_metrics(), 200, {"Content-Type": CONTENT_TYPE}
 
+        # Larger requests are answered with 413 before their body is read
+        app.config["MAX_CONTENT_LENGTH"] = self.max_body_size
         app.register_blueprint(base_bp)
         return app
 
+    def _create_async_app(self) -> web.Application:
+        async def copy_ingredients_from_recipe_to_bring(request: web.Request) -> web.Response:
+            if not self.startup_tracker.is_successful("Bring"):
+                body, status = self._handle_not_connected("Bring")
+                return web.Response(text=body, status=status)
+
+            route = request.query.get("list")
+            try:
+                list_name = self.list_router.list_for_recipe(route)
+            except KeyError:
+                body, status = self._handle_unknown_route(route)
+                return web.Response(text=body, status=status)
+
+            try:
+                ingredients = self._parse_recipe_request(await request.text(), request.remote)
+            except ValueError as e:
+                body, status = self._handle_invalid_recipe_request(e)
+                return web.Response(text=body, status=status)
+
+            body, status = await self._handle_recipe_async(ingredients, list_name)
+            return web.Response(text=body, status=status)
+
+        async def move_ingredients_from_shopping_list_to_bring(request: web.Request) -> web.Response:
+            body, status = self._handle_move_ingredients_request(await request.text())
+            return web.Response(text=body, status=status)
+
+        async def status_handler(_request: web.Request) -> web.Response:
+            body, status = self._handle_status_request()
+            return web.json_response(body, status=status)
+
+        async def metrics_handler(_request: web.Request) -> web.Response:
+            return web.Response(text=render_metrics(), headers={"Content-Type": CONTENT_TYPE})
+
+        async_app = web.Application(client_max_size=self.max_body_size)
+        async_app.router.add_post(f"{self.basepath}/", copy_ingredients_from_recipe_to_bring)
+        async_app.router.add_post(
+            f"{self.basepath}/move-ingredients-from-shopping-list", move_ingredients_from_shopping_list_to_bring
+        )
+        async_app.router.add_get(f"{self.basepath}/status", status_handler)
+        async_app.router.add_get(f"{self.basepath}/metrics", metrics_handler)
+        return async_app
+
+    def _parse_recipe_request(self, body: str, remote_address: str | None) -> list[Ingredient]:
+        # The recipe is decoded completely and filtered to the needed fields, its size is limited by HTTP_MAX_BODY_SIZE
+        with RECIPE_PARSE_SECONDS.time():
+            data = extract_recipe_data(body)
+            self.logger.log.info(f'Received recipe "{data["content"]["name"]}" from "{remote_address}"')
+            ingredients = self.process_recipe_data(data)
+        INGREDIENTS_PER_REQUEST.observe(len(ingredients))
+        return ingredients
+
+    async def _handle_recipe_async(self, ingredients: list[Ingredient], list_name: str | None) -> tuple[str, int]:
+        if self.recipe_queue is None:
+            await self._add_ingredients_to_bring_async(ingredients, list_name)
+            return "OK", 200
+
+        # Mealie does not have to wait for Bring, the ingredients are added by the workers of the queue. They are
+        # stored in the outbox first, so accepted recipes are not lost if we crash before a worker takes them
+        outbox_entry_id = None
+        if self.bring_outbox is not None and ingredients:
+            outbox_entry_id = await self.bring_outbox.append(ingredients, list_name)
+        if not await self.recipe_queue.submit(ingredients, list_name, outbox_entry_id):
+            if outbox_entry_id is not None:
+                await self.bring_outbox.mark_done(outbox_entry_id)
+            return "Too many recipes are waiting to be added to Bring", 429
+        return "Accepted", 202
+
+    def _handle_unknown_route(self, route: str) -> tuple[str, int]:
+        self.logger.log.warning(f'Received a recipe for the unknown list "{route}", see BRING_LIST_ROUTES')
+        return f'Unknown list "{route}"', 404
+
+    def _handle_invalid_recipe_request(self, error: ValueError) -> tuple[str, int]:
+        self.logger.log.warning(f"Received a recipe that is not valid JSON: {error}")
+        return "Invalid JSON", 400
+
+    def _handle_move_ingredients_request(self, body: str = "") -> tuple[str, int]:
+        if not self.mealie_handler.mealie_is_setup:
+            self.logger.log.warning("Mealie is not setup! See the logs above for more information.")
+            return "", 400
+        for name in ("Bring", "Mealie"):
+            if not self.startup_tracker.is_successful(name):
+                return self._handle_not_connected(name)
+
+        shopping_list_uuid = self._get_changed_shopping_list_uuid(body)
+        if shopping_list_uuid is not None and not self.mealie_handler.handles_shopping_list(shopping_list_uuid):
+            self.logger.log.debug(f"Ignoring the change of the shopping list {shopping_list_uuid}")
+            return "OK", 200
+
+        self._schedule_move_ingredients_from_shopping_list(shopping_list_uuid)
+
+        return "OK", 200
+
+    @staticmethod
+    def _get_changed_shopping_list_uuid(body: str) -> str | None:
+        """
+        The notifier of Mealie sends the changed shopping list in "document_data".
+        None stands for all shopping lists, e.g. when the move is triggered manually.
+        """
+        try:
+            document_data = json.loads(body)["document_data"]
+            if isinstance(document_data, str):
+                document_data = json.loads(document_data)
+            return document_data.get("shopping_list_id") or None
+        except (ValueError, TypeError, KeyError, AttributeError):
+            return None
+
+    def _handle_not_connected(self, name: str) -> tuple[str, int]:
+        self.logger.log.warning(f"Rejecting request as the connection to {name} is {self.startup_tracker.status}")
+        return f"The connection to {name} is not established", 503
+
+    def _handle_status_request(self) -> tuple[dict, int]:
+        self.logger.log.debug("Got a status request")
+        # A degraded instance can still serve some requests, but it is unavailable until all handshakes succeeded
+        status = self.startup_tracker.to_dict()
+        if self.recipe_queue is not None:
+            status["queue"] = self.recipe_queue.to_dict()
+        status["bring_rate_limiter"] = self.bring_handler.rate_limiter.to_dict()
+        return status, 200 if self.startup_tracker.status == STATUS_READY else 503
+
     def process_recipe_data(self, data: dict) -> list[Union[Ingredient, IngredientWithAmountsDisabled]]:
         # was deprecated in https://github.com/mealie-recipes/mealie/pull/5684
         enable_amount = not data["content"]["settings"].get("disable_amount", False)
@@ -95,6 +385,8 @@ class MealieBringAPI:
         self.logger.log.debug(f"Recipe scale is {recipe_scale}")
 
         unparsed_ingredients = self._extract_ingredients_data_from_recipe_data(data["content"]["recipe_ingredient"])
+        if enable_amount:
+            unparsed_ingredients = self._merge_duplicate_ingredients(unparsed_ingredients)
 
         parsed_ingredients_to_add = []
         for ingredient_raw_data in unparsed_ingredients:
@@ -117,8 +409,17 @@ class MealieBringAPI:
 
         return parsed_ingredients_to_add
 
-    def _extract_ingredients_data_from_recipe_data(self, recipe_ingredients: list[dict]) -> list[dict]:
-        def flatten(ingredients: list[dict], multiplier: float) -> list[dict]:
+    def _merge_duplicate_ingredients(self, unparsed_ingredients: list[Mapping]) -> list[Mapping]:
+        merged_ingredients = merge_duplicate_ingredients(unparsed_ingredients)
+        if len(merged_ingredients) < len(unparsed_ingredients):
+            self.logger.log.debug(
+                f"Merged {len(unparsed_ingredients)} ingredients with the same food and unit into "
+                f"{len(merged_ingredients)} ingredients"
+            )
+        return merged_ingredients
+
+    def _extract_ingredients_data_from_recipe_data(self, recipe_ingredients: list[dict]) -> list[Mapping]:
+        def flatten(ingredients: list[dict], multiplier: float) -> list[Mapping]:
             result = []
             for ingredient in ingredients:
 
@@ -127,71 +428,270 @@ class MealieBringAPI:
                     result.extend(
                         flatten(referenced_recipe["recipe_ingredient"], multiplier * ingredient.get("quantity", 1.0))
                     )
+                elif multiplier == 1.0:
+                    result.append(ingredient)
                 else:
-                    ingredient_copy = copy.deepcopy(ingredient)
-                    if ingredient_copy["quantity"]:
-                        ingredient_copy["quantity"] *= multiplier
-                    result.append(ingredient_copy)
+                    # Copying the nested food and unit of every ingredient is expensive, so only a view is created
+                    result.append(ScaledIngredientData(ingredient, multiplier))
             return result
 
         return flatten(recipe_ingredients, 1.0)
 
-    def _schedule_move_ingredients_from_shopping_list(self) -> None:
-        with self.move_debounce_lock:
-            if self.move_debounce_timer is not None:
-                self.move_debounce_timer.cancel()
+    def _schedule_move_ingredients_from_shopping_list(self, shopping_list_uuid: str | None = None) -> None:
+        # Mealie sends a notification per changed item, so this must not start a thread per call
+        self.loop.call_soon_threadsafe(self._debounce_move_ingredients_from_shopping_list, shopping_list_uuid)
 
-            self.logger.log.info(
-                f"Shopping list changed, moving items to Bring in {MOVE_INGREDIENTS_DEBOUNCE_SECONDS}s "
-                "if no further changes occur"
-            )
-            self.move_debounce_timer = threading.Timer(
-                MOVE_INGREDIENTS_DEBOUNCE_SECONDS, self._run_debounced_move_ingredients_from_shopping_list
-            )
-            self.move_debounce_timer.daemon = True
-            self.move_debounce_timer.start()
-
-    def _run_debounced_move_ingredients_from_shopping_list(self) -> None:
-        with self.move_debounce_lock:
-            self.move_debounce_timer = None
-
-        self._move_ingredients_from_shopping_list_to_bring()
-
-    def _move_ingredients_from_shopping_list_to_bring(self) -> None:
-        self.logger.log.info("Moving ingredients from shopping list to Bring")
+    def _debounce_move_ingredients_from_shopping_list(self, shopping_list_uuid: str | None) -> None:
+        MOVE_DEBOUNCE_EVENTS.inc("rescheduled" if shopping_list_uuid in self.move_debounce_timers else "scheduled")
+        if self.worker_state is not None:
+            scheduling = asyncio.ensure_future(self._debounce_move_across_workers(shopping_list_uuid))
+            self.move_schedulings.add(scheduling)
+            scheduling.add_done_callback(self._finish_move_scheduling)
+            return
 
-        items_on_shopping_list = self.mealie_handler.get_items_on_shopping_list()
-        self._add_ingredients_to_bring([Ingredient.from_raw_data(item) for item in items_on_shopping_list])
-        self.mealie_handler.delete_items_from_shopping_list(items_on_shopping_list)
+        now = self.loop.time()
+        started_at = self.move_debounce_started_at.setdefault(shopping_list_uuid, now)
+        # A shopping list that is changed constantly is still moved once it waited for the maximum time
+        delay = max(min(self.move_debounce_seconds, self.move_max_wait_seconds - (now - started_at)), 0)
+        self._announce_move_debounce(shopping_list_uuid, delay)
+
+    async def _debounce_move_across_workers(self, shopping_list_uuid: str | None) -> None:
+        # The workers share the debounce, the timer of the worker that received the last change moves the items
+        delay = await self._run_in_worker_state(
+            self.worker_state.schedule_move, shopping_list_uuid, self.move_debounce_seconds, self.move_max_wait_seconds
+        )
+        self._announce_move_debounce(shopping_list_uuid, delay)
+
+    def _finish_move_scheduling(self, scheduling: asyncio.Task) -> None:
+        self.move_schedulings.discard(scheduling)
+        if not scheduling.cancelled() and scheduling.exception() is not None:
+            self.logger.log.error(f"Could not schedule the move of the shopping list: {scheduling.exception()!r}")
+
+    def _announce_move_debounce(self, shopping_list_uuid: str | None, delay: float) -> None:
+        self.logger.log.info(
+            f"Shopping list changed ({shopping_list_uuid or 'all shopping lists'}), moving items to Bring in "
+            f"{delay:.1f}s if no further changes occur"
+        )
+        self._start_move_debounce_timer(shopping_list_uuid, delay)
+
+    async def _run_in_worker_state(self, function: Callable[..., T], *args: Any) -> T:
+        """
+        Run a call of the worker state in a thread, SQLite waits up to its busy timeout for the locks of the other
+        workers and must not block the event loop meanwhile. The calls share one connection, so they run one by one.
+        """
+        if self.worker_state_executor is None:
+            self.worker_state_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="WorkerState")
+        return await self.loop.run_in_executor(self.worker_state_executor, function, *args)
+
+    def _start_move_debounce_timer(self, shopping_list_uuid: str | None, delay: float) -> None:
+        if (pending_timer := self.move_debounce_timers.get(shopping_list_uuid)) is not None:
+            pending_timer.cancel()
+        self.move_debounce_timers[shopping_list_uuid] = self.loop.call_later(
+            delay, self._run_debounced_move_ingredients_from_shopping_list, shopping_list_uuid
+        )
+
+    def _run_debounced_move_ingredients_from_shopping_list(self, shopping_list_uuid: str | None) -> None:
+        MOVE_DEBOUNCE_EVENTS.inc("fired")
+        self._start_debounced_move(shopping_list_uuid)
+
+    def _start_debounced_move(self, shopping_list_uuid: str | None, ignore_due_time: bool = False) -> None:
+        del self.move_debounce_timers[shopping_list_uuid]
+        waited_seconds = None
+        if self.worker_state is None:
+            waited_seconds = self.loop.time() - self.move_debounce_started_at.pop(shopping_list_uuid)
+
+        move = asyncio.ensure_future(self._run_debounced_move(shopping_list_uuid, ignore_due_time, waited_seconds))
+        # The loop only keeps weak references to its tasks
+        self.debounced_moves.add(move)
+        move.add_done_callback(self._finish_debounced_move)
+
+    async def _run_debounced_move(
+        self, shopping_list_uuid: str | None, ignore_due_time: bool, waited_seconds: float | None
+    ) -> None:
+        if self.worker_state is not None:
+            waited_seconds = await self._run_in_worker_state(
+                self.worker_state.claim_move, shopping_list_uuid, ignore_due_time
+            )
+            if waited_seconds is None:
+                self._rearm_move_debounce_timer(
+                    shopping_list_uuid, (await self._run_in_worker_state(self.worker_state.pending_moves))
+                )
+                return
+        DEBOUNCE_WAIT_SECONDS.observe(waited_seconds)
+
+        await self._move_ingredients_from_shopping_list_to_bring_async(shopping_list_uuid)
+
+    def _rearm_move_debounce_timer(
+        self, shopping_list_uuid: str | None, pending_moves: dict[str | None, float]
+    ) -> None:
+        if shopping_list_uuid not in pending_moves:
+            # Another worker is already moving the items
+            MOVE_DEBOUNCE_EVENTS.inc("claimed_by_other_worker")
+            return
+        # The move is due later, as another worker received a later change or the wall clock was set back.
+        # The timer of a change that arrived in the meantime is kept
+        if shopping_list_uuid not in self.move_debounce_timers:
+            MOVE_DEBOUNCE_EVENTS.inc("rescheduled")
+            self._start_move_debounce_timer(shopping_list_uuid, pending_moves[shopping_list_uuid])
+
+    def _finish_debounced_move(self, move: asyncio.Task) -> None:
+        self.debounced_moves.discard(move)
+        if not move.cancelled() and move.exception() is not None:
+            self.logger.log.error(f"Could not move the items of the shopping list to Bring: {move.exception()!r}")
+
+    async def _flush_debounced_moves(self) -> None:
+        # Changes that are still being scheduled get their timer first, so they are flushed as well
+        await asyncio.gather(*self.move_schedulings, return_exceptions=True)
+        if self.move_debounce_timers:
+            self.logger.log.info("Flushing pending shopping list moves before shutdown")
+        for shopping_list_uuid, pending_timer in list(self.move_debounce_timers.items()):
+            pending_timer.cancel()
+            MOVE_DEBOUNCE_EVENTS.inc("flushed")
+            self._start_debounced_move(shopping_list_uuid, ignore_due_time=True)
+
+        # The moves that were already running are waited for as well, their errors are logged when they finish
+        await asyncio.gather(*self.debounced_moves, return_exceptions=True)
+
+    def _move_ingredients_from_shopping_list_to_bring(self, shopping_list_uuid: str | None = None) -> None:
+        self._run_coroutine(self._move_ingredients_from_shopping_list_to_bring_async(shopping_list_uuid))
+
+    async def _move_ingredients_from_shopping_list_to_bring_async(self, shopping_list_uuid: str | None = None) -> None:
+        # Different shopping lists are moved concurrently, a move of all shopping lists waits for every other move
+        def can_start() -> bool:
+            if shopping_list_uuid is None:
+                return not self.running_moves
+            return not self.running_moves & {shopping_list_uuid, None}
+
+        async with self.moves_changed:
+            await self.moves_changed.wait_for(can_start)
+            self.running_moves.add(shopping_list_uuid)
+        try:
+            if self.worker_state is None:
+                await self._move_items_of_shopping_list(shopping_list_uuid)
+            else:
+                await self._move_items_of_shopping_list_with_lease(shopping_list_uuid)
+        finally:
+            async with self.moves_changed:
+                self.running_moves.remove(shopping_list_uuid)
+                self.moves_changed.notify_all()
+
+    async def _move_items_of_shopping_list_with_lease(self, shopping_list_uuid: str | None) -> None:
+        # The same rules apply across the workers, another worker might be moving the shopping list right now
+        while not await self._run_in_worker_state(
+            self.worker_state.acquire_move_lease, shopping_list_uuid, MOVE_LEASE_SECONDS
+        ):
+            await asyncio.sleep(MOVE_LEASE_POLL_SECONDS)
+        try:
+            await self._move_items_of_shopping_list(shopping_list_uuid)
+        finally:
+            await self._run_in_worker_state(self.worker_state.release_move_lease, shopping_list_uuid)
+
+    async def _move_items_of_shopping_list(self, shopping_list_uuid: str | None) -> None:
+        self.logger.log.info(
+            f"Moving ingredients from shopping list to Bring ({shopping_list_uuid or 'all shopping lists'})"
+        )
+
+        # Every page is pushed to Bring while the next one is still being fetched from Mealie
+        moved_items = []
+        changed_lists: dict[str | None, bool] = {}
+        async for items_on_page in self.mealie_handler.iterate_pages_of_shopping_list(shopping_list_uuid):
+            if not items_on_page:
+                continue
+            for list_name, items in self._group_by_bring_list(items_on_page).items():
+                ingredients_to_add = [
+                    Ingredient.from_raw_data(item) for item in self._merge_duplicate_ingredients(items)
+                ]
+                self.logger.log.info(f"Adding ingredients to Bring: {ingredients_to_add}")
+                list_changed = await self.bring_handler.add_items(ingredients_to_add, list_name)
+                changed_lists[list_name] = changed_lists.get(list_name, False) or list_changed
+            moved_items.extend(items_on_page)
+
+        if not moved_items:
+            self.logger.log.warning("There are no ingredients to add")
+            return
 
-    def _add_ingredients_to_bring(self, ingredients_to_add: list[Ingredient]) -> None:
+        for list_name, list_changed in changed_lists.items():
+            if list_changed:
+                await self.bring_handler.notify_users_about_changes_in_list(list_name)
+        # Items are only deleted once all pages are fetched, otherwise the pagination would skip items
+        await self.mealie_handler.delete_items_from_shopping_list(moved_items)
+        # Items that could not be deleted stay above the mark, so the next move fetches them again
+        self.mealie_handler.mark_as_synced(moved_items)
+
+    def _group_by_bring_list(self, items: list[dict]) -> dict[str | None, list[dict]]:
+        items_by_list: dict[str | None, list[dict]] = {}
+        for item in items:
+            list_name = self.list_router.list_for_shopping_list(item.get("shoppingListId"))
+            items_by_list.setdefault(list_name, []).append(item)
+        return items_by_list
+
+    async def _add_ingredients_to_bring_async(
+        self, ingredients_to_add: list[Ingredient], list_name: str | None = None, outbox_entry_id: int | None = None
+    ) -> None:
         if not ingredients_to_add:
             self.logger.log.warning("There are no ingredients to add")
             return
 
         self.logger.log.info(f"Adding ingredients to Bring: {ingredients_to_add}")
-        with self.loop_lock:
-            self.loop.run_until_complete(self.bring_handler.add_items(ingredients_to_add))
-            self.loop.run_until_complete(self.bring_handler.notify_users_about_changes_in_list())
+        if self.bring_outbox is None:
+            # Concurrent requests (e.g. a whole meal plan) end up in one update and one notification
+            await self.bring_update_coalescer.add(ingredients_to_add, list_name)
+            return
+
+        # The ingredients are stored before sending them, so they are not lost if Bring is down or we are stopped.
+        # Queued recipes were already stored when they were accepted
+        entry_id = outbox_entry_id or await self.bring_outbox.append(ingredients_to_add, list_name)
+        try:
+            await self.bring_update_coalescer.add(ingredients_to_add, list_name)
+        except Exception as e:
+            await self.bring_outbox.mark_failed(entry_id, e)
+            self.logger.log.warning(f"Could not add the ingredients to Bring, retrying them from the outbox: {e!r}")
+            return
+        await self.bring_outbox.mark_done(entry_id)
+
+    def _run_coroutine(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        """Run a coroutine on the event loop thread and block the calling thread until it is done."""
+        submitted_at = time.perf_counter()
+
+        async def run_and_measure_wait() -> T:
+            EVENT_LOOP_WAIT_SECONDS.observe(time.perf_counter() - submitted_at)
+            return await coroutine
+
+        return asyncio.run_coroutine_threadsafe(run_and_measure_wait(), self.loop).result()
 
     def run(self) -> None:
-        self.logger.log.info(f"Listening on {self.host}:{self.port}{self.basepath}")
-        self.app.run(host=self.host, port=self.port)
+        self.logger.log.info(f"Listening on {self.host}:{self.port}{self.basepath} (server mode: {self.server_mode})")
+        if self.server_mode == "async":
+            self._run_async_server()
+        else:
+            self.app.run(host=self.host, port=self.port)
+
+    def _run_async_server(self) -> None:
+        # The request handlers run directly on the event loop, so concurrent requests overlap their network waits
+        self.async_app_runner = web.AppRunner(self._create_async_app(), access_log=None)
+        self._run_coroutine(self.async_app_runner.setup())
+        # The workers of HTTP_WORKERS listen on the same port, the kernel distributes the connections among them
+        site = web.TCPSite(self.async_app_runner, self.host, self.port, reuse_port=bool(self.worker_id))
+        self._run_coroutine(site.start())
+        # The main thread only has to stay alive to receive the stop signals
+        self.loop_thread.join()
 
     def _handle_stop_signal(self, signal_number: int, _frame: FrameType) -> None:
         self.logger.log.info(f"Received {signal.Signals(signal_number).name}. Exiting now...")
 
-        with self.move_debounce_lock:
-            pending_timer = self.move_debounce_timer
-            self.move_debounce_timer = None
-        if pending_timer is not None:
-            pending_timer.cancel()
-            self.logger.log.info("Flushing pending shopping list move before shutdown")
-            self._move_ingredients_from_shopping_list_to_bring()
-
-        with self.loop_lock:
-            self.loop.run_until_complete(self.bring_handler.logout())
-        self.loop.stop()
+        self._run_coroutine(self._flush_debounced_moves())
+        if self.async_app_runner is not None:
+            self._run_coroutine(self.async_app_runner.cleanup())
+        if self.recipe_queue is not None:
+            self._run_coroutine(self.recipe_queue.drain())
+        self._run_coroutine(self.bring_update_coalescer.flush())
+        if self.outbox_replay_task is not None:
+            self.loop.call_soon_threadsafe(self.outbox_replay_task.cancel)
+        for handshake_retry_task in self.handshake_retry_tasks:
+            self.loop.call_soon_threadsafe(handshake_retry_task.cancel)
+        self._run_coroutine(self.bring_handler.logout())
+        self._run_coroutine(self.mealie_handler.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
 
         sys.exit(0)
 
@@ -199,6 +699,10 @@ class MealieBringAPI:
 app = Flask(__name__)
 
 if __name__ == "__main__":
+    number_of_workers = int(EnvironmentVariableGetter.get("HTTP_WORKERS", 1))
+    if number_of_workers > 1:
+        sys.exit(WorkerSupervisor(number_of_workers).run())
+
     mealie_app = MealieBringAPI()
     app = mealie_app.app
     mealie_app.run()
@@ -1,9 +1,24 @@
-import sys
+import asyncio
+import json
+import ssl
+import time
+from collections.abc import AsyncIterator
+from datetime import datetime
+from typing import Any
 
-import requests
-from requests.exceptions import JSONDecodeError
+import aiohttp
+import certifi
 from source.environment_variable_getter import EnvironmentVariableGetter
+from source.ingredient import get_value_of_dict_with_different_naming_conventions
+from source.list_router import load_routes
 from source.logger_mixin import LoggerMixin
+from source.metrics import MEALIE_DELETE_SECONDS, MEALIE_FETCH_SECONDS, UPSTREAM_ERRORS
+
+# Stay well below the URL length limit of common reverse proxies and web servers
+MAX_URL_LENGTH = 2000
+MAX_PARALLEL_SINGLE_DELETES = 4
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+ALL_ITEMS_ON_ONE_PAGE = -1
 
 
 class MealieHandler(LoggerMixin):
@@ -12,6 +27,7 @@ class MealieHandler(LoggerMixin):
 
         self.mealie_base_url = EnvironmentVariableGetter.get("MEALIE_BASE_URL", "")
         self.mealie_api_key = EnvironmentVariableGetter.get("MEALIE_API_KEY", "")
+        self.session: aiohttp.ClientSession | None = None
 
         self.mealie_is_setup = True
         if not self.mealie_base_url or not self.mealie_api_key:
@@ -29,56 +45,245 @@ class MealieHandler(LoggerMixin):
             self.log.info(f"Will filter items for shopping list with UUID {self.shopping_list_uuid}")
         else:
             self.log.info("No shopping list UUID specified --> Will add the ingredients of all shopping lists")
+        # The items of these shopping lists are moved to other Bring lists, so they are fetched as well
+        self.routed_shopping_list_uuids = list(load_routes("MEALIE_SHOPPING_LIST_ROUTES"))
+
+        self.pool_size = int(EnvironmentVariableGetter.get("MEALIE_HTTP_POOL_SIZE", 10))
+        self.retries = int(EnvironmentVariableGetter.get("MEALIE_HTTP_RETRIES", 3))
+        self.backoff_factor = float(EnvironmentVariableGetter.get("MEALIE_HTTP_BACKOFF_FACTOR", 0.5))
+        self.page_size = int(EnvironmentVariableGetter.get("MEALIE_PAGE_SIZE", ALL_ITEMS_ON_ONE_PAGE))
+
+        self.incremental_sync = EnvironmentVariableGetter.get("MEALIE_INCREMENTAL_SYNC", "false").lower() == "true"
+        # Per shopping list, the update time of the newest item that was moved and the items with exactly that time
+        self.synced_until: dict[str, datetime] = {}
+        self.synced_item_ids: dict[str, set[str]] = {}
 
-        self._try_api_key()
+    async def connect(self) -> None:
+        # A failed handshake is retried, the session of the previous attempt must not leak
+        await self.close()
+        self.session = self._create_session(self.mealie_api_key, self.pool_size)
+        await self._try_api_key()
 
-    def _try_api_key(self) -> None:
-        response = requests.get(
-            f"{self.mealie_base_url}/api/households/shopping/items?perPage=1",
-            headers={"Authorization": f"Bearer {self.mealie_api_key}"},
-            timeout=5,
+    @staticmethod
+    def _create_session(api_key: str, pool_size: int) -> aiohttp.ClientSession:
+        ssl_context = ssl.create_default_context(cafile=certifi.where())
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=pool_size, ssl=ssl_context),
+            headers={"Authorization": f"Bearer {api_key}"},
         )
+
+    async def close(self) -> None:
+        if self.session is not None:
+            self.log.debug("Closing the connections to Mealie")
+            await self.session.close()
+
+    async def _try_api_key(self) -> None:
         try:
-            response.raise_for_status()
+            await self._request("GET", f"{self._shopping_items_url}?perPage=1", timeout=5)
             self.log.info("Connection to Mealie successful")
-        except requests.exceptions.HTTPError as e:
-            self.log.critical(f"Invalid Mealie URL or API key: {e}")
-            sys.exit(1)
+        except aiohttp.ClientResponseError as e:
+            raise RuntimeError(f"Invalid Mealie URL or API key: {e}") from e
+
+    async def _request(self, method: str, url: str, timeout: float, **kwargs: Any) -> str:
+        # Retrying is safe as only idempotent requests are sent to Mealie
+        attempt = 0
+        while True:
+            try:
+                async with self.session.request(
+                    method, url, timeout=aiohttp.ClientTimeout(total=timeout), **kwargs
+                ) as response:
+                    if response.status not in RETRY_STATUS_CODES or attempt >= self.retries:
+                        response_text = await response.text()
+                        if not response.ok:
+                            UPSTREAM_ERRORS.inc("mealie")
+                        response.raise_for_status()
+                        return response_text
+                    self.log.debug(f"Got status {response.status} from Mealie for {method} {url}")
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt >= self.retries:
+                    UPSTREAM_ERRORS.inc("mealie")
+                    raise
+                self.log.debug(f"Request {method} {url} to Mealie failed: {e!r}")
+
+            await asyncio.sleep(self.backoff_factor * 2**attempt)
+            attempt += 1
+
+    def handles_shopping_list(self, shopping_list_uuid: str) -> bool:
+        return not self._shopping_list_uuids or shopping_list_uuid in self._shopping_list_uuids
+
+    async def get_items_on_shopping_list(self, shopping_list_uuid: str | None = None) -> list[dict]:
+        return [item async for page in self.iterate_pages_of_shopping_list(shopping_list_uuid) for item in page]
 
-    def get_items_on_shopping_list(self) -> list[dict]:
+    async def iterate_pages_of_shopping_list(self, shopping_list_uuid: str | None = None) -> AsyncIterator[list[dict]]:
+        """Only the items of the given shopping list are fetched, None stands for all handled shopping lists."""
+        shopping_list_uuids = [shopping_list_uuid] if shopping_list_uuid else self._shopping_list_uuids
         self.log.debug("Getting items from shopping list")
-        response = requests.get(
-            f"{self.mealie_base_url}/api/households/shopping/items?perPage=-1",
-            headers={"Authorization": f"Bearer {self.mealie_api_key}"},
-            timeout=20,
-        )
-        self.log.debug(f"Response ({response.status_code}): {response.text}")
-        response.raise_for_status()
+        # The next page is already requested while the caller processes the current one
+        next_page = asyncio.ensure_future(self._get_page_of_shopping_list(1, shopping_list_uuids))
+        try:
+            while True:
+                items_on_page, page, total_pages = await next_page
+                if page >= total_pages:
+                    yield items_on_page
+                    return
+                next_page = asyncio.ensure_future(self._get_page_of_shopping_list(page + 1, shopping_list_uuids))
+                yield items_on_page
+        finally:
+            next_page.cancel()
+
+    async def _get_page_of_shopping_list(
+        self, page: int, shopping_list_uuids: list[str]
+    ) -> tuple[list[dict], int, int]:
+        query_filters = []
+        if self.page_size == ALL_ITEMS_ON_ONE_PAGE:
+            params = {"perPage": ALL_ITEMS_ON_ONE_PAGE}
+        else:
+            # Without a fixed order the pages are not stable, items could be skipped or fetched twice
+            params = {"page": page, "perPage": self.page_size, "orderBy": "id", "orderDirection": "asc"}
+            if len(shopping_list_uuids) == 1:
+                query_filters.append(f'shopping_list_id="{shopping_list_uuids[0]}"')
+            elif shopping_list_uuids:
+                quoted_shopping_list_uuids = ", ".join(
+                    f'"{shopping_list_uuid}"' for shopping_list_uuid in shopping_list_uuids
+                )
+                query_filters.append(f"shopping_list_id IN [{quoted_shopping_list_uuids}]")
+        if len(shopping_list_uuids) == 1 and shopping_list_uuids[0] in self.synced_until:
+            # Only the items that changed since the last move, the ones with the same time are skipped below
+            query_filters.append(f'update_at >= "{self.synced_until[shopping_list_uuids[0]].isoformat()}"')
+        if query_filters:
+            params["queryFilter"] = " AND ".join(query_filters)
+        with MEALIE_FETCH_SECONDS.time():
+            response_text = await self._request("GET", self._shopping_items_url, params=params, timeout=20)
 
         try:
-            items_on_shopping_list = response.json()["items"]
-        except JSONDecodeError as e:
-            if "<!doctype html" in response.text:
+            response_data = json.loads(response_text)
+        except json.JSONDecodeError as e:
+            if "<!doctype html" in response_text:
                 self.log.critical(
                     "The response from Mealie seems to be HTML. Please check your Mealie URL and API key."
                 )
-                return []
+                return [], page, page
             raise e
 
-        if self.shopping_list_uuid:
-            items_on_shopping_list = [
-                item for item in items_on_shopping_list if item["shoppingListId"] == self.shopping_list_uuid
-            ]
+        items_on_page = response_data["items"]
+        total_pages = get_value_of_dict_with_different_naming_conventions(response_data, "total_pages") or page
+        self.log.debug(f"Got {len(items_on_page)} items on page {page} of {total_pages}")
+
+        # Older versions of Mealie ignore the query filter, so the items are always filtered here as well
+        if shopping_list_uuids:
+            items_on_page = [item for item in items_on_page if item["shoppingListId"] in shopping_list_uuids]
+        if self.synced_until:
+            items_on_page = [item for item in items_on_page if not self._is_synced(item)]
 
-        return items_on_shopping_list
+        return items_on_page, page, total_pages
+
+    def _is_synced(self, item: dict) -> bool:
+        updated_at = _get_update_time(item)
+        synced_until = self.synced_until.get(item["shoppingListId"])
+        if updated_at is None or synced_until is None:
+            return False
+        return updated_at < synced_until or (
+            updated_at == synced_until and item["id"] in self.synced_item_ids[item["shoppingListId"]]
+        )
 
-    def delete_items_from_shopping_list(self, items_on_shopping_list: list[dict]) -> None:
+    def mark_as_synced(self, items: list[dict]) -> None:
+        """Remember the items that were moved to Bring, so the next move only fetches the items that changed since."""
+        if not self.incremental_sync:
+            return
+
+        # Every shopping list has its own mark, as the lists are moved independently of each other
+        for item in items:
+            updated_at = _get_update_time(item)
+            if updated_at is None:
+                continue
+            shopping_list_uuid = item["shoppingListId"]
+            synced_until = self.synced_until.get(shopping_list_uuid)
+            if synced_until is None or updated_at > synced_until:
+                self.synced_until[shopping_list_uuid] = updated_at
+                self.synced_item_ids[shopping_list_uuid] = {item["id"]}
+            elif updated_at == synced_until:
+                self.synced_item_ids[shopping_list_uuid].add(item["id"])
+        for shopping_list_uuid, synced_until in self.synced_until.items():
+            self.log.debug(f"Moved all items of the shopping list {shopping_list_uuid} changed until {synced_until}")
+
+    async def delete_items_from_shopping_list(self, items_on_shopping_list: list[dict]) -> None:
         item_ids = [item["id"] for item in items_on_shopping_list]
         self.log.debug(f"Deleting {len(item_ids)} items from shopping list")
-        for item_id in item_ids:
-            response = requests.delete(
-                url=f"{self.mealie_base_url}/api/households/shopping/items?ids={item_id}",
-                headers={"Authorization": f"Bearer {self.mealie_api_key}"},
-                timeout=20,
+
+        start = time.perf_counter()
+        failed_item_ids = []
+        item_id_chunks = chunk_item_ids_by_url_length(self._shopping_items_url, item_ids)
+        for item_id_chunk in item_id_chunks:
+            try:
+                await self._delete_items(item_id_chunk)
+            except aiohttp.ClientError as e:
+                self.log.warning(f"Could not delete {len(item_id_chunk)} items in one request: {e}")
+                failed_item_ids.extend(item_id_chunk)
+        self.log.info(
+            f"Deleted {len(item_ids) - len(failed_item_ids)} items in {len(item_id_chunks)} bulk requests "
+            f"in {time.perf_counter() - start:.3f}s"
+        )
+
+        if not failed_item_ids:
+            return
+
+        start = time.perf_counter()
+        semaphore = asyncio.Semaphore(MAX_PARALLEL_SINGLE_DELETES)
+
+        async def delete_item(item_id: str) -> None:
+            async with semaphore:
+                await self._delete_items([item_id])
+
+        # Re-raises the first error of the single deletes
+        await asyncio.gather(*(delete_item(item_id) for item_id in failed_item_ids))
+        self.log.info(f"Deleted {len(failed_item_ids)} items one by one in {time.perf_counter() - start:.3f}s")
+
+    @property
+    def _shopping_list_uuids(self) -> list[str]:
+        """The shopping lists to move the items of, an empty list stands for all shopping lists."""
+        if not self.shopping_list_uuid:
+            return []
+        return list(dict.fromkeys([self.shopping_list_uuid, *self.routed_shopping_list_uuids]))
+
+    @property
+    def _shopping_items_url(self) -> str:
+        return f"{self.mealie_base_url}/api/households/shopping/items"
+
+    async def _delete_items(self, item_ids: list[str]) -> None:
+        with MEALIE_DELETE_SECONDS.time():
+            await self._request(
+                "DELETE", self._shopping_items_url, params=[("ids", item_id) for item_id in item_ids], timeout=20
             )
-            response.raise_for_status()
+
+
+def _get_update_time(item: dict) -> datetime | None:
+    # Older versions of Mealie do not send the time of the last update
+    updated_at = get_value_of_dict_with_different_naming_conventions(
+        item, "update_at"
+    ) or get_value_of_dict_with_different_naming_conventions(item, "updated_at")
+    if not updated_at:
+        return None
+    try:
+        return datetime.fromisoformat(updated_at)
+    except ValueError:
+        return None
+
+
+def chunk_item_ids_by_url_length(
+    url: str, item_ids: list[str], max_url_length: int = MAX_URL_LENGTH
+) -> list[list[str]]:
+    chunks = []
+    chunk: list[str] = []
+    url_length = len(url)
+    for item_id in item_ids:
+        # Every ID is sent as "?ids=<id>" or "&ids=<id>"
+        parameter_length = len(item_id) + 5
+        if chunk and url_length + parameter_length > max_url_length:
+            chunks.append(chunk)
+            chunk = []
+            url_length = len(url)
+        chunk.append(item_id)
+        url_length += parameter_length
+    if chunk:
+        chunks.append(chunk)
+    return chunks
@@ -0,0 +1,101 @@
+import bisect
+import contextlib
+import threading
+import time
+from collections.abc import Iterator
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_registry: list["Histogram | Counter"] = []
+
+
+class Histogram:
+    """Histogram in the Prometheus text format, the buckets are cumulative."""
+
+    def __init__(self, name: str, description: str, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float) -> None:
+        with self.lock:
+            self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.sum += value
+
+    @contextlib.contextmanager
+    def time(self) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def render(self) -> list[str]:
+        with self.lock:
+            bucket_counts, total = list(self.bucket_counts), self.sum
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        cumulative_count = 0
+        for upper_bound, count in zip((*self.buckets, "+Inf"), bucket_counts):
+            cumulative_count += count
+            lines.append(f'{self.name}_bucket{{le="{upper_bound}"}} {cumulative_count}')
+        lines.append(f"{self.name}_sum {total}")
+        lines.append(f"{self.name}_count {cumulative_count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, description: str, label: str):
+        self.name = name
+        self.description = description
+        self.label = label
+        self.values: dict[str, int] = {}
+        self.lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, label_value: str) -> None:
+        with self.lock:
+            self.values[label_value] = self.values.get(label_value, 0) + 1
+
+    def render(self) -> list[str]:
+        with self.lock:
+            values = dict(self.values)
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        lines.extend(f'{self.name}{{{self.label}="{label_value}"}} {value}' for label_value, value in values.items())
+        return lines
+
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in _registry for line in metric.render()) + "\n"
+
+
+RECIPE_PARSE_SECONDS = Histogram("recipe_parse_seconds", "Time to parse the ingredients of a recipe")
+INGREDIENTS_PER_REQUEST = Histogram(
+    "ingredients_per_request", "Number of ingredients added to Bring per request", COUNT_BUCKETS
+)
+BRING_BATCH_UPDATE_SECONDS = Histogram("bring_batch_update_seconds", "Latency of updating the items of the Bring list")
+BRING_NOTIFY_SECONDS = Histogram("bring_notify_seconds", "Latency of notifying the users of the Bring list")
+BRING_FETCH_SECONDS = Histogram("bring_fetch_seconds", "Latency of fetching the items of the Bring list")
+BRING_RATE_LIMITER_WAIT_SECONDS = Histogram(
+    "bring_rate_limiter_wait_seconds", "Time a request to Bring waits for the rate limiter before it is sent"
+)
+MEALIE_FETCH_SECONDS = Histogram("mealie_fetch_seconds", "Latency of fetching a page of the Mealie shopping list")
+MEALIE_DELETE_SECONDS = Histogram("mealie_delete_seconds", "Latency of deleting items from the Mealie shopping list")
+DEBOUNCE_WAIT_SECONDS = Histogram(
+    "debounce_wait_seconds", "Time from the first shopping list change until the items are moved"
+)
+EVENT_LOOP_WAIT_SECONDS = Histogram(
+    "event_loop_wait_seconds", "Time a request waits until its coroutine starts on the shared event loop"
+)
+MOVE_DEBOUNCE_EVENTS = Counter(
+    "move_debounce_events_total", "Number of debounce timers of the shopping lists per event", "event"
+)
+BRING_THROTTLED = Counter(
+    "bring_throttled_total", "Number of times the requests to Bring were slowed down per reason", "reason"
+)
+UPSTREAM_ERRORS = Counter("upstream_errors_total", "Number of failed requests per upstream", "upstream")
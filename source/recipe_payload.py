@@ -0,0 +1,26 @@
+import json
+
+# Only these fields of the webhook payload of Mealie are used, None means that the whole value is needed
+RECIPE_FIELDS = {
+    "content": {"name": None, "settings": None, "recipe_ingredient": None},
+    "recipe_scale": None,
+}
+
+
+def extract_recipe_data(body: str) -> dict:
+    """
+    Decode the whole recipe payload with json.loads and filter it down to the fields that are needed to add its
+    ingredients to Bring. This does not reduce the work of decoding, the size of the payload is only bounded by
+    HTTP_MAX_BODY_SIZE. Raises a ValueError if the body is not valid JSON or a field has an unexpected type.
+    """
+    return _select_fields(json.loads(body), RECIPE_FIELDS)
+
+
+def _select_fields(value: object, fields: dict) -> dict:
+    if not isinstance(value, dict):
+        raise ValueError(f"Expected a JSON object, got {type(value).__name__}")
+    return {
+        key: value[key] if nested_fields is None else _select_fields(value[key], nested_fields)
+        for key, nested_fields in fields.items()
+        if key in value
+    }
@@ -0,0 +1,84 @@
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+
+from source.ingredient import Ingredient
+from source.logger_mixin import LoggerMixin
+
+
+class RecipeQueue(LoggerMixin):
+    """Queue for the ingredients of received recipes that a fixed number of workers add to Bring."""
+
+    def __init__(
+        self,
+        process: Callable[[list[Ingredient], str | None, int | None], Awaitable[None]],
+        max_size: int,
+        number_of_workers: int,
+    ):
+        super().__init__()
+
+        self.process = process
+        self.max_size = max_size
+        self.number_of_workers = number_of_workers
+        self.queue: asyncio.Queue[tuple[list[Ingredient], str | None, int | None, float]] | None = None
+        self.workers: list[asyncio.Task] = []
+
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_latency_seconds = 0.0
+        self.last_latency_seconds: float | None = None
+
+    async def start(self) -> None:
+        # The queue has to be created on the event loop it is used on
+        self.queue = asyncio.Queue(self.max_size)
+        self.workers = [asyncio.ensure_future(self._work()) for _ in range(self.number_of_workers)]
+        self.log.info(f"Processing recipes with {self.number_of_workers} workers (queue size: {self.max_size})")
+
+    async def submit(
+        self, ingredients: list[Ingredient], list_name: str | None = None, outbox_entry_id: int | None = None
+    ) -> bool:
+        """Enqueue the ingredients for the Bring list and return False if the queue is full."""
+        try:
+            self.queue.put_nowait((ingredients, list_name, outbox_entry_id, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            self.log.warning(f"Rejecting recipe as the queue is full ({self.max_size} recipes)")
+            return False
+        return True
+
+    async def drain(self) -> None:
+        if self.queue is None:
+            return
+        if not self.queue.empty():
+            self.log.info(f"Waiting for {self.queue.qsize()} queued recipes to be processed")
+        await self.queue.join()
+        for worker in self.workers:
+            worker.cancel()
+
+    async def _work(self) -> None:
+        while True:
+            ingredients, list_name, outbox_entry_id, enqueued_at = await self.queue.get()
+            try:
+                await self.process(ingredients, list_name, outbox_entry_id)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                self.log.error(f"Could not add the ingredients of a queued recipe to Bring: {e!r}")
+            finally:
+                self.last_latency_seconds = time.perf_counter() - enqueued_at
+                self.total_latency_seconds += self.last_latency_seconds
+                self.queue.task_done()
+
+    def to_dict(self) -> dict:
+        finished = self.processed + self.failed
+        return {
+            "depth": self.queue.qsize() if self.queue is not None else 0,
+            "max_size": self.max_size,
+            "workers": self.number_of_workers,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "last_latency_seconds": self.last_latency_seconds,
+            "average_latency_seconds": self.total_latency_seconds / finished if finished else None,
+        }
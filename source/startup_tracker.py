@@ -0,0 +1,74 @@
+import asyncio
+import dataclasses
+import time
+from collections.abc import Awaitable, Callable
+
+from source.logger_mixin import LoggerMixin
+
+STATUS_STARTING = "starting"
+STATUS_READY = "ready"
+STATUS_DEGRADED = "degraded"
+MAX_RETRY_SECONDS = 300
+
+
+@dataclasses.dataclass
+class Handshake:
+    state: str = "pending"
+    duration_seconds: float | None = None
+    error: str | None = None
+    attempts: int = 0
+
+
+class StartupTracker(LoggerMixin):
+    """Keeps track of the handshakes with Bring and Mealie that have to succeed before requests can be served."""
+
+    def __init__(self):
+        super().__init__()
+
+        self.handshakes: dict[str, Handshake] = {}
+
+    def register(self, name: str) -> None:
+        self.handshakes[name] = Handshake()
+
+    async def run(self, name: str, handshake: Awaitable[None]) -> None:
+        self.handshakes[name].state = "running"
+        self.handshakes[name].attempts += 1
+        start = time.perf_counter()
+        try:
+            await handshake
+        except Exception as e:
+            self.handshakes[name].state = "failed"
+            self.handshakes[name].error = str(e)
+            self.log.critical(f"Connecting to {name} failed: {e}")
+        else:
+            self.handshakes[name].state = "successful"
+            self.handshakes[name].error = None
+        finally:
+            self.handshakes[name].duration_seconds = round(time.perf_counter() - start, 3)
+        self.log.info(f"Connecting to {name} took {self.handshakes[name].duration_seconds}s")
+
+    async def retry(self, name: str, connect: Callable[[], Awaitable[None]], retry_seconds: float) -> None:
+        """Retry a failed handshake until it succeeds, the wait doubles with every failed attempt up to 5 minutes."""
+        while self.handshakes[name].state == "failed":
+            self.log.info(f"Retrying to connect to {name} in {retry_seconds}s")
+            await asyncio.sleep(retry_seconds)
+            await self.run(name, connect())
+            retry_seconds = min(retry_seconds * 2, MAX_RETRY_SECONDS)
+
+    def is_successful(self, name: str) -> bool:
+        return name in self.handshakes and self.handshakes[name].state == "successful"
+
+    @property
+    def status(self) -> str:
+        states = {handshake.state for handshake in self.handshakes.values()}
+        if states & {"pending", "running"}:
+            return STATUS_STARTING
+        if "failed" in states:
+            return STATUS_DEGRADED
+        return STATUS_READY
+
+    def to_dict(self) -> dict:
+        return {
+            "status": self.status,
+            "handshakes": {name: dataclasses.asdict(handshake) for name, handshake in self.handshakes.items()},
+        }
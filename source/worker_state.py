@@ -0,0 +1,129 @@
+import contextlib
+import sqlite3
+import time
+from collections.abc import Iterator
+
+from source.logger_mixin import LoggerMixin
+
+# SQLite does not treat NULL as equal in a primary key, so the move of all shopping lists gets a key of its own
+ALL_SHOPPING_LISTS = "*"
+
+
+def _key(shopping_list_uuid: str | None) -> str:
+    return shopping_list_uuid or ALL_SHOPPING_LISTS
+
+
+def _shopping_list_uuid(key: str) -> str | None:
+    return None if key == ALL_SHOPPING_LISTS else key
+
+
+class WorkerState(LoggerMixin):
+    """
+    The state the workers of HTTP_WORKERS share, so every change of a shopping list is moved by exactly one worker.
+    The times are wall clock times, as the monotonic clocks of the processes are not comparable.
+    """
+
+    def __init__(self, path: str, worker_id: str):
+        super().__init__()
+
+        self.path = path
+        self.worker_id = worker_id
+        # Transactions are started explicitly, as a move must be claimed in one transaction
+        self.connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=10)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS move_debounce ("
+            "shopping_list_key TEXT PRIMARY KEY, started_at REAL NOT NULL, due_at REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS move_leases ("
+            "shopping_list_key TEXT PRIMARY KEY, worker_id TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def clear_leases(self) -> None:
+        self.connection.execute("DELETE FROM move_leases")
+
+    def schedule_move(self, shopping_list_uuid: str | None, debounce_seconds: float, max_wait_seconds: float) -> float:
+        """Debounce the move across all workers and return the seconds until it is due."""
+        now = time.time()
+        with self._transaction():
+            row = self.connection.execute(
+                "SELECT started_at FROM move_debounce WHERE shopping_list_key = ?", (_key(shopping_list_uuid),)
+            ).fetchone()
+            started_at = now if row is None else row[0]
+            due_at = min(now + debounce_seconds, started_at + max_wait_seconds)
+            self.connection.execute(
+                "INSERT OR REPLACE INTO move_debounce (shopping_list_key, started_at, due_at) VALUES (?, ?, ?)",
+                (_key(shopping_list_uuid), started_at, due_at),
+            )
+        return max(due_at - now, 0)
+
+    def pending_moves(self) -> dict[str | None, float]:
+        """The seconds until the moves are due that were scheduled by other workers, e.g. one that crashed."""
+        now = time.time()
+        rows = self.connection.execute("SELECT shopping_list_key, due_at FROM move_debounce").fetchall()
+        return {_shopping_list_uuid(key): max(due_at - now, 0) for key, due_at in rows}
+
+    def claim_move(self, shopping_list_uuid: str | None, ignore_due_time: bool = False) -> float | None:
+        """
+        Claim the move for this worker and return the seconds since the first change of the shopping list.
+        None if the move is not due yet, as a later change arrived at another worker, or was claimed by another worker.
+        """
+        now = time.time()
+        with self._transaction():
+            row = self.connection.execute(
+                "SELECT started_at, due_at FROM move_debounce WHERE shopping_list_key = ?",
+                (_key(shopping_list_uuid),),
+            ).fetchone()
+            if row is None:
+                return None
+            started_at, due_at = row
+            if due_at > now and not ignore_due_time:
+                return None
+            self.connection.execute(
+                "DELETE FROM move_debounce WHERE shopping_list_key = ?", (_key(shopping_list_uuid),)
+            )
+        return now - started_at
+
+    def acquire_move_lease(self, shopping_list_uuid: str | None, lease_seconds: float) -> bool:
+        """
+        Only one worker at a time may move a shopping list, a move of all shopping lists excludes every other move.
+        The lease expires, so a crashed worker does not block the shopping list forever.
+        """
+        now = time.time()
+        with self._transaction():
+            self.connection.execute("DELETE FROM move_leases WHERE expires_at < ?", (now,))
+            if shopping_list_uuid is None:
+                conflicting_leases = self.connection.execute("SELECT COUNT(*) FROM move_leases").fetchone()[0]
+            else:
+                conflicting_leases = self.connection.execute(
+                    "SELECT COUNT(*) FROM move_leases WHERE shopping_list_key IN (?, ?)",
+                    (_key(shopping_list_uuid), ALL_SHOPPING_LISTS),
+                ).fetchone()[0]
+            if conflicting_leases:
+                return False
+            self.connection.execute(
+                "INSERT INTO move_leases (shopping_list_key, worker_id, expires_at) VALUES (?, ?, ?)",
+                (_key(shopping_list_uuid), self.worker_id, now + lease_seconds),
+            )
+        return True
+
+    def release_move_lease(self, shopping_list_uuid: str | None) -> None:
+        self.connection.execute(
+            "DELETE FROM move_leases WHERE shopping_list_key = ? AND worker_id = ?",
+            (_key(shopping_list_uuid), self.worker_id),
+        )
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[None]:
+        # Locks the database for writing right away, so two workers can not claim the same move
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+
+    def close(self) -> None:
+        self.connection.close()
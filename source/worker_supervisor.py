@@ -0,0 +1,92 @@
+import os
+import signal
+import subprocess  # nosec: B404
+import sys
+import tempfile
+import time
+from types import FrameType
+
+from source.environment_variable_getter import EnvironmentVariableGetter
+from source.logger_mixin import LoggerMixin
+from source.worker_state import WorkerState
+
+WORKER_POLL_SECONDS = 1
+# A worker that exits earlier failed during its startup, restarting it would most likely fail again
+MIN_WORKER_UPTIME_SECONDS = 10
+
+
+class WorkerSupervisor(LoggerMixin):
+    """
+    Runs the webserver in HTTP_WORKERS processes that share the port, restarts the ones that crash and stops all of
+    them on SIGTERM. The workers coordinate the moves of the shopping lists through the SQLite file in
+    WORKER_STATE_FILE.
+    """
+
+    def __init__(self, number_of_workers: int):
+        super().__init__()
+
+        self.number_of_workers = number_of_workers
+        self.worker_state_file = EnvironmentVariableGetter.get("WORKER_STATE_FILE", "") or os.path.join(
+            tempfile.gettempdir(), f"mealie-bring-api-{EnvironmentVariableGetter.get('HTTP_PORT', 8742)}.sqlite3"
+        )
+        self.workers: dict[int, subprocess.Popen] = {}
+        self.started_at: dict[int, float] = {}
+        self.stopping = False
+
+    def run(self) -> int:
+        if EnvironmentVariableGetter.get("HTTP_SERVER_MODE", "flask").lower() != "async":
+            self.log.critical("HTTP_WORKERS requires HTTP_SERVER_MODE=async, the Flask server can not share its port")
+            return 1
+
+        # The workers of an earlier run can not be moving a shopping list anymore, their pending moves are resumed
+        worker_state = WorkerState(self.worker_state_file, "supervisor")
+        worker_state.clear_leases()
+        worker_state.close()
+
+        signal.signal(signal.SIGTERM, self._handle_stop_signal)
+        signal.signal(signal.SIGINT, self._handle_stop_signal)
+
+        self.log.info(f"Starting {self.number_of_workers} workers sharing the state in {self.worker_state_file}")
+        for worker_id in range(1, self.number_of_workers + 1):
+            self._start_worker(worker_id)
+
+        exit_code = 0
+        while not self.stopping:
+            time.sleep(WORKER_POLL_SECONDS)
+            for worker_id, worker in list(self.workers.items()):
+                if self.stopping or worker.poll() is None:
+                    continue
+                if time.monotonic() - self.started_at[worker_id] < MIN_WORKER_UPTIME_SECONDS:
+                    self.log.critical(f"Worker {worker_id} exited during its startup with code {worker.returncode}")
+                    exit_code = 1
+                    self._stop_workers()
+                    break
+                self.log.warning(f"Worker {worker_id} exited with code {worker.returncode}, restarting it")
+                self._start_worker(worker_id)
+
+        for worker in self.workers.values():
+            worker.wait()
+        return exit_code
+
+    def _start_worker(self, worker_id: int) -> None:
+        environment = {
+            **os.environ,
+            "HTTP_WORKERS": "1",
+            "HTTP_WORKER_ID": str(worker_id),
+            "WORKER_STATE_FILE": self.worker_state_file,
+        }
+        self.workers[worker_id] = subprocess.Popen(  # nosec: B603
+            [sys.executable, "-m", "source.mealie_bring_api"], env=environment
+        )
+        self.started_at[worker_id] = time.monotonic()
+
+    def _handle_stop_signal(self, signal_number: int, _frame: FrameType) -> None:
+        self.log.info(f"Received {signal.Signals(signal_number).name}. Stopping the workers...")
+        self._stop_workers()
+
+    def _stop_workers(self) -> None:
+        self.stopping = True
+        for worker in self.workers.values():
+            if worker.poll() is None:
+                # Every worker flushes its pending moves and updates of Bring before it exits
+                worker.send_signal(signal.SIGTERM)
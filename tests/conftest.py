@@ -1,7 +1,16 @@
 import pytest
+from source import ingredient
 from source.ingredient import Ingredient
 
 
+@pytest.fixture(autouse=True)
+def clear_cached_unit_names():
+    # The units resolved by one test must not be reused by the next one
+    ingredient._cached_unit_names.clear()
+    yield
+    ingredient._cached_unit_names.clear()
+
+
 @pytest.fixture
 def food_name_singular() -> str:
     return "Berry"
@@ -0,0 +1,85 @@
+import json
+import os
+import time
+
+import pytest
+from source.bring_cache import BringCache
+
+
+@pytest.fixture
+def cache_path(tmp_path) -> str:
+    return str(tmp_path / "bring_cache.json")
+
+
+@pytest.fixture
+def bring_cache(cache_path: str) -> BringCache:
+    return BringCache(cache_path, ttl_seconds=60)
+
+
+@pytest.fixture
+def session() -> dict:
+    return {"headers": {"Authorization": "Bearer token"}, "expires_at": time.time() + 3600}
+
+
+def test_store_and_load(bring_cache, session):
+    bring_cache.store("user@example.com", ["My List"], {"My List": "list-uuid"}, session)
+
+    cache = bring_cache.load("user@example.com", ["My List"])
+
+    assert cache["list_uuids"] == {"My List": "list-uuid"}
+    assert cache["headers"] == {"Authorization": "Bearer token"}
+
+
+def test_store_only_allows_owner_to_read(bring_cache, cache_path, session):
+    bring_cache.store("user@example.com", ["My List"], {"My List": "list-uuid"}, session)
+
+    assert os.stat(cache_path).st_mode & 0o777 == 0o600
+
+
+def test_load_without_file(bring_cache):
+    assert bring_cache.load("user@example.com", ["My List"]) is None
+
+
+def test_load_ignores_unreadable_file(bring_cache, cache_path, caplog):
+    with open(cache_path, "w") as cache_file:
+        cache_file.write("{not json")
+
+    assert bring_cache.load("user@example.com", ["My List"]) is None
+    assert "Ignoring the unreadable Bring cache" in caplog.text
+
+
+@pytest.mark.parametrize(
+    "username, list_names",
+    [("other@example.com", ["My List"]), ("user@example.com", ["Other"]), ("user@example.com", ["My List", "Other"])],
+)
+def test_load_ignores_cache_of_other_user_or_lists(bring_cache, session, username, list_names):
+    bring_cache.store("user@example.com", ["My List"], {"My List": "list-uuid"}, session)
+
+    assert bring_cache.load(username, list_names) is None
+
+
+def test_load_ignores_expired_cache(bring_cache, cache_path, session):
+    bring_cache.store("user@example.com", ["My List"], {"My List": "list-uuid"}, session)
+    with open(cache_path) as cache_file:
+        cache = json.load(cache_file)
+    cache["created_at"] -= 120
+    with open(cache_path, "w") as cache_file:
+        json.dump(cache, cache_file)
+
+    assert bring_cache.load("user@example.com", ["My List"]) is None
+
+
+def test_load_ignores_expired_token(bring_cache, session):
+    session["expires_at"] = time.time() - 1
+    bring_cache.store("user@example.com", ["My List"], {"My List": "list-uuid"}, session)
+
+    assert bring_cache.load("user@example.com", ["My List"]) is None
+
+
+def test_invalidate(bring_cache, cache_path, session):
+    bring_cache.store("user@example.com", ["My List"], {"My List": "list-uuid"}, session)
+
+    bring_cache.invalidate()
+
+    assert not os.path.exists(cache_path)
+    bring_cache.invalidate()
@@ -0,0 +1,383 @@
+import asyncio
+import logging
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import aiohttp
+import pytest
+from bring_api import BringAuthException, BringRequestException
+from source.bring_cache import BringCache
+from source.bring_handler import BringHandler
+from source.bring_rate_limiter import BringRateLimiter
+from source.ingredient import Ingredient
+from source.metrics import (
+    BRING_NOTIFY_SECONDS,
+    BRING_RATE_LIMITER_WAIT_SECONDS,
+    UPSTREAM_ERRORS,
+)
+
+
+@pytest.fixture
+def bring_handler():
+    with patch.object(BringHandler, "__init__", lambda self: None):
+        handler = BringHandler()
+    handler.log = logging.getLogger("BringHandler")
+    handler.username = "user@example.com"
+    handler.list_name = "My List"
+    handler.api_base_url = ""
+    handler.list_names = ["My List"]
+    handler.list_uuids = {"My List": "list-uuid"}
+    handler.skip_unchanged_items = False
+    handler.list_index_ttl_seconds = 30
+    handler.list_indexes = {}
+    handler.list_indexes_loaded_at = {}
+    handler.rate_limiter = BringRateLimiter(
+        rate_per_second=0, burst=10, max_concurrency=10, latency_target_seconds=5, retries=3
+    )
+    handler.login_lock = asyncio.Lock()
+    handler.cache = MagicMock(spec=BringCache)
+    handler.session = None
+    handler.bring = MagicMock()
+    handler.bring.batch_update_list = AsyncMock()
+    handler.bring.notify = AsyncMock()
+    return handler
+
+
+def not_found_exception() -> BringRequestException:
+    try:
+        raise BringRequestException("Request failed") from aiohttp.ClientResponseError(MagicMock(), (), status=404)
+    except BringRequestException as e:
+        return e
+
+
+def test_determine_list_uuids_restores_session_from_cache(bring_handler):
+    bring_handler.cache.load.return_value = {"list_uuids": {"My List": "cached-list-uuid"}}
+
+    with (
+        patch.object(bring_handler, "_restore_session", new_callable=AsyncMock) as mock_restore_session,
+        patch.object(bring_handler, "_login", new_callable=AsyncMock) as mock_login,
+    ):
+        list_uuids = asyncio.run(bring_handler.determine_list_uuids())
+
+    assert list_uuids == {"My List": "cached-list-uuid"}
+    bring_handler.cache.load.assert_called_once_with("user@example.com", ["My List"])
+    mock_restore_session.assert_awaited_once_with({"list_uuids": {"My List": "cached-list-uuid"}})
+    mock_login.assert_not_called()
+
+
+def test_determine_list_uuids_logs_in_and_stores_cache(bring_handler):
+    bring_handler.cache.load.return_value = None
+
+    with (
+        patch.object(bring_handler, "_login", new_callable=AsyncMock) as mock_login,
+        patch.object(bring_handler, "_find_list_uuids", new_callable=AsyncMock, return_value={"My List": "list-uuid"}),
+        patch.object(bring_handler, "_store_in_cache") as mock_store_in_cache,
+    ):
+        list_uuids = asyncio.run(bring_handler.determine_list_uuids())
+
+    assert list_uuids == {"My List": "list-uuid"}
+    mock_login.assert_awaited_once()
+    mock_store_in_cache.assert_called_once_with({"My List": "list-uuid"})
+
+
+def bring_lists_with(names_and_uuids: dict[str, str]) -> MagicMock:
+    bring_lists = []
+    for name, list_uuid in names_and_uuids.items():
+        bring_list = MagicMock(listUuid=list_uuid)
+        bring_list.name = name
+        bring_lists.append(bring_list)
+    return MagicMock(lists=bring_lists)
+
+
+def test_find_list_uuids_raises_if_list_does_not_exist(bring_handler):
+    bring_handler.list_names = ["My List", "Office"]
+    bring_handler.bring.load_lists = AsyncMock(return_value=bring_lists_with({"My List": "list-uuid"}))
+
+    with pytest.raises(RuntimeError, match='Can not find a list with the name "Office"'):
+        asyncio.run(bring_handler._find_list_uuids())
+
+
+def test_connect_resolves_all_lists_with_one_login(bring_handler):
+    bring_handler.cache = None
+    bring_handler.bring.load_lists = AsyncMock(
+        return_value=bring_lists_with({"My List": "list-uuid", "Office": "office-uuid", "Other": "other-uuid"})
+    )
+
+    with patch.object(bring_handler, "_login", new_callable=AsyncMock) as mock_login:
+        asyncio.run(bring_handler.connect(["Office", "My List"]))
+
+    mock_login.assert_awaited_once()
+    bring_handler.bring.load_lists.assert_awaited_once()
+    assert bring_handler.list_names == ["My List", "Office"]
+    assert bring_handler.list_uuids == {"My List": "list-uuid", "Office": "office-uuid"}
+
+
+def test_find_list_uuids_ignores_case(bring_handler):
+    bring_handler.bring.load_lists = AsyncMock(return_value=bring_lists_with({"my list": "list-uuid"}))
+
+    assert asyncio.run(bring_handler._find_list_uuids()) == {"My List": "list-uuid"}
+
+
+def test_store_in_cache_without_cache(bring_handler):
+    bring_handler.cache = None
+
+    bring_handler._store_in_cache({"My List": "list-uuid"})
+
+
+@pytest.mark.parametrize("exception", [BringAuthException("Unauthorized"), not_found_exception()])
+def test_add_items_logs_in_again_on_invalid_session_or_list(bring_handler, exception):
+    bring_handler.bring.batch_update_list.side_effect = [exception, None]
+
+    async def login_again(_failed_bring: MagicMock) -> None:
+        bring_handler.list_uuids = {"My List": "new-list-uuid"}
+
+    with patch.object(bring_handler, "_login_again", side_effect=login_again) as mock_login_again:
+        asyncio.run(bring_handler.add_items([]))
+
+    mock_login_again.assert_awaited_once()
+    assert bring_handler.bring.batch_update_list.call_args.args[0] == "new-list-uuid"
+
+
+def test_concurrent_requests_with_invalid_session_log_in_again_once(bring_handler):
+    bring_handler.bring.notify.side_effect = BringAuthException("Unauthorized")
+
+    async def login_again() -> None:
+        await asyncio.sleep(0.01)
+        bring_handler.bring = MagicMock()
+        bring_handler.bring.notify = AsyncMock()
+
+    async def notify_concurrently() -> None:
+        await asyncio.gather(*(bring_handler.notify_users_about_changes_in_list() for _ in range(4)))
+
+    with patch.object(bring_handler, "_replace_session", side_effect=login_again) as mock_replace_session:
+        asyncio.run(notify_concurrently())
+
+    mock_replace_session.assert_awaited_once()
+    assert bring_handler.bring.notify.await_count == 4
+
+
+def test_add_items_does_not_log_in_again_on_other_errors(bring_handler):
+    bring_handler.bring.batch_update_list.side_effect = BringRequestException("Request failed due to timeout")
+
+    with (
+        patch.object(bring_handler, "_login_again", new_callable=AsyncMock) as mock_login_again,
+        pytest.raises(BringRequestException),
+    ):
+        asyncio.run(bring_handler.add_items([]))
+
+    mock_login_again.assert_not_called()
+
+
+def test_failed_requests_are_counted(bring_handler):
+    bring_handler.bring.notify.side_effect = BringRequestException("Request failed due to timeout")
+    errors_before = UPSTREAM_ERRORS.values.get("bring", 0)
+
+    with pytest.raises(BringRequestException):
+        asyncio.run(bring_handler.notify_users_about_changes_in_list())
+
+    assert UPSTREAM_ERRORS.values["bring"] == errors_before + 1
+
+
+def test_failed_requests_for_the_list_index_are_counted(bring_handler):
+    bring_handler.skip_unchanged_items = True
+    bring_handler.bring.get_list = AsyncMock(side_effect=BringRequestException("Request failed due to timeout"))
+    errors_before = UPSTREAM_ERRORS.values.get("bring", 0)
+
+    with pytest.raises(BringRequestException):
+        asyncio.run(bring_handler.add_items([Ingredient("Butter", "60 Gramm")]))
+
+    assert UPSTREAM_ERRORS.values["bring"] == errors_before + 1
+
+
+def test_wait_for_the_rate_limiter_is_not_part_of_the_latency(bring_handler):
+    bring_handler.rate_limiter.paused_until = time.monotonic() + 0.05
+    latency_before, wait_before = BRING_NOTIFY_SECONDS.sum, BRING_RATE_LIMITER_WAIT_SECONDS.sum
+
+    asyncio.run(bring_handler.notify_users_about_changes_in_list())
+
+    assert BRING_NOTIFY_SECONDS.sum - latency_before < 0.05
+    assert BRING_RATE_LIMITER_WAIT_SECONDS.sum - wait_before >= 0.04
+
+
+def test_add_items_retries_when_bring_is_unavailable(bring_handler):
+    try:
+        raise BringRequestException("Request failed") from aiohttp.ClientResponseError(
+            MagicMock(), (), status=503, headers={"Retry-After": "0"}
+        )
+    except BringRequestException as e:
+        bring_handler.bring.batch_update_list.side_effect = [e, None]
+
+    with patch.object(bring_handler, "_login_again", new_callable=AsyncMock) as mock_login_again:
+        asyncio.run(bring_handler.add_items([Ingredient("Butter", "")]))
+
+    assert bring_handler.bring.batch_update_list.await_count == 2
+    assert bring_handler.rate_limiter.retried == 1
+    mock_login_again.assert_not_called()
+
+
+def test_notify_users_logs_in_again_on_invalid_session(bring_handler):
+    bring_handler.bring.notify.side_effect = [BringAuthException("Unauthorized"), None]
+
+    with patch.object(bring_handler, "_login_again", new_callable=AsyncMock) as mock_login_again:
+        asyncio.run(bring_handler.notify_users_about_changes_in_list())
+
+    mock_login_again.assert_awaited_once()
+    assert bring_handler.bring.notify.await_count == 2
+
+
+def test_login_again_invalidates_cache(bring_handler):
+    with (
+        patch.object(bring_handler, "_login", new_callable=AsyncMock),
+        patch.object(
+            bring_handler, "_find_list_uuids", new_callable=AsyncMock, return_value={"My List": "new-list-uuid"}
+        ),
+        patch.object(bring_handler, "_store_in_cache") as mock_store_in_cache,
+    ):
+        asyncio.run(bring_handler._login_again())
+
+    bring_handler.cache.invalidate.assert_called_once()
+    mock_store_in_cache.assert_called_once_with({"My List": "new-list-uuid"})
+    assert bring_handler.list_uuids == {"My List": "new-list-uuid"}
+
+
+def test_login_again_raises_if_list_does_not_exist_anymore(bring_handler):
+    with (
+        patch.object(bring_handler, "_login", new_callable=AsyncMock),
+        patch.object(bring_handler, "_find_list_uuids", new_callable=AsyncMock, side_effect=RuntimeError),
+        pytest.raises(RuntimeError),
+    ):
+        asyncio.run(bring_handler._login_again())
+
+
+def test_restore_session_sets_login_state_of_bring_client(bring_handler, monkeypatch):
+    monkeypatch.setenv("BRING_PASSWORD", "password")
+    cache = {
+        "user_uuid": "user-uuid",
+        "public_user_uuid": "public-user-uuid",
+        "headers": {"Authorization": "Bearer token", "X-BRING-COUNTRY": "DE"},
+        "user_locale": "de-DE",
+        "user_list_settings": {"list-uuid": {"listArticleLanguage": "de-DE"}},
+        "refresh_token": "refresh-token",  # nosec: B105
+        "expires_at": time.time() + 3600,
+    }
+
+    async def restore_session():
+        await bring_handler._restore_session(cache)
+        await bring_handler.logout()
+
+    asyncio.run(restore_session())
+
+    assert bring_handler.bring.uuid == "user-uuid"
+    assert bring_handler.bring.headers["Authorization"] == "Bearer token"
+    assert bring_handler.bring._Bring__refresh_token == "refresh-token"  # nosec: B105
+    assert not bring_handler.bring._token_expired
+
+
+@pytest.mark.parametrize(
+    "api_base_url, expected_url",
+    [("", "https://api.getbring.com/rest/"), ("http://127.0.0.1:8080/rest/", "http://127.0.0.1:8080/rest/")],
+)
+def test_create_session_points_bring_client_at_api_base_url(bring_handler, monkeypatch, api_base_url, expected_url):
+    monkeypatch.setenv("BRING_PASSWORD", "password")
+    bring_handler.api_base_url = api_base_url
+
+    async def create_session():
+        await bring_handler._create_session()
+        await bring_handler.logout()
+
+    asyncio.run(create_session())
+
+    assert str(bring_handler.bring.url) == expected_url
+
+
+def bring_list_with(items: dict[str, str]) -> MagicMock:
+    purchase = [MagicMock(itemId=item_id, specification=specification) for item_id, specification in items.items()]
+    return MagicMock(items=MagicMock(purchase=purchase))
+
+
+def test_add_items_sends_all_items_without_skipping(bring_handler):
+    bring_handler.bring.get_list = AsyncMock()
+
+    assert asyncio.run(bring_handler.add_items([Ingredient("Butter", "60 Gramm")])) is True
+
+    bring_handler.bring.get_list.assert_not_called()
+    bring_handler.bring.batch_update_list.assert_awaited_once()
+
+
+def test_add_items_skips_items_that_are_already_on_the_list(bring_handler):
+    bring_handler.skip_unchanged_items = True
+    bring_handler.bring.get_list = AsyncMock(return_value=bring_list_with({"Butter": "60 Gramm", "Zimt": ""}))
+
+    changed = asyncio.run(
+        bring_handler.add_items(
+            [Ingredient("Butter", "60 Gramm"), Ingredient("Zimt", None), Ingredient("Apfel", "1 Kilogramm")]
+        )
+    )
+
+    assert changed is True
+    sent_items = bring_handler.bring.batch_update_list.call_args.args[1]
+    assert [(item["itemId"], item["spec"]) for item in sent_items] == [("Apfel", "1 Kilogramm")]
+    assert bring_handler.list_indexes["My List"]["Apfel"] == "1 Kilogramm"
+
+
+def test_add_items_sends_items_with_changed_specification(bring_handler):
+    bring_handler.skip_unchanged_items = True
+    bring_handler.bring.get_list = AsyncMock(return_value=bring_list_with({"Butter": "60 Gramm"}))
+
+    assert asyncio.run(bring_handler.add_items([Ingredient("Butter", "120 Gramm")])) is True
+
+    bring_handler.bring.batch_update_list.assert_awaited_once()
+
+
+def test_add_items_does_not_send_anything_if_nothing_changed(bring_handler, caplog):
+    bring_handler.skip_unchanged_items = True
+    bring_handler.bring.get_list = AsyncMock(return_value=bring_list_with({"Butter": "60 Gramm"}))
+
+    async def add_twice() -> list[bool]:
+        return [await bring_handler.add_items([Ingredient("Butter", "60 Gramm")]) for _ in range(2)]
+
+    assert asyncio.run(add_twice()) == [False, False]
+    bring_handler.bring.get_list.assert_awaited_once()
+    bring_handler.bring.batch_update_list.assert_not_called()
+    assert "All 1 items are already on the list, skipping the update" in caplog.text
+
+
+def test_list_index_is_reloaded_after_ttl(bring_handler):
+    bring_handler.skip_unchanged_items = True
+    bring_handler.list_indexes = {"My List": {"Butter": "60 Gramm"}}
+    bring_handler.list_indexes_loaded_at = {"My List": time.monotonic() - 31}
+    bring_handler.bring.get_list = AsyncMock(return_value=bring_list_with({}))
+
+    assert asyncio.run(bring_handler.add_items([Ingredient("Butter", "60 Gramm")])) is True
+
+    bring_handler.bring.get_list.assert_awaited_once_with("list-uuid")
+
+
+def test_add_items_and_notify_other_list(bring_handler):
+    bring_handler.list_uuids["Office"] = "office-uuid"
+
+    async def add_and_notify():
+        await bring_handler.add_items([Ingredient("Butter", "60 Gramm")], "Office")
+        await bring_handler.notify_users_about_changes_in_list("Office")
+
+    asyncio.run(add_and_notify())
+
+    assert bring_handler.bring.batch_update_list.call_args.args[0] == "office-uuid"
+    assert bring_handler.bring.notify.call_args.args[0] == "office-uuid"
+
+
+def test_list_indexes_are_kept_per_list(bring_handler):
+    bring_handler.skip_unchanged_items = True
+    bring_handler.list_uuids["Office"] = "office-uuid"
+    bring_handler.bring.get_list = AsyncMock(
+        side_effect=lambda list_uuid: bring_list_with({"Butter": "60 Gramm"} if list_uuid == "list-uuid" else {})
+    )
+
+    async def add_to_both_lists() -> list[bool]:
+        return [
+            await bring_handler.add_items([Ingredient("Butter", "60 Gramm")]),
+            await bring_handler.add_items([Ingredient("Butter", "60 Gramm")], "Office"),
+        ]
+
+    assert asyncio.run(add_to_both_lists()) == [False, True]
+    assert bring_handler.bring.batch_update_list.call_args.args[0] == "office-uuid"
@@ -0,0 +1,218 @@
+import asyncio
+import sqlite3
+import time
+from unittest.mock import AsyncMock
+
+import pytest
+from source.bring_outbox import BringOutbox
+from source.ingredient import Ingredient
+
+
+@pytest.fixture
+def outbox_file(tmp_path):
+    return str(tmp_path / "outbox.sqlite")
+
+
+def add_failed_entry(outbox: BringOutbox, ingredients: list[Ingredient], list_name: str | None = None) -> int:
+    async def append_and_fail() -> int:
+        entry_id = await outbox.append(ingredients, list_name)
+        await outbox.mark_failed(entry_id, RuntimeError("Bring is down"))
+        return entry_id
+
+    return asyncio.run(append_and_fail())
+
+
+def test_pending_entries_survive_a_restart(outbox_file):
+    outbox = BringOutbox(outbox_file, 0)
+    entry_id = asyncio.run(outbox.append([Ingredient("Butter", "60 Gramm"), Ingredient("Salz", None)]))
+    asyncio.run(outbox.mark_done(asyncio.run(outbox.append([Ingredient("Mehl", "")]))))
+    outbox.close()
+
+    assert asyncio.run(BringOutbox(outbox_file, 0).pending()) == [
+        (entry_id, [Ingredient("Butter", "60 Gramm"), Ingredient("Salz", None)], None)
+    ]
+
+
+def test_entries_in_flight_are_not_pending(outbox_file):
+    outbox = BringOutbox(outbox_file, 0)
+    entry_id = asyncio.run(outbox.append([Ingredient("Butter", "")]))
+
+    assert asyncio.run(outbox.pending()) == []
+    asyncio.run(outbox.mark_failed(entry_id, RuntimeError("Bring is down")))
+    assert [pending_entry_id for pending_entry_id, _, _ in asyncio.run(outbox.pending())] == [entry_id]
+    assert outbox.failed.is_set()
+
+
+def test_replay_sends_pending_entries_and_removes_them(outbox_file):
+    outbox = BringOutbox(outbox_file, 0)
+    add_failed_entry(outbox, [Ingredient("Butter", "")])
+    send = AsyncMock()
+
+    asyncio.run(outbox._replay(send, time.time()))
+
+    send.assert_awaited_once_with([Ingredient("Butter", "")], None)
+    assert asyncio.run(outbox.pending()) == []
+
+
+def test_replay_sends_entries_to_their_list(outbox_file):
+    outbox = BringOutbox(outbox_file, 0)
+    add_failed_entry(outbox, [Ingredient("Butter", "")], "Office")
+    send = AsyncMock()
+
+    asyncio.run(outbox._replay(send, time.time()))
+
+    send.assert_awaited_once_with([Ingredient("Butter", "")], "Office")
+
+
+def test_outbox_of_older_version_is_migrated(outbox_file):
+    connection = sqlite3.connect(outbox_file)
+    connection.execute(
+        "CREATE TABLE outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, created_at REAL NOT NULL, ingredients TEXT NOT NULL)"
+    )
+    connection.execute('INSERT INTO outbox (created_at, ingredients) VALUES (0, \'[["Butter", ""]]\')')
+    connection.commit()
+    connection.close()
+
+    outbox = BringOutbox(outbox_file, 0)
+
+    assert asyncio.run(outbox.pending()) == [(1, [Ingredient("Butter", "")], None)]
+    asyncio.run(outbox.append([Ingredient("Mehl", "")], "Office"))
+
+
+def test_replay_keeps_entries_if_sending_fails(outbox_file, caplog):
+    outbox = BringOutbox(outbox_file, 0)
+    add_failed_entry(outbox, [Ingredient("Butter", "")])
+    add_failed_entry(outbox, [Ingredient("Mehl", "")])
+    send = AsyncMock(side_effect=RuntimeError("Bring is down"))
+
+    asyncio.run(outbox._replay(send, time.time()))
+
+    assert send.await_count == 2
+    assert len(asyncio.run(outbox.pending())) == 2
+    assert "Could not replay the update of Bring 1 from the outbox" in caplog.text
+
+
+def test_replay_continues_after_a_failed_entry(outbox_file):
+    outbox = BringOutbox(outbox_file, 0)
+    failing_entry_id = add_failed_entry(outbox, [Ingredient("Butter", "")])
+    add_failed_entry(outbox, [Ingredient("Mehl", "")])
+    send = AsyncMock(side_effect=[RuntimeError("Bring rejects the entry"), None])
+
+    asyncio.run(outbox._replay(send, time.time()))
+
+    send.assert_awaited_with([Ingredient("Mehl", "")], None)
+    assert [entry_id for entry_id, _, _ in asyncio.run(outbox.pending())] == [failing_entry_id]
+
+
+def test_failed_entry_is_retried_after_its_backoff(outbox_file):
+    outbox = BringOutbox(outbox_file, 10)
+    entry_id = add_failed_entry(outbox, [Ingredient("Butter", "")])
+    add_failed_entry(outbox, [Ingredient("Butter", "")])
+    outbox.connection.execute("UPDATE outbox SET next_attempt_at = NULL WHERE id != ?", (entry_id,))
+    send = AsyncMock(side_effect=RuntimeError("Bring is down"))
+
+    asyncio.run(outbox._replay(send, time.time()))
+
+    assert send.await_count == 1
+    attempts = dict(outbox.connection.execute("SELECT id, attempts FROM outbox"))
+    assert attempts == {entry_id: 1, entry_id + 1: 2}
+    next_attempt_at = outbox._next_attempt_at(time.time())
+    # The entry that failed first is due again first, the backoff of the other one was doubled
+    assert next_attempt_at == pytest.approx(time.time() + 10, abs=1)
+
+
+def test_entry_is_kept_as_dead_letter_after_the_last_attempt(outbox_file, caplog):
+    outbox = BringOutbox(outbox_file, 0, max_attempts=2)
+    entry_id = add_failed_entry(outbox, [Ingredient("Butter", "")])
+    send = AsyncMock(side_effect=RuntimeError("Bring rejects the entry"))
+
+    asyncio.run(outbox._replay(send, time.time()))
+    asyncio.run(outbox._replay(send, time.time()))
+
+    send.assert_awaited_once()
+    assert asyncio.run(outbox.pending()) == []
+    dead_at, last_error = outbox.connection.execute(
+        "SELECT dead_at, last_error FROM outbox WHERE id = ?", (entry_id,)
+    ).fetchone()
+    assert dead_at is not None
+    assert last_error == "RuntimeError('Bring rejects the entry')"
+    assert "Giving up on the update of Bring 1 from the outbox after 2 attempts" in caplog.text
+
+
+def test_replay_forever_retries_with_backoff(outbox_file):
+    outbox = BringOutbox(outbox_file, 0.01)
+    add_failed_entry(outbox, [Ingredient("Butter", "")])
+    send = AsyncMock(side_effect=[RuntimeError("Bring is down"), RuntimeError("Bring is down"), None])
+
+    async def replay_until_sent() -> None:
+        replay_task = asyncio.ensure_future(outbox.replay_forever(send))
+        while await outbox.pending():
+            await asyncio.sleep(0.01)
+        replay_task.cancel()
+
+    asyncio.run(asyncio.wait_for(replay_until_sent(), 5))
+
+    assert send.await_count == 3
+
+
+def test_entries_sent_by_another_worker_are_not_pending(outbox_file):
+    first_worker = BringOutbox(outbox_file, 0, claim_seconds=60)
+    second_worker = BringOutbox(outbox_file, 0, claim_seconds=60)
+    entry_id = asyncio.run(first_worker.append([Ingredient("Butter", "")]))
+
+    assert asyncio.run(second_worker.pending()) == []
+    asyncio.run(first_worker.mark_failed(entry_id, RuntimeError("Bring is down")))
+    assert [pending_entry_id for pending_entry_id, _, _ in asyncio.run(second_worker.pending())] == [entry_id]
+
+
+def test_entry_is_claimed_by_one_worker(outbox_file):
+    first_worker = BringOutbox(outbox_file, 0, claim_seconds=60)
+    second_worker = BringOutbox(outbox_file, 0, claim_seconds=60)
+    entry_id = add_failed_entry(first_worker, [Ingredient("Butter", "")])
+
+    assert first_worker._claim(entry_id)
+    assert not second_worker._claim(entry_id)
+
+
+def test_replay_forever_takes_over_entries_of_a_crashed_worker(outbox_file):
+    crashed_worker = BringOutbox(outbox_file, 0, claim_seconds=0.05)
+    asyncio.run(crashed_worker.append([Ingredient("Butter", "")]))
+    crashed_worker.close()
+    outbox = BringOutbox(outbox_file, 0, claim_seconds=0.05)
+    send = AsyncMock()
+
+    async def replay_until_sent() -> None:
+        replay_task = asyncio.ensure_future(outbox.replay_forever(send))
+        while not send.await_count:
+            await asyncio.sleep(0.01)
+        replay_task.cancel()
+
+    asyncio.run(asyncio.wait_for(replay_until_sent(), 5))
+
+    send.assert_awaited_once_with([Ingredient("Butter", "")], None)
+    assert asyncio.run(outbox.pending()) == []
+
+
+def test_outbox_is_opened_in_wal_mode(outbox_file):
+    outbox = BringOutbox(outbox_file, 0)
+
+    assert outbox.connection.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+
+
+def test_waiting_for_the_lock_of_another_worker_does_not_block_the_event_loop(outbox_file):
+    outbox = BringOutbox(outbox_file, 0)
+    other_worker = sqlite3.connect(outbox_file, isolation_level=None)
+    other_worker.execute("BEGIN IMMEDIATE")
+
+    async def append_while_locked() -> int:
+        append_task = asyncio.ensure_future(outbox.append([Ingredient("Butter", "")]))
+        # The event loop keeps running while the append waits for the lock
+        await asyncio.sleep(0.05)
+        assert not append_task.done()
+        other_worker.execute("COMMIT")
+        return await append_task
+
+    entry_id = asyncio.run(asyncio.wait_for(append_while_locked(), 5))
+
+    asyncio.run(outbox.mark_failed(entry_id, RuntimeError("Bring is down")))
+    assert [pending_entry_id for pending_entry_id, _, _ in asyncio.run(outbox.pending())] == [entry_id]
@@ -0,0 +1,175 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import aiohttp
+import pytest
+from bring_api import BringRequestException
+from source import bring_rate_limiter
+from source.bring_rate_limiter import BringRateLimiter
+from source.metrics import BRING_THROTTLED
+
+
+def create_rate_limiter(
+    rate_per_second: float = 0,
+    burst: int = 10,
+    max_concurrency: int = 10,
+    latency_target_seconds: float = 5,
+    retries: int = 3,
+) -> BringRateLimiter:
+    return BringRateLimiter(rate_per_second, burst, max_concurrency, latency_target_seconds, retries)
+
+
+def throttled_exception(status: int, retry_after: str | None = None) -> BringRequestException:
+    headers = {"Retry-After": retry_after} if retry_after is not None else None
+    try:
+        raise BringRequestException("Request failed") from aiohttp.ClientResponseError(
+            MagicMock(), (), status=status, headers=headers
+        )
+    except BringRequestException as e:
+        return e
+
+
+def test_requests_in_flight_are_limited():
+    rate_limiter = create_rate_limiter(max_concurrency=2)
+    in_flight = []
+
+    async def request() -> None:
+        in_flight.append(rate_limiter.in_flight)
+        await asyncio.sleep(0.01)
+
+    async def run_requests() -> None:
+        await asyncio.gather(*(rate_limiter.run(request) for _ in range(5)))
+
+    asyncio.run(run_requests())
+
+    assert max(in_flight) == 2
+    assert rate_limiter.in_flight == 0
+    assert rate_limiter.waiting == 0
+
+
+def test_cancelled_waiting_caller_does_not_release_a_slot():
+    rate_limiter = create_rate_limiter(max_concurrency=1)
+    request_started = asyncio.Event()
+    finish_request = asyncio.Event()
+
+    async def request() -> None:
+        request_started.set()
+        await finish_request.wait()
+
+    async def run_requests() -> None:
+        running = asyncio.create_task(rate_limiter.run(request))
+        await request_started.wait()
+        waiting = asyncio.create_task(rate_limiter.run(AsyncMock()))
+        await asyncio.sleep(0)
+        assert rate_limiter.waiting == 1
+
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert rate_limiter.in_flight == 1
+
+        finish_request.set()
+        await running
+
+    asyncio.run(run_requests())
+
+    assert rate_limiter.in_flight == 0
+    assert rate_limiter.waiting == 0
+
+
+def test_requests_beyond_the_burst_wait_for_a_token():
+    rate_limiter = create_rate_limiter(rate_per_second=50, burst=1)
+
+    async def run_requests() -> None:
+        await asyncio.gather(*(rate_limiter.run(AsyncMock()) for _ in range(3)))
+
+    start = time.monotonic()
+    asyncio.run(run_requests())
+
+    assert time.monotonic() - start >= 0.035
+
+
+def test_throttled_request_is_retried_after_retry_after():
+    rate_limiter = create_rate_limiter()
+    request = AsyncMock(side_effect=[throttled_exception(429, "0.05"), "result"])
+    throttled_before = BRING_THROTTLED.values.get("rate_limited", 0)
+
+    start = time.monotonic()
+    assert asyncio.run(rate_limiter.run(request)) == "result"
+
+    assert time.monotonic() - start >= 0.05
+    assert request.await_count == 2
+    assert rate_limiter.concurrency_limit == pytest.approx(5.2)
+    assert (rate_limiter.throttled, rate_limiter.retried) == (1, 1)
+    assert BRING_THROTTLED.values["rate_limited"] == throttled_before + 1
+
+
+def test_throttled_request_fails_after_all_retries(monkeypatch):
+    monkeypatch.setattr(bring_rate_limiter, "BACKOFF_SECONDS", 0.001)
+    rate_limiter = create_rate_limiter(retries=2)
+    request = AsyncMock(side_effect=throttled_exception(503))
+
+    with pytest.raises(BringRequestException):
+        asyncio.run(rate_limiter.run(request))
+
+    assert request.await_count == 3
+    assert rate_limiter.in_flight == 0
+    # Failures in quick succession only halve the window once
+    assert rate_limiter.concurrency_limit == 5
+
+
+def test_other_errors_are_not_retried():
+    rate_limiter = create_rate_limiter()
+    request = AsyncMock(side_effect=throttled_exception(400))
+
+    with pytest.raises(BringRequestException):
+        asyncio.run(rate_limiter.run(request))
+
+    assert request.await_count == 1
+    assert rate_limiter.in_flight == 0
+    assert rate_limiter.concurrency_limit == 10
+
+
+def test_slow_request_halves_the_window(caplog):
+    rate_limiter = create_rate_limiter(latency_target_seconds=0)
+
+    async def request() -> None:
+        await asyncio.sleep(0.001)
+
+    asyncio.run(rate_limiter.run(request))
+
+    assert rate_limiter.concurrency_limit == 5
+    assert "Reducing the requests to Bring in flight to 5" in caplog.text
+
+
+def test_successful_requests_widen_the_window_up_to_the_maximum():
+    rate_limiter = create_rate_limiter(max_concurrency=5)
+    rate_limiter.concurrency_limit = 4
+
+    async def run_requests() -> None:
+        for _ in range(4):
+            await rate_limiter.run(AsyncMock())
+
+    asyncio.run(run_requests())
+    assert rate_limiter.concurrency_limit == pytest.approx(4.92, abs=0.01)
+
+    asyncio.run(run_requests())
+    assert rate_limiter.concurrency_limit == 5
+
+
+def test_to_dict():
+    rate_limiter = create_rate_limiter(rate_per_second=2, burst=4)
+
+    assert rate_limiter.to_dict() == {
+        "rate_per_second": 2,
+        "burst": 4,
+        "tokens": 4,
+        "concurrency_limit": 10,
+        "max_concurrency": 10,
+        "in_flight": 0,
+        "waiting": 0,
+        "paused_for_seconds": 0,
+        "throttled": 0,
+        "retried": 0,
+    }
@@ -0,0 +1,103 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, call
+
+import pytest
+from source.bring_handler import BringHandler
+from source.bring_update_coalescer import BringUpdateCoalescer
+from source.ingredient import Ingredient
+
+
+@pytest.fixture
+def bring_handler():
+    handler = MagicMock(spec=BringHandler)
+    handler.add_items = AsyncMock(return_value=True)
+    handler.notify_users_about_changes_in_list = AsyncMock()
+    return handler
+
+
+def test_requests_within_window_are_coalesced(bring_handler, caplog):
+    coalescer = BringUpdateCoalescer(bring_handler, 0.05)
+    butter, flour, sugar = Ingredient("Butter", "60 Gramm"), Ingredient("Mehl", "200 Gramm"), Ingredient("Zucker", "")
+
+    async def add_concurrently() -> list[int]:
+        return await asyncio.gather(coalescer.add([butter, flour]), coalescer.add([sugar]))
+
+    assert asyncio.run(add_concurrently()) == [2, 2]
+    bring_handler.add_items.assert_awaited_once_with([butter, flour, sugar], None)
+    bring_handler.notify_users_about_changes_in_list.assert_awaited_once()
+    assert "Coalesced 2 requests with 3 ingredients into one update of Bring" in caplog.text
+
+
+def test_requests_after_window_are_sent_separately(bring_handler):
+    coalescer = BringUpdateCoalescer(bring_handler, 0)
+
+    async def add_one_after_another() -> list[int]:
+        return [await coalescer.add([Ingredient("Butter", "")]), await coalescer.add([Ingredient("Mehl", "")])]
+
+    assert asyncio.run(add_one_after_another()) == [1, 1]
+    assert bring_handler.add_items.await_count == 2
+    assert bring_handler.notify_users_about_changes_in_list.await_count == 2
+
+
+def test_errors_are_raised_in_every_coalesced_request(bring_handler):
+    coalescer = BringUpdateCoalescer(bring_handler, 0.05)
+    bring_handler.add_items.side_effect = RuntimeError("Bring is down")
+
+    async def add_concurrently() -> list:
+        return await asyncio.gather(
+            coalescer.add([Ingredient("Butter", "")]), coalescer.add([Ingredient("Mehl", "")]), return_exceptions=True
+        )
+
+    results = asyncio.run(add_concurrently())
+
+    assert [str(result) for result in results] == ["Bring is down", "Bring is down"]
+    bring_handler.notify_users_about_changes_in_list.assert_not_called()
+
+
+def test_flush_sends_pending_requests_without_waiting_for_window(bring_handler):
+    coalescer = BringUpdateCoalescer(bring_handler, 60)
+
+    async def add_and_flush() -> int:
+        pending_request = asyncio.ensure_future(coalescer.add([Ingredient("Butter", "")]))
+        await asyncio.sleep(0)
+        await coalescer.flush()
+        return await asyncio.wait_for(pending_request, 1)
+
+    assert asyncio.run(add_and_flush()) == 1
+    bring_handler.add_items.assert_awaited_once()
+
+
+def test_users_are_not_notified_if_the_list_did_not_change(bring_handler):
+    coalescer = BringUpdateCoalescer(bring_handler, 0)
+    bring_handler.add_items.return_value = False
+
+    assert asyncio.run(coalescer.add([Ingredient("Butter", "")])) == 1
+    bring_handler.notify_users_about_changes_in_list.assert_not_called()
+
+
+def test_requests_for_different_lists_are_not_coalesced(bring_handler):
+    coalescer = BringUpdateCoalescer(bring_handler, 0.05)
+    butter, flour = Ingredient("Butter", "60 Gramm"), Ingredient("Mehl", "200 Gramm")
+
+    async def add_concurrently() -> list[int]:
+        return await asyncio.gather(coalescer.add([butter]), coalescer.add([flour], "Office"), coalescer.add([butter]))
+
+    assert asyncio.run(add_concurrently()) == [2, 1, 2]
+    bring_handler.add_items.assert_has_awaits([call([butter, butter], None), call([flour], "Office")], any_order=True)
+    bring_handler.notify_users_about_changes_in_list.assert_has_awaits([call(None), call("Office")], any_order=True)
+
+
+def test_flush_sends_pending_requests_of_all_lists(bring_handler):
+    coalescer = BringUpdateCoalescer(bring_handler, 60)
+
+    async def add_and_flush() -> list[int]:
+        pending_requests = [
+            asyncio.ensure_future(coalescer.add([Ingredient("Butter", "")])),
+            asyncio.ensure_future(coalescer.add([Ingredient("Mehl", "")], "Office")),
+        ]
+        await asyncio.sleep(0)
+        await coalescer.flush()
+        return await asyncio.wait_for(asyncio.gather(*pending_requests), 1)
+
+    assert asyncio.run(add_and_flush()) == [1, 1]
+    assert bring_handler.add_items.await_count == 2
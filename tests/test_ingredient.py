@@ -1,8 +1,14 @@
+import dataclasses
+
 import pytest
 from source.ingredient import (
     Ingredient,
     IngredientWithAmountsDisabled,
+    Quantity,
+    ScaledIngredientData,
+    UnitNames,
     get_value_of_dict_with_different_naming_conventions,
+    merge_duplicate_ingredients,
 )
 
 
@@ -186,3 +192,119 @@ def test_to_dict(food_name_singular):
 def test_get_value_of_dict_with_different_naming_conventions(input_dict, key, expected_value):
     result = get_value_of_dict_with_different_naming_conventions(input_dict, key)
     assert result == expected_value
+
+
+def test_merge_duplicate_ingredients_sums_quantities_of_same_food_and_unit(ingredient_raw_base_data):
+    second_occurrence = {**ingredient_raw_base_data, "food": {"name": "berry"}, "quantity": 2.0, "note": "fresh"}
+
+    merged_ingredients = merge_duplicate_ingredients([ingredient_raw_base_data, second_occurrence])
+
+    assert len(merged_ingredients) == 1
+    assert merged_ingredients[0]["quantity"] == 3.0
+    assert merged_ingredients[0]["note"] == "fresh"
+    assert Ingredient.from_raw_data(merged_ingredients[0], 2.0).specification == "6 Grams (fresh)"
+    assert ingredient_raw_base_data["quantity"] == 1.0
+
+
+def test_merge_duplicate_ingredients_keeps_different_units_and_ingredients_without_food(ingredient_raw_base_data):
+    in_kilograms = {**ingredient_raw_base_data, "unit": {"name": "Kilogram"}}
+    without_food = {"display": "Salt", "food": None, "note": "", "quantity": None, "unit": None}
+
+    merged_ingredients = merge_duplicate_ingredients(
+        [ingredient_raw_base_data, in_kilograms, without_food, dict(without_food)]
+    )
+
+    assert merged_ingredients == [ingredient_raw_base_data, in_kilograms, without_food, without_food]
+
+
+@pytest.mark.parametrize(
+    "first_quantity, second_quantity, expected_quantity",
+    [(None, None, None), (None, 2.0, 2.0), (1.5, None, 1.5), (1.5, 2.0, 3.5)],
+)
+def test_merge_duplicate_ingredients_with_missing_quantities(
+    ingredient_raw_base_data, first_quantity, second_quantity, expected_quantity
+):
+    first = {**ingredient_raw_base_data, "quantity": first_quantity}
+    second = {**ingredient_raw_base_data, "quantity": second_quantity}
+
+    assert merge_duplicate_ingredients([first, second])[0]["quantity"] == expected_quantity
+
+
+def test_scaled_ingredient_data_multiplies_only_the_quantity(ingredient_raw_base_data):
+    scaled_ingredient_data = ScaledIngredientData(ingredient_raw_base_data, 4.0)
+
+    assert scaled_ingredient_data["quantity"] == 4.0
+    assert scaled_ingredient_data["food"] is ingredient_raw_base_data["food"]
+    assert dict(scaled_ingredient_data) == {**ingredient_raw_base_data, "quantity": 4.0}
+    assert ingredient_raw_base_data["quantity"] == 1.0
+    assert Ingredient.from_raw_data(scaled_ingredient_data).specification == "4 Grams"
+
+
+@pytest.mark.parametrize("quantity", [None, 0.0])
+def test_scaled_ingredient_data_without_quantity(ingredient_raw_base_data, quantity):
+    ingredient_raw_base_data["quantity"] = quantity
+
+    assert ScaledIngredientData(ingredient_raw_base_data, 4.0)["quantity"] == quantity
+
+
+@pytest.mark.parametrize(
+    "value, scale, expected_scaled_value, expected_is_one, expected_formatted",
+    [
+        (None, 2.0, None, False, ""),
+        (0.0, 2.0, 0.0, False, ""),
+        (0.5, 2.0, 1.0, True, "1"),
+        (1.5, 1.0, 1.5, False, "1.5"),
+    ],
+)
+def test_quantity_is_computed_on_construction(value, scale, expected_scaled_value, expected_is_one, expected_formatted):
+    quantity = Quantity(value, scale)
+
+    assert (quantity.scaled_value, quantity.is_one, quantity.formatted) == (
+        expected_scaled_value,
+        expected_is_one,
+        expected_formatted,
+    )
+
+
+@pytest.mark.parametrize(
+    "instance",
+    [Quantity(1.0), Ingredient("Butter", "60 Gramm"), IngredientWithAmountsDisabled("1 Prise Salz")],
+)
+def test_value_objects_are_slotted_and_frozen(instance):
+    assert not hasattr(instance, "__dict__")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        setattr(instance, dataclasses.fields(instance)[0].name, None)
+
+
+def test_unit_names_are_cached_by_unit_id(unit):
+    unit["id"] = "unit-id-gram"
+
+    unit_names = UnitNames.of(unit)
+
+    assert UnitNames.of(dict(unit)) is unit_names
+    assert UnitNames.of({**unit, "id": None}) is not unit_names
+
+
+@pytest.mark.parametrize(
+    "changed_fields, expected_singular",
+    [({"name": "Gramm"}, " Gramm"), ({"use_abbreviation": True}, "g"), ({"abbreviation": "gr"}, " Gram")],
+)
+def test_unit_names_are_resolved_again_if_the_unit_changed(unit, changed_fields, expected_singular):
+    unit["id"] = "unit-id-gram"
+    unit_names = UnitNames.of(unit)
+
+    changed_unit_names = UnitNames.of({**unit, **changed_fields})
+
+    assert changed_unit_names is not unit_names
+    assert changed_unit_names.singular == expected_singular
+
+
+@pytest.mark.parametrize(
+    "quantity, use_abbreviation, expected_unit",
+    [(Quantity(1.0), False, " Gram"), (Quantity(2.0), False, " Grams"), (Quantity(None), False, "Grams")]
+    + [(Quantity(1.0), True, "g"), (Quantity(2.0), True, "g")],
+)
+def test_unit_names_formatted(unit, quantity, use_abbreviation, expected_unit):
+    unit["use_abbreviation"] = use_abbreviation
+
+    assert UnitNames.from_raw_data(unit).formatted(quantity) == expected_unit
@@ -150,9 +150,12 @@ def _get_item_names_of_bring_list() -> list[str]:
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
 
-    bring_handler = BringHandler(loop)
+    bring_handler = BringHandler()
+    loop.run_until_complete(bring_handler.connect())
     try:
-        items = loop.run_until_complete(bring_handler.bring.get_list(bring_handler.list_uuid)).items.purchase
+        items = loop.run_until_complete(
+            bring_handler.bring.get_list(bring_handler.list_uuids[bring_handler.list_name])
+        ).items.purchase
         return [item.itemId for item in items]
     finally:
         loop.run_until_complete(bring_handler.logout())
@@ -163,12 +166,17 @@ def _clean_bring_list() -> None:
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
 
-    bring_handler = BringHandler(loop)
+    bring_handler = BringHandler()
+    loop.run_until_complete(bring_handler.connect())
 
-    for item in loop.run_until_complete(bring_handler.bring.get_list(bring_handler.list_uuid)).items.purchase:
+    for item in loop.run_until_complete(
+        bring_handler.bring.get_list(bring_handler.list_uuids[bring_handler.list_name])
+    ).items.purchase:
         loop.run_until_complete(
             bring_handler.bring.remove_item(
-                list_uuid=bring_handler.list_uuid, item_name="placeholder", item_uuid=item.uuid
+                list_uuid=bring_handler.list_uuids[bring_handler.list_name],
+                item_name="placeholder",
+                item_uuid=item.uuid,
             )
         )
 
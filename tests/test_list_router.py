@@ -0,0 +1,41 @@
+import pytest
+from source.list_router import ListRouter, load_routes
+
+
+@pytest.fixture
+def list_router(monkeypatch):
+    monkeypatch.setenv("BRING_LIST_ROUTES", '{"office": "Office", "family": "Family"}')
+    monkeypatch.setenv("MEALIE_SHOPPING_LIST_ROUTES", '{"office-uuid": "Office", "garden-uuid": "Garden"}')
+    return ListRouter()
+
+
+def test_list_names_contain_every_routed_list_once(list_router):
+    assert list_router.list_names == ["Office", "Family", "Garden"]
+
+
+def test_list_for_recipe(list_router):
+    assert list_router.list_for_recipe("office") == "Office"
+    assert list_router.list_for_recipe(None) is None
+    assert list_router.list_for_recipe("") is None
+    with pytest.raises(KeyError):
+        list_router.list_for_recipe("unknown")
+
+
+def test_list_for_shopping_list(list_router):
+    assert list_router.list_for_shopping_list("garden-uuid") == "Garden"
+    assert list_router.list_for_shopping_list("other-uuid") is None
+    assert list_router.list_for_shopping_list(None) is None
+
+
+def test_load_routes_without_variable(monkeypatch):
+    monkeypatch.delenv("BRING_LIST_ROUTES", raising=False)
+
+    assert load_routes("BRING_LIST_ROUTES") == {}
+
+
+@pytest.mark.parametrize("routes", ['{"office": ', '["Office"]', '{"office": 1}'])
+def test_load_routes_rejects_invalid_routes(monkeypatch, routes):
+    monkeypatch.setenv("BRING_LIST_ROUTES", routes)
+
+    with pytest.raises(RuntimeError, match="BRING_LIST_ROUTES"):
+        load_routes("BRING_LIST_ROUTES")
@@ -1,29 +1,38 @@
 import asyncio
 import copy
-from unittest.mock import AsyncMock, MagicMock, patch
+import json
+import threading
+from unittest.mock import ANY, AsyncMock, MagicMock, patch
 
+import aiohttp
 import pytest
+from aiohttp.test_utils import TestClient, TestServer
 from source.bring_handler import BringHandler
+from source.bring_outbox import BringOutbox
+from source.bring_rate_limiter import BringRateLimiter
 from source.ingredient import Ingredient
 from source.logger_mixin import LoggerMixin
 from source.mealie_bring_api import Flask, MealieBringAPI
 from source.mealie_handler import MealieHandler
-
-
-@pytest.fixture
-def mock_event_loop():
-    loop = MagicMock(spec=asyncio.AbstractEventLoop)
-    loop.run_until_complete = MagicMock()
-    loop.stop = MagicMock()
-    return loop
+from source.metrics import (
+    DEBOUNCE_WAIT_SECONDS,
+    EVENT_LOOP_WAIT_SECONDS,
+    MOVE_DEBOUNCE_EVENTS,
+)
+from source.recipe_queue import RecipeQueue
+from source.worker_state import WorkerState
 
 
 @pytest.fixture
 def mock_bring_handler():
     handler = MagicMock(spec=BringHandler)
-    handler.add_items = AsyncMock()
+    handler.connect = AsyncMock()
+    handler.add_items = AsyncMock(return_value=True)
     handler.notify_users_about_changes_in_list = AsyncMock()
     handler.logout = AsyncMock()
+    handler.rate_limiter = BringRateLimiter(
+        rate_per_second=0, burst=10, max_concurrency=10, latency_target_seconds=5, retries=3
+    )
     return handler
 
 
@@ -37,18 +46,35 @@ def mock_flask_app():
 
 @pytest.fixture
 def mock_mealie_handler():
-    return MagicMock(spec=MealieHandler)
+    handler = MagicMock(spec=MealieHandler)
+    handler.mealie_is_setup = True
+    handler.connect = AsyncMock()
+    return handler
 
 
-@pytest.fixture
-def mealie_app(monkeypatch, mock_event_loop, mock_bring_handler, mock_flask_app, mock_mealie_handler):
+def patch_mealie_bring_api(monkeypatch, mock_bring_handler, mock_flask_app, mock_mealie_handler):
+    monkeypatch.setenv("BRING_AGGREGATION_WINDOW_SECONDS", "0")
     monkeypatch.setattr(MealieBringAPI, "_create_logger", lambda self: LoggerMixin())
-    monkeypatch.setattr(MealieBringAPI, "_create_event_loop", lambda self: mock_event_loop)
-    monkeypatch.setattr(MealieBringAPI, "_create_bring_handler", lambda self, loop: mock_bring_handler)
+    monkeypatch.setattr(MealieBringAPI, "_create_bring_handler", lambda self: mock_bring_handler)
     monkeypatch.setattr(MealieBringAPI, "_create_app", lambda self: mock_flask_app)
     monkeypatch.setattr("source.mealie_bring_api.MealieHandler", lambda: mock_mealie_handler)
 
-    return MealieBringAPI()
+
+def stop_event_loop(app):
+    if app.loop.is_running():
+        app.loop.call_soon_threadsafe(app.loop.stop)
+    app.loop_thread.join(timeout=5)
+    app.loop.close()
+
+
+@pytest.fixture
+def mealie_app(monkeypatch, mock_bring_handler, mock_flask_app, mock_mealie_handler):
+    patch_mealie_bring_api(monkeypatch, mock_bring_handler, mock_flask_app, mock_mealie_handler)
+
+    app = MealieBringAPI()
+    yield app
+
+    stop_event_loop(app)
 
 
 def test_process_recipe_data_with_enabled_amount(mealie_app, example_request):
@@ -71,6 +97,15 @@ def test_process_recipe_data_with_enabled_amount(mealie_app, example_request):
     assert result == expected_ingredients
 
 
+def test_process_recipe_data_merges_duplicate_ingredients(mealie_app, example_request, ingredient_raw_base_data):
+    example_request["content"]["recipe_ingredient"].append({**ingredient_raw_base_data, "quantity": 2.0})
+
+    result = mealie_app.process_recipe_data(example_request)
+
+    assert [ingredient.name for ingredient in result].count("Berries") == 1
+    assert result[0] == Ingredient(name="Berries", specification="3 Grams")
+
+
 def test_process_recipe_data_with_disabled_amount(mealie_app, example_request):
     example_request["content"]["settings"]["disable_amount"] = True
 
@@ -119,8 +154,63 @@ def test_process_recipe_data_ignores_empty_parsed_ingredient(mealie_app, example
     assert f"Ignoring empty ingredient {emtpy_ingredient_data}" in caplog.text
 
 
+def test_extract_ingredients_data_from_recipe_data_does_not_modify_recipe(mealie_app, example_request):
+    recipe_ingredients = example_request["content"]["recipe_ingredient"]
+    original_recipe_ingredients = copy.deepcopy(recipe_ingredients)
+
+    unparsed_ingredients = mealie_app._extract_ingredients_data_from_recipe_data(recipe_ingredients)
+
+    assert [ingredient["quantity"] for ingredient in unparsed_ingredients] == [1.0, 1.0, 5.0, 4.0, 6.0, 2.0, None]
+    assert recipe_ingredients == original_recipe_ingredients
+
+
+def create_nested_recipe_ingredients(ingredient_raw_base_data: dict, depth: int, width: int) -> list[dict]:
+    ingredients = [
+        {
+            **ingredient_raw_base_data,
+            "food": {
+                **ingredient_raw_base_data["food"],
+                "households_with_ingredient_food": [f"household-{index}" for index in range(20)],
+            },
+        }
+        for _ in range(width)
+    ]
+    if depth == 0:
+        return ingredients
+    referenced_recipe = {
+        "name": f"Sub recipe {depth}",
+        "recipe_ingredient": create_nested_recipe_ingredients(ingredient_raw_base_data, depth - 1, width),
+    }
+    return ingredients + [
+        {"food": None, "quantity": 2.0, "referenced_recipe": referenced_recipe} for _ in range(width // 10)
+    ]
+
+
+def test_extract_ingredients_data_from_recipe_data_matches_flattened_copies(mealie_app, ingredient_raw_base_data):
+    recipe_ingredients = create_nested_recipe_ingredients(ingredient_raw_base_data, depth=3, width=20)
+
+    def flatten_with_deepcopy(ingredients: list[dict], multiplier: float) -> list[dict]:
+        # The previous implementation, which copied every ingredient
+        result = []
+        for ingredient in ingredients:
+            if referenced_recipe := ingredient.get("referenced_recipe"):
+                result.extend(
+                    flatten_with_deepcopy(referenced_recipe["recipe_ingredient"], multiplier * ingredient["quantity"])
+                )
+            else:
+                ingredient_copy = copy.deepcopy(ingredient)
+                if ingredient_copy["quantity"]:
+                    ingredient_copy["quantity"] *= multiplier
+                result.append(ingredient_copy)
+        return result
+
+    unparsed_ingredients = mealie_app._extract_ingredients_data_from_recipe_data(recipe_ingredients)
+
+    assert [dict(ingredient) for ingredient in unparsed_ingredients] == flatten_with_deepcopy(recipe_ingredients, 1.0)
+
+
 def test_add_ingredients_to_bring_empty_list(mealie_app):
-    mealie_app._add_ingredients_to_bring([])
+    mealie_app._run_coroutine(mealie_app._add_ingredients_to_bring_async([]))
 
     mealie_app.bring_handler.add_items.assert_not_called()
     mealie_app.bring_handler.notify_users_about_changes_in_list.assert_not_called()
@@ -129,79 +219,850 @@ def test_add_ingredients_to_bring_empty_list(mealie_app):
 def test_add_ingredients_to_bring_with_ingredients(mealie_app, first_ingredient, second_ingredient):
     ingredients = [first_ingredient, second_ingredient]
 
-    mealie_app._add_ingredients_to_bring(ingredients)
+    mealie_app._run_coroutine(mealie_app._add_ingredients_to_bring_async(ingredients))
 
-    mealie_app.bring_handler.add_items.assert_called_once_with(ingredients)
+    mealie_app.bring_handler.add_items.assert_called_once_with(ingredients, None)
     mealie_app.bring_handler.notify_users_about_changes_in_list.assert_called_once()
 
 
+def test_add_ingredients_to_bring_removes_sent_ingredients_from_outbox(mealie_app, first_ingredient, tmp_path):
+    mealie_app.bring_outbox = BringOutbox(str(tmp_path / "outbox.sqlite"), 5)
+
+    mealie_app._run_coroutine(mealie_app._add_ingredients_to_bring_async([first_ingredient]))
+
+    mealie_app.bring_handler.add_items.assert_awaited_once_with([first_ingredient], None)
+    assert mealie_app._run_coroutine(mealie_app.bring_outbox.pending()) == []
+
+
+def test_add_ingredients_to_bring_keeps_failed_ingredients_in_outbox(mealie_app, first_ingredient, tmp_path, caplog):
+    mealie_app.bring_outbox = BringOutbox(str(tmp_path / "outbox.sqlite"), 5)
+    mealie_app.bring_handler.add_items.side_effect = RuntimeError("Bring is down")
+
+    mealie_app._run_coroutine(mealie_app._add_ingredients_to_bring_async([first_ingredient]))
+
+    assert [ingredients for _, ingredients, _ in mealie_app._run_coroutine(mealie_app.bring_outbox.pending())] == [
+        [first_ingredient]
+    ]
+    assert "Could not add the ingredients to Bring, retrying them from the outbox" in caplog.text
+
+
+def test_add_ingredients_to_bring_coalesces_concurrent_requests(mealie_app, first_ingredient, second_ingredient):
+    mealie_app.bring_update_coalescer.window_seconds = 0.05
+
+    async def add_concurrently():
+        await asyncio.gather(
+            mealie_app._add_ingredients_to_bring_async([first_ingredient]),
+            mealie_app._add_ingredients_to_bring_async([second_ingredient]),
+        )
+
+    mealie_app._run_coroutine(add_concurrently())
+
+    mealie_app.bring_handler.add_items.assert_awaited_once_with([first_ingredient, second_ingredient], None)
+    mealie_app.bring_handler.notify_users_about_changes_in_list.assert_awaited_once()
+
+
+def set_pages_of_shopping_list(mealie_handler, pages: list[list[dict]]):
+    async def iterate_pages_of_shopping_list(_shopping_list_uuid=None):
+        for page in pages:
+            yield page
+
+    mealie_handler.iterate_pages_of_shopping_list = iterate_pages_of_shopping_list
+
+
 def test_move_ingredients_from_shopping_list_to_bring(mealie_app):
-    items_on_shopping_list = [{"id": "1"}, {"id": "2"}]
-    mealie_app.mealie_handler.get_items_on_shopping_list.return_value = items_on_shopping_list
+    items_on_shopping_list = [{"id": "1", "food": None}, {"id": "2", "food": None}]
+    set_pages_of_shopping_list(mealie_app.mealie_handler, [items_on_shopping_list])
 
-    with (
-        patch("source.mealie_bring_api.Ingredient.from_raw_data") as mock_from_raw_data,
-        patch.object(mealie_app, "_add_ingredients_to_bring") as mock_add_ingredients_to_bring,
-    ):
+    with patch("source.mealie_bring_api.Ingredient.from_raw_data") as mock_from_raw_data:
         mealie_app._move_ingredients_from_shopping_list_to_bring()
 
     assert mock_from_raw_data.call_count == len(items_on_shopping_list)
-    mock_add_ingredients_to_bring.assert_called_once()
-    mealie_app.mealie_handler.delete_items_from_shopping_list.assert_called_once_with(items_on_shopping_list)
+    mealie_app.bring_handler.add_items.assert_awaited_once()
+    mealie_app.bring_handler.notify_users_about_changes_in_list.assert_awaited_once()
+    mealie_app.mealie_handler.mark_as_synced.assert_called_once_with(items_on_shopping_list)
+    mealie_app.mealie_handler.delete_items_from_shopping_list.assert_awaited_once_with(items_on_shopping_list)
+
+
+def test_move_ingredients_from_shopping_list_does_not_mark_items_as_synced_if_bring_fails(mealie_app):
+    set_pages_of_shopping_list(mealie_app.mealie_handler, [[{"id": "1", "food": None}]])
+    mealie_app.bring_handler.add_items.side_effect = RuntimeError("Bring is down")
+
+    with patch("source.mealie_bring_api.Ingredient.from_raw_data"), pytest.raises(RuntimeError):
+        mealie_app._move_ingredients_from_shopping_list_to_bring()
+
+    mealie_app.mealie_handler.mark_as_synced.assert_not_called()
+    mealie_app.mealie_handler.delete_items_from_shopping_list.assert_not_called()
+
+
+def test_move_ingredients_from_shopping_list_does_not_mark_items_as_synced_if_deleting_fails(mealie_app):
+    set_pages_of_shopping_list(mealie_app.mealie_handler, [[{"id": "1", "food": None}]])
+    mealie_app.mealie_handler.delete_items_from_shopping_list.side_effect = aiohttp.ClientError("Mealie is down")
+
+    with patch("source.mealie_bring_api.Ingredient.from_raw_data"), pytest.raises(aiohttp.ClientError):
+        mealie_app._move_ingredients_from_shopping_list_to_bring()
+
+    mealie_app.mealie_handler.mark_as_synced.assert_not_called()
+
+
+def test_move_ingredients_from_shopping_list_pushes_every_page(mealie_app):
+    pages = [[{"id": "1", "food": None}, {"id": "2", "food": None}], [], [{"id": "3", "food": None}]]
+    set_pages_of_shopping_list(mealie_app.mealie_handler, pages)
+
+    with patch("source.mealie_bring_api.Ingredient.from_raw_data"):
+        mealie_app._move_ingredients_from_shopping_list_to_bring()
+
+    assert mealie_app.bring_handler.add_items.await_count == 2
+    mealie_app.bring_handler.notify_users_about_changes_in_list.assert_awaited_once()
+    mealie_app.mealie_handler.delete_items_from_shopping_list.assert_awaited_once_with(
+        [{"id": "1", "food": None}, {"id": "2", "food": None}, {"id": "3", "food": None}]
+    )
+
+
+def test_move_ingredients_from_shopping_list_merges_duplicate_items(mealie_app, ingredient_raw_base_data):
+    items_on_shopping_list = [{**ingredient_raw_base_data, "id": "1"}, {**ingredient_raw_base_data, "id": "2"}]
+    set_pages_of_shopping_list(mealie_app.mealie_handler, [items_on_shopping_list])
+
+    mealie_app._move_ingredients_from_shopping_list_to_bring()
+
+    mealie_app.bring_handler.add_items.assert_awaited_once_with(
+        [Ingredient(name="Berries", specification="2 Grams")], None
+    )
+    mealie_app.mealie_handler.delete_items_from_shopping_list.assert_awaited_once_with(items_on_shopping_list)
+
+
+def test_move_ingredients_from_shopping_list_without_changes_does_not_notify(mealie_app):
+    items_on_shopping_list = [{"id": "1", "food": None}]
+    set_pages_of_shopping_list(mealie_app.mealie_handler, [items_on_shopping_list])
+    mealie_app.bring_handler.add_items.return_value = False
+
+    with patch("source.mealie_bring_api.Ingredient.from_raw_data"):
+        mealie_app._move_ingredients_from_shopping_list_to_bring()
+
+    mealie_app.bring_handler.notify_users_about_changes_in_list.assert_not_called()
+    mealie_app.mealie_handler.delete_items_from_shopping_list.assert_awaited_once_with(items_on_shopping_list)
+
+
+def test_move_ingredients_from_shopping_list_moves_items_to_routed_lists(mealie_app):
+    mealie_app.list_router.shopping_list_routes = {"office-uuid": "Office"}
+    items_on_shopping_list = [
+        {"id": "1", "shoppingListId": "home-uuid", "food": None},
+        {"id": "2", "shoppingListId": "office-uuid", "food": None},
+        {"id": "3", "shoppingListId": "home-uuid", "food": None},
+    ]
+    set_pages_of_shopping_list(mealie_app.mealie_handler, [items_on_shopping_list])
+    mealie_app.bring_handler.add_items.side_effect = lambda _ingredients, list_name: list_name == "Office"
+
+    with patch("source.mealie_bring_api.Ingredient.from_raw_data", side_effect=lambda item: item["id"]):
+        mealie_app._move_ingredients_from_shopping_list_to_bring()
+
+    assert [call.args for call in mealie_app.bring_handler.add_items.await_args_list] == [
+        (["1", "3"], None),
+        (["2"], "Office"),
+    ]
+    mealie_app.bring_handler.notify_users_about_changes_in_list.assert_awaited_once_with("Office")
+    mealie_app.mealie_handler.delete_items_from_shopping_list.assert_awaited_once_with(items_on_shopping_list)
+
+
+def test_move_ingredients_from_empty_shopping_list(mealie_app, caplog):
+    set_pages_of_shopping_list(mealie_app.mealie_handler, [[]])
+
+    mealie_app._move_ingredients_from_shopping_list_to_bring()
+
+    mealie_app.bring_handler.add_items.assert_not_called()
+    mealie_app.bring_handler.notify_users_about_changes_in_list.assert_not_called()
+    mealie_app.mealie_handler.delete_items_from_shopping_list.assert_not_called()
+    assert "There are no ingredients to add" in caplog.text
+
+
+def test_move_ingredients_from_shopping_list_fetches_only_the_changed_shopping_list(mealie_app):
+    fetched_shopping_lists = []
+
+    async def iterate_pages_of_shopping_list(shopping_list_uuid=None):
+        fetched_shopping_lists.append(shopping_list_uuid)
+        yield []
+
+    mealie_app.mealie_handler.iterate_pages_of_shopping_list = iterate_pages_of_shopping_list
+
+    mealie_app._move_ingredients_from_shopping_list_to_bring("office-uuid")
+
+    assert fetched_shopping_lists == ["office-uuid"]
+
+
+def run_concurrent_moves(mealie_app, shopping_list_uuids: list[str | None]) -> list[str]:
+    events = []
+
+    async def iterate_pages_of_shopping_list(shopping_list_uuid=None):
+        events.append(f"start {shopping_list_uuid}")
+        await asyncio.sleep(0.05)
+        events.append(f"end {shopping_list_uuid}")
+        yield []
+
+    mealie_app.mealie_handler.iterate_pages_of_shopping_list = iterate_pages_of_shopping_list
+
+    async def move_concurrently() -> None:
+        await asyncio.gather(
+            *(
+                mealie_app._move_ingredients_from_shopping_list_to_bring_async(shopping_list_uuid)
+                for shopping_list_uuid in shopping_list_uuids
+            )
+        )
+
+    mealie_app._run_coroutine(move_concurrently())
+    return events
+
+
+def test_moves_of_different_shopping_lists_run_concurrently(mealie_app):
+    events = run_concurrent_moves(mealie_app, ["home-uuid", "office-uuid"])
+
+    assert events == ["start home-uuid", "start office-uuid", "end home-uuid", "end office-uuid"]
+    assert mealie_app.running_moves == set()
+
+
+def test_moves_of_the_same_shopping_list_run_one_after_the_other(mealie_app):
+    events = run_concurrent_moves(mealie_app, ["home-uuid", "home-uuid"])
+
+    assert events == ["start home-uuid", "end home-uuid", "start home-uuid", "end home-uuid"]
+
+
+def test_move_of_all_shopping_lists_waits_for_other_moves(mealie_app):
+    events = run_concurrent_moves(mealie_app, ["home-uuid", None, "office-uuid"])
+
+    assert events == [
+        "start home-uuid",
+        "start office-uuid",
+        "end home-uuid",
+        "end office-uuid",
+        "start None",
+        "end None",
+    ]
+
+
+def schedule_move(mealie_app, shopping_list_uuid: str | None) -> None:
+    mealie_app._schedule_move_ingredients_from_shopping_list(shopping_list_uuid)
+
+    # The timers are scheduled on the event loop, in worker mode after the shared state was updated
+    async def wait_until_scheduled() -> None:
+        await asyncio.sleep(0)
+        await asyncio.gather(*mealie_app.move_schedulings)
+
+    mealie_app._run_coroutine(wait_until_scheduled())
+
+
+def seconds_until(mealie_app, shopping_list_uuid: str | None) -> float:
+    return mealie_app.move_debounce_timers[shopping_list_uuid].when() - mealie_app.loop.time()
 
 
 def test_schedule_move_ingredients_starts_timer(mealie_app):
-    with patch("source.mealie_bring_api.threading.Timer") as mock_timer_cls:
-        mock_timer_instance = MagicMock()
-        mock_timer_cls.return_value = mock_timer_instance
+    scheduled_before = MOVE_DEBOUNCE_EVENTS.values.get("scheduled", 0)
 
-        mealie_app._schedule_move_ingredients_from_shopping_list()
+    schedule_move(mealie_app, "home-uuid")
 
-    mock_timer_cls.assert_called_once_with(2, mealie_app._run_debounced_move_ingredients_from_shopping_list)
-    mock_timer_instance.start.assert_called_once()
-    assert mealie_app.move_debounce_timer is mock_timer_instance
+    assert list(mealie_app.move_debounce_timers) == ["home-uuid"]
+    assert seconds_until(mealie_app, "home-uuid") == pytest.approx(2, abs=0.1)
+    assert MOVE_DEBOUNCE_EVENTS.values["scheduled"] == scheduled_before + 1
 
 
 def test_schedule_move_ingredients_cancels_previous_pending_timer(mealie_app):
-    previous_timer = MagicMock()
-    mealie_app.move_debounce_timer = previous_timer
+    rescheduled_before = MOVE_DEBOUNCE_EVENTS.values.get("rescheduled", 0)
+    schedule_move(mealie_app, "home-uuid")
+    previous_timer = mealie_app.move_debounce_timers["home-uuid"]
+    started_at = mealie_app.move_debounce_started_at["home-uuid"]
+
+    schedule_move(mealie_app, "home-uuid")
+
+    assert previous_timer.cancelled()
+    assert mealie_app.move_debounce_timers["home-uuid"] is not previous_timer
+    # The wait is measured from the first change
+    assert mealie_app.move_debounce_started_at == {"home-uuid": started_at}
+    assert MOVE_DEBOUNCE_EVENTS.values["rescheduled"] == rescheduled_before + 1
+
+
+def test_schedule_move_ingredients_keeps_timers_of_other_shopping_lists(mealie_app):
+    schedule_move(mealie_app, "office-uuid")
+    other_timer = mealie_app.move_debounce_timers["office-uuid"]
+
+    schedule_move(mealie_app, "home-uuid")
+
+    assert not other_timer.cancelled()
+    assert set(mealie_app.move_debounce_timers) == {"home-uuid", "office-uuid"}
+
+
+def test_schedule_move_ingredients_does_not_wait_longer_than_the_maximum(mealie_app):
+    mealie_app.move_max_wait_seconds = 30
+    schedule_move(mealie_app, "home-uuid")
+    mealie_app.move_debounce_started_at["home-uuid"] -= 29.5
+
+    schedule_move(mealie_app, "home-uuid")
+
+    assert seconds_until(mealie_app, "home-uuid") == pytest.approx(0.5, abs=0.1)
+
+
+def test_schedule_move_ingredients_after_the_maximum_wait_moves_right_away(mealie_app):
+    with patch.object(mealie_app, "_move_ingredients_from_shopping_list_to_bring_async") as mock_move:
+        mealie_app.move_debounce_seconds = 60
+        schedule_move(mealie_app, "home-uuid")
+        mealie_app.move_debounce_started_at["home-uuid"] -= 60
+
+        schedule_move(mealie_app, "home-uuid")
+        mealie_app._run_coroutine(asyncio.sleep(0.01))
+
+    mock_move.assert_awaited_once_with("home-uuid")
+
+
+def test_schedule_move_ingredients_does_not_start_threads(mealie_app):
+    mealie_app.move_debounce_seconds = 60
+    threads_before = threading.active_count()
+
+    for change in range(100):
+        mealie_app._schedule_move_ingredients_from_shopping_list(f"uuid-{change % 5}")
+    mealie_app._run_coroutine(asyncio.sleep(0))
+
+    assert threading.active_count() == threads_before
+    assert len(mealie_app.move_debounce_timers) == 5
+
+
+def test_debounced_move_runs_after_the_debounce(mealie_app):
+    mealie_app.move_debounce_seconds = 0.01
+    fired_before = MOVE_DEBOUNCE_EVENTS.values.get("fired", 0)
+    debounce_waits_before = sum(DEBOUNCE_WAIT_SECONDS.bucket_counts)
+
+    with patch.object(mealie_app, "_move_ingredients_from_shopping_list_to_bring_async") as mock_move:
+        schedule_move(mealie_app, "home-uuid")
+        mealie_app._run_coroutine(asyncio.sleep(0.05))
+
+    mock_move.assert_awaited_once_with("home-uuid")
+    assert mealie_app.move_debounce_timers == {}
+    assert mealie_app.move_debounce_started_at == {}
+    assert mealie_app.debounced_moves == set()
+    assert MOVE_DEBOUNCE_EVENTS.values["fired"] == fired_before + 1
+    assert sum(DEBOUNCE_WAIT_SECONDS.bucket_counts) == debounce_waits_before + 1
+
+
+def test_debounced_move_logs_errors(mealie_app, caplog):
+    mealie_app.move_debounce_seconds = 0.01
+
+    with patch.object(
+        mealie_app, "_move_ingredients_from_shopping_list_to_bring_async", side_effect=RuntimeError("Bring is down")
+    ):
+        schedule_move(mealie_app, "home-uuid")
+        mealie_app._run_coroutine(asyncio.sleep(0.05))
+
+    assert "Could not move the items of the shopping list to Bring: RuntimeError('Bring is down')" in caplog.text
+
+
+def notifier_body(document_data: dict) -> str:
+    # The notifier of Mealie sends the document data as a JSON string inside of the JSON body
+    return json.dumps({"title": "Shopping list updated", "document_data": json.dumps(document_data)})
 
-    with patch("source.mealie_bring_api.threading.Timer") as mock_timer_cls:
-        mock_timer_cls.return_value = MagicMock()
-        mealie_app._schedule_move_ingredients_from_shopping_list()
 
-    previous_timer.cancel.assert_called_once()
+@pytest.mark.parametrize(
+    "body, expected",
+    [
+        (notifier_body({"shopping_list_id": "home-uuid", "operation": "create"}), "home-uuid"),
+        (json.dumps({"document_data": {"shopping_list_id": "home-uuid"}}), "home-uuid"),
+        (notifier_body({"shopping_list_id": None}), None),
+        (json.dumps({"document_data": "not json"}), None),
+        (json.dumps({"title": "Shopping list updated"}), None),
+        ("[]", None),
+        ("", None),
+    ],
+)
+def test_get_changed_shopping_list_uuid(body, expected):
+    assert MealieBringAPI._get_changed_shopping_list_uuid(body) == expected
 
 
-def test_run_debounced_move_ingredients_clears_timer_and_moves(mealie_app):
-    mealie_app.move_debounce_timer = MagicMock()
+def test_handle_move_ingredients_request_schedules_the_changed_shopping_list(mealie_app):
+    with patch.object(mealie_app, "_schedule_move_ingredients_from_shopping_list") as mock_schedule:
+        response = mealie_app._handle_move_ingredients_request(notifier_body({"shopping_list_id": "home-uuid"}))
 
-    with patch.object(mealie_app, "_move_ingredients_from_shopping_list_to_bring") as mock_move:
-        mealie_app._run_debounced_move_ingredients_from_shopping_list()
+    assert response == ("OK", 200)
+    mock_schedule.assert_called_once_with("home-uuid")
 
-    assert mealie_app.move_debounce_timer is None
-    mock_move.assert_called_once()
+
+def test_handle_move_ingredients_request_ignores_other_shopping_lists(mealie_app):
+    mealie_app.mealie_handler.handles_shopping_list.return_value = False
+
+    with patch.object(mealie_app, "_schedule_move_ingredients_from_shopping_list") as mock_schedule:
+        response = mealie_app._handle_move_ingredients_request(notifier_body({"shopping_list_id": "other-uuid"}))
+
+    assert response == ("OK", 200)
+    mock_schedule.assert_not_called()
+    mealie_app.mealie_handler.handles_shopping_list.assert_called_once_with("other-uuid")
 
 
 def test_handle_stop_signal_stops_loop_and_logs_out(mealie_app, monkeypatch):
     with patch("source.mealie_bring_api.sys.exit") as mock_exit:
         mealie_app._handle_stop_signal(signal_number=2, _frame=None)
 
-        mealie_app.bring_handler.logout.assert_called_once()
-        mealie_app.loop.stop.assert_called_once()
+        mealie_app.bring_handler.logout.assert_awaited_once()
+        mealie_app.mealie_handler.close.assert_awaited_once()
+        mealie_app.loop_thread.join(timeout=5)
+        assert not mealie_app.loop.is_running()
         mock_exit.assert_called_once_with(0)
 
 
+def test_handle_stop_signal_cleans_up_async_server(mealie_app):
+    mealie_app.async_app_runner = MagicMock()
+    mealie_app.async_app_runner.cleanup = AsyncMock()
+
+    with patch("source.mealie_bring_api.sys.exit"):
+        mealie_app._handle_stop_signal(signal_number=15, _frame=None)
+
+    mealie_app.async_app_runner.cleanup.assert_awaited_once()
+
+
+def test_run_coroutine_runs_on_event_loop_thread(mealie_app):
+    async def get_current_thread_name() -> str:
+        return threading.current_thread().name
+
+    assert mealie_app._run_coroutine(get_current_thread_name()) == mealie_app.loop_thread.name
+
+
+def test_unknown_server_mode_exits(monkeypatch, mock_bring_handler, mock_flask_app, mock_mealie_handler):
+    monkeypatch.setenv("HTTP_SERVER_MODE", "gunicorn")
+    monkeypatch.setattr(MealieBringAPI, "_create_logger", lambda self: LoggerMixin())
+
+    with pytest.raises(SystemExit) as exit_info:
+        MealieBringAPI()
+
+    assert exit_info.value.code == 1
+
+
+def test_blocking_startup_connects_handlers(mealie_app):
+    mealie_app.bring_handler.connect.assert_awaited_once_with([])
+    mealie_app.mealie_handler.connect.assert_awaited_once()
+    assert mealie_app._handle_status_request() == (
+        {
+            "status": "ready",
+            "handshakes": {
+                "Bring": {"state": "successful", "duration_seconds": ANY, "error": None, "attempts": 1},
+                "Mealie": {"state": "successful", "duration_seconds": ANY, "error": None, "attempts": 1},
+            },
+            "bring_rate_limiter": ANY,
+        },
+        200,
+    )
+
+
+def test_blocking_startup_exits_if_a_handshake_fails(
+    monkeypatch, mock_bring_handler, mock_flask_app, mock_mealie_handler
+):
+    patch_mealie_bring_api(monkeypatch, mock_bring_handler, mock_flask_app, mock_mealie_handler)
+    mock_bring_handler.connect.side_effect = RuntimeError('Can not find a list with the name "Einkauf"')
+
+    with pytest.raises(SystemExit) as exit_info:
+        MealieBringAPI()
+
+    assert exit_info.value.code == 1
+
+
+def test_startup_replays_outbox(monkeypatch, mock_bring_handler, mock_flask_app, mock_mealie_handler, tmp_path):
+    outbox_file = str(tmp_path / "outbox.sqlite")
+    asyncio.run(BringOutbox(outbox_file, 5).append([Ingredient("Butter", "60 Gramm")]))
+    monkeypatch.setenv("BRING_OUTBOX_FILE", outbox_file)
+    patch_mealie_bring_api(monkeypatch, mock_bring_handler, mock_flask_app, mock_mealie_handler)
+
+    app = MealieBringAPI()
+    try:
+        app._run_coroutine(asyncio.sleep(0.1))
+
+        mock_bring_handler.add_items.assert_awaited_once_with([Ingredient("Butter", "60 Gramm")], None)
+        assert app._run_coroutine(app.bring_outbox.pending()) == []
+    finally:
+        app.loop.call_soon_threadsafe(app.outbox_replay_task.cancel)
+        stop_event_loop(app)
+
+
+def test_lazy_startup_rejects_requests_until_connected(
+    monkeypatch, mock_bring_handler, mock_flask_app, mock_mealie_handler, example_request
+):
+    monkeypatch.setenv("STARTUP_MODE", "lazy")
+    patch_mealie_bring_api(monkeypatch, mock_bring_handler, mock_flask_app, mock_mealie_handler)
+    login_finished = threading.Event()
+
+    async def connect(_list_names):
+        await asyncio.to_thread(login_finished.wait, 5)
+
+    mock_bring_handler.connect.side_effect = connect
+
+    app = MealieBringAPI()
+    try:
+
+        async def post_recipe() -> int:
+            async with TestClient(TestServer(app._create_async_app())) as client:
+                return (await client.post("/", json=example_request)).status
+
+        assert app._handle_status_request()[1] == 503
+        assert app._run_coroutine(post_recipe()) == 503
+        assert app._handle_move_ingredients_request()[1] == 503
+
+        login_finished.set()
+        app._run_coroutine(asyncio.sleep(0.1))
+
+        assert app._handle_status_request()[0]["status"] == "ready"
+        assert app._run_coroutine(post_recipe()) == 200
+    finally:
+        stop_event_loop(app)
+
+
+def test_lazy_startup_retries_failed_handshakes(monkeypatch, mock_bring_handler, mock_flask_app, mock_mealie_handler):
+    monkeypatch.setenv("STARTUP_MODE", "lazy")
+    monkeypatch.setenv("STARTUP_RETRY_SECONDS", "0.1")
+    patch_mealie_bring_api(monkeypatch, mock_bring_handler, mock_flask_app, mock_mealie_handler)
+    mock_mealie_handler.connect.side_effect = [RuntimeError("Invalid Mealie URL or API key"), None]
+
+    app = MealieBringAPI()
+    try:
+        app._run_coroutine(asyncio.sleep(0.05))
+
+        status, status_code = app._handle_status_request()
+        assert (status["status"], status_code) == ("degraded", 503)
+        assert status["handshakes"]["Mealie"]["attempts"] == 1
+
+        app._run_coroutine(asyncio.sleep(0.2))
+
+        status, status_code = app._handle_status_request()
+        assert (status["status"], status_code) == ("ready", 200)
+        assert status["handshakes"]["Mealie"]["attempts"] == 2
+        mock_bring_handler.connect.assert_awaited_once()
+    finally:
+        stop_event_loop(app)
+
+
+def test_async_app_status_returns_json(mealie_app):
+    async def get_status() -> tuple[int, dict]:
+        async with TestClient(TestServer(mealie_app._create_async_app())) as client:
+            response = await client.get("/status")
+            return response.status, await response.json()
+
+    status, body = mealie_app._run_coroutine(get_status())
+
+    assert status == 200
+    assert body["status"] == "ready"
+    assert body["bring_rate_limiter"]["concurrency_limit"] == 10
+    assert body["bring_rate_limiter"]["in_flight"] == 0
+
+
+def test_async_app_routes(mealie_app):
+    async_app = mealie_app._create_async_app()
+
+    routes = {(route.method, route.resource.canonical) for route in async_app.router.routes()}
+
+    assert ("POST", "/") in routes
+    assert ("POST", "/move-ingredients-from-shopping-list") in routes
+    assert ("GET", "/status") in routes
+
+
+def test_async_app_adds_ingredients_of_recipe(mealie_app, example_request):
+    async def post_recipe() -> tuple[int, str]:
+        server = TestServer(mealie_app._create_async_app())
+        async with TestClient(server) as client:
+            response = await client.post("/", json=example_request)
+            return response.status, await response.text()
+
+    status, text = mealie_app._run_coroutine(post_recipe())
+
+    assert (status, text) == (200, "OK")
+    mealie_app.bring_handler.add_items.assert_awaited_once()
+    mealie_app.bring_handler.notify_users_about_changes_in_list.assert_awaited_once()
+
+
+@pytest.mark.parametrize(
+    "query, expected_status, expected_list_name", [("?list=office", 200, "Office"), ("", 200, None)]
+)
+def test_async_app_adds_ingredients_of_recipe_to_routed_list(
+    mealie_app, example_request, query, expected_status, expected_list_name
+):
+    mealie_app.list_router.recipe_routes = {"office": "Office"}
+
+    async def post_recipe() -> int:
+        async with TestClient(TestServer(mealie_app._create_async_app())) as client:
+            return (await client.post(f"/{query}", json=example_request)).status
+
+    assert mealie_app._run_coroutine(post_recipe()) == expected_status
+    assert mealie_app.bring_handler.add_items.call_args.args[1] == expected_list_name
+    mealie_app.bring_handler.notify_users_about_changes_in_list.assert_awaited_once_with(expected_list_name)
+
+
+def test_async_app_rejects_recipe_for_unknown_route(mealie_app, example_request):
+    async def post_recipe() -> tuple[int, str]:
+        async with TestClient(TestServer(mealie_app._create_async_app())) as client:
+            response = await client.post("/?list=unknown", json=example_request)
+            return response.status, await response.text()
+
+    assert mealie_app._run_coroutine(post_recipe()) == (404, 'Unknown list "unknown"')
+    mealie_app.bring_handler.add_items.assert_not_called()
+
+
+def test_async_app_queues_recipe_and_answers_with_accepted(mealie_app, example_request):
+    mealie_app.recipe_queue = RecipeQueue(mealie_app._add_ingredients_to_bring_async, 1, 1)
+
+    async def post_recipes() -> list[int]:
+        await mealie_app.recipe_queue.start()
+        async with TestClient(TestServer(mealie_app._create_async_app())) as client:
+            statuses = [(await client.post("/", json=example_request)).status for _ in range(2)]
+        await mealie_app.recipe_queue.drain()
+        return statuses
+
+    statuses = mealie_app._run_coroutine(post_recipes())
+
+    assert statuses[0] == 202
+    assert statuses[1] in (202, 429)
+    mealie_app.bring_handler.add_items.assert_awaited()
+    assert mealie_app._handle_status_request()[0]["queue"]["processed"] == statuses.count(202)
+
+
+def test_handle_recipe_rejects_recipe_if_queue_is_full(mealie_app, first_ingredient):
+    mealie_app.recipe_queue = MagicMock(spec=RecipeQueue)
+    mealie_app.recipe_queue.submit = AsyncMock(return_value=False)
+
+    assert mealie_app._run_coroutine(mealie_app._handle_recipe_async([first_ingredient], None)) == (
+        "Too many recipes are waiting to be added to Bring",
+        429,
+    )
+    mealie_app.bring_handler.add_items.assert_not_called()
+
+
+def test_queued_recipe_is_stored_in_outbox_until_it_is_added(mealie_app, first_ingredient, tmp_path):
+    outbox_file = str(tmp_path / "outbox.sqlite")
+    mealie_app.bring_outbox = BringOutbox(outbox_file, 5)
+    mealie_app.recipe_queue = RecipeQueue(mealie_app._add_ingredients_to_bring_async, 10, 1)
+
+    async def submit_and_drain() -> tuple[tuple[str, int], list]:
+        await mealie_app.recipe_queue.start()
+        response = await mealie_app._handle_recipe_async([first_ingredient], "Office")
+        # A restarted instance would replay the recipe, as the worker has not taken it from the queue yet
+        pending_before_processing = await BringOutbox(outbox_file, 5).pending()
+        await mealie_app.recipe_queue.drain()
+        return response, pending_before_processing
+
+    response, pending_before_processing = mealie_app._run_coroutine(submit_and_drain())
+
+    assert response == ("Accepted", 202)
+    assert [(ingredients, list_name) for _, ingredients, list_name in pending_before_processing] == [
+        ([first_ingredient], "Office")
+    ]
+    mealie_app.bring_handler.add_items.assert_awaited_once_with([first_ingredient], "Office")
+    assert asyncio.run(BringOutbox(outbox_file, 5).pending()) == []
+
+
+def test_rejected_recipe_is_removed_from_outbox(mealie_app, first_ingredient, tmp_path):
+    mealie_app.bring_outbox = BringOutbox(str(tmp_path / "outbox.sqlite"), 5)
+    mealie_app.recipe_queue = MagicMock(spec=RecipeQueue)
+    mealie_app.recipe_queue.submit = AsyncMock(return_value=False)
+
+    assert mealie_app._run_coroutine(mealie_app._handle_recipe_async([first_ingredient], None))[1] == 429
+    assert asyncio.run(BringOutbox(str(tmp_path / "outbox.sqlite"), 5).pending()) == []
+
+
+def test_async_app_exposes_metrics(mealie_app, example_request):
+    async def post_recipe_and_get_metrics() -> tuple[str, str]:
+        async with TestClient(TestServer(mealie_app._create_async_app())) as client:
+            await client.post("/", json=example_request)
+            response = await client.get("/metrics")
+            return response.headers["Content-Type"], await response.text()
+
+    content_type, metrics = mealie_app._run_coroutine(post_recipe_and_get_metrics())
+
+    assert content_type == "text/plain; version=0.0.4; charset=utf-8"
+    assert "# TYPE recipe_parse_seconds histogram" in metrics
+    assert 'ingredients_per_request_bucket{le="+Inf"}' in metrics
+    assert "# TYPE upstream_errors_total counter" in metrics
+
+
+def test_run_coroutine_measures_event_loop_wait(mealie_app):
+    waits_before = EVENT_LOOP_WAIT_SECONDS.bucket_counts[:]
+
+    mealie_app._run_coroutine(asyncio.sleep(0))
+
+    assert sum(EVENT_LOOP_WAIT_SECONDS.bucket_counts) == sum(waits_before) + 1
+
+
+def test_async_app_rejects_invalid_recipe(mealie_app):
+    async def post_invalid_recipe() -> int:
+        async with TestClient(TestServer(mealie_app._create_async_app())) as client:
+            return (await client.post("/", data='{"content": {')).status
+
+    assert mealie_app._run_coroutine(post_invalid_recipe()) == 400
+    mealie_app.bring_handler.add_items.assert_not_called()
+
+
+def test_async_app_rejects_too_large_recipe(mealie_app, example_request):
+    mealie_app.max_body_size = 1024
+    example_request["content"]["description"] = "x" * 1024
+
+    async def post_large_recipe() -> int:
+        async with TestClient(TestServer(mealie_app._create_async_app())) as client:
+            return (await client.post("/", json=example_request)).status
+
+    assert mealie_app._run_coroutine(post_large_recipe()) == 413
+    mealie_app.bring_handler.add_items.assert_not_called()
+
+
+def test_async_app_move_ingredients_without_mealie_setup(mealie_app):
+    mealie_app.mealie_handler.mealie_is_setup = False
+
+    async def post_move() -> int:
+        async with TestClient(TestServer(mealie_app._create_async_app())) as client:
+            return (await client.post("/move-ingredients-from-shopping-list")).status
+
+    assert mealie_app._run_coroutine(post_move()) == 400
+
+
 def test_handle_stop_signal_flushes_pending_debounced_move(mealie_app):
-    pending_timer = MagicMock()
-    mealie_app.move_debounce_timer = pending_timer
+    mealie_app.move_debounce_seconds = 60
+    flushed_before = MOVE_DEBOUNCE_EVENTS.values.get("flushed", 0)
+    schedule_move(mealie_app, "home-uuid")
+    schedule_move(mealie_app, "office-uuid")
+    pending_timers = list(mealie_app.move_debounce_timers.values())
 
     with (
         patch("source.mealie_bring_api.sys.exit"),
-        patch.object(mealie_app, "_move_ingredients_from_shopping_list_to_bring") as mock_move,
+        patch.object(mealie_app, "_move_ingredients_from_shopping_list_to_bring_async") as mock_move,
     ):
         mealie_app._handle_stop_signal(signal_number=2, _frame=None)
 
-    pending_timer.cancel.assert_called_once()
-    mock_move.assert_called_once()
-    assert mealie_app.move_debounce_timer is None
+    assert all(pending_timer.cancelled() for pending_timer in pending_timers)
+    assert [call.args for call in mock_move.await_args_list] == [("home-uuid",), ("office-uuid",)]
+    assert mealie_app.move_debounce_timers == {}
+    assert MOVE_DEBOUNCE_EVENTS.values["flushed"] == flushed_before + 2
+
+
+@pytest.fixture
+def worker_state_file(tmp_path):
+    return str(tmp_path / "workers.sqlite3")
+
+
+@pytest.fixture
+def worker_app(mealie_app, worker_state_file):
+    mealie_app.worker_state = WorkerState(worker_state_file, "1")
+    yield mealie_app
+    mealie_app.worker_state.close()
+
+
+def test_worker_shares_the_state_of_the_workers(
+    monkeypatch, mock_bring_handler, mock_flask_app, mock_mealie_handler, worker_state_file, tmp_path
+):
+    monkeypatch.setenv("HTTP_WORKER_ID", "2")
+    monkeypatch.setenv("WORKER_STATE_FILE", worker_state_file)
+    monkeypatch.setenv("BRING_OUTBOX_FILE", str(tmp_path / "outbox.sqlite"))
+    patch_mealie_bring_api(monkeypatch, mock_bring_handler, mock_flask_app, mock_mealie_handler)
+
+    app = MealieBringAPI()
+    try:
+        assert app.worker_state.path == worker_state_file
+        assert app.worker_state.worker_id.startswith("2-")
+        assert app.bring_outbox.claim_seconds > 0
+    finally:
+        app.loop.call_soon_threadsafe(app.outbox_replay_task.cancel)
+        stop_event_loop(app)
+
+
+def test_worker_moves_the_items_once_the_shared_debounce_is_due(worker_app):
+    worker_app.move_debounce_seconds = 0.01
+
+    with patch.object(worker_app, "_move_ingredients_from_shopping_list_to_bring_async") as mock_move:
+        schedule_move(worker_app, "home-uuid")
+        worker_app._run_coroutine(asyncio.sleep(0.05))
+
+    mock_move.assert_awaited_once_with("home-uuid")
+    assert worker_app.worker_state.pending_moves() == {}
+
+
+def test_worker_waits_for_a_later_change_at_another_worker(worker_app, worker_state_file):
+    worker_app.move_debounce_seconds = 0.01
+    other_worker = WorkerState(worker_state_file, "2")
+
+    with patch.object(worker_app, "_move_ingredients_from_shopping_list_to_bring_async") as mock_move:
+        schedule_move(worker_app, "home-uuid")
+        other_worker.schedule_move("home-uuid", 60, 60)
+        worker_app._run_coroutine(asyncio.sleep(0.05))
+
+    mock_move.assert_not_called()
+    # The timer is armed again, so the move is not lost if the other worker crashes
+    assert seconds_until(worker_app, "home-uuid") == pytest.approx(60, abs=0.2)
+    assert other_worker.claim_move("home-uuid", ignore_due_time=True) is not None
+
+
+def test_worker_waits_again_if_the_wall_clock_was_set_back(worker_app):
+    worker_app.move_debounce_seconds = 0.01
+
+    with patch.object(worker_app, "_move_ingredients_from_shopping_list_to_bring_async") as mock_move:
+        schedule_move(worker_app, "home-uuid")
+        worker_app.worker_state.connection.execute("UPDATE move_debounce SET due_at = due_at + 30")
+        worker_app._run_coroutine(asyncio.sleep(0.05))
+
+    mock_move.assert_not_called()
+    assert seconds_until(worker_app, "home-uuid") == pytest.approx(30, abs=0.2)
+    assert list(worker_app.worker_state.pending_moves()) == ["home-uuid"]
+
+
+def test_worker_does_not_move_the_items_if_another_worker_claimed_them(worker_app, worker_state_file):
+    worker_app.move_debounce_seconds = 0.01
+    claimed_by_other_worker_before = MOVE_DEBOUNCE_EVENTS.values.get("claimed_by_other_worker", 0)
+
+    with patch.object(worker_app, "_move_ingredients_from_shopping_list_to_bring_async") as mock_move:
+        schedule_move(worker_app, "home-uuid")
+        assert WorkerState(worker_state_file, "2").claim_move("home-uuid", ignore_due_time=True) is not None
+        worker_app._run_coroutine(asyncio.sleep(0.05))
+
+    mock_move.assert_not_called()
+    assert worker_app.move_debounce_timers == {}
+    assert MOVE_DEBOUNCE_EVENTS.values["claimed_by_other_worker"] == claimed_by_other_worker_before + 1
+
+
+def test_worker_state_is_not_accessed_on_the_event_loop_thread(worker_app):
+    worker_app.move_debounce_seconds = 10
+    threads = []
+    original_schedule_move = worker_app.worker_state.schedule_move
+
+    def schedule_move_and_record_thread(*args: object) -> float:
+        threads.append(threading.current_thread())
+        return original_schedule_move(*args)
+
+    with patch.object(worker_app.worker_state, "schedule_move", side_effect=schedule_move_and_record_thread):
+        schedule_move(worker_app, "home-uuid")
+
+    assert threads and threads[0] is not worker_app.loop_thread
+    assert seconds_until(worker_app, "home-uuid") == pytest.approx(10, abs=0.2)
+
+
+def test_worker_waits_until_another_worker_finished_moving_the_shopping_list(worker_app, worker_state_file):
+    other_worker = WorkerState(worker_state_file, "2")
+    other_worker.acquire_move_lease("home-uuid", 60)
+    set_pages_of_shopping_list(worker_app.mealie_handler, [[{"id": "1", "food": None}]])
+    worker_app.loop.call_soon_threadsafe(worker_app.loop.call_later, 0.05, other_worker.release_move_lease, "home-uuid")
+
+    with (
+        patch("source.mealie_bring_api.MOVE_LEASE_POLL_SECONDS", 0.01),
+        patch("source.mealie_bring_api.Ingredient.from_raw_data"),
+    ):
+        worker_app._move_ingredients_from_shopping_list_to_bring("home-uuid")
+
+    worker_app.bring_handler.add_items.assert_awaited_once()
+    # The lease is released after the move
+    assert other_worker.acquire_move_lease("home-uuid", 60)
+
+
+def test_worker_takes_over_pending_moves_of_other_workers_after_its_startup(worker_app, worker_state_file):
+    WorkerState(worker_state_file, "2").schedule_move("home-uuid", 0, 60)
+
+    with patch.object(worker_app, "_move_ingredients_from_shopping_list_to_bring_async") as mock_move:
+        worker_app._run_coroutine(worker_app._connect_handlers())
+        worker_app._run_coroutine(asyncio.sleep(0.05))
+
+    mock_move.assert_awaited_once_with("home-uuid")
+
+
+def test_worker_flushes_its_pending_moves_before_they_are_due(worker_app):
+    worker_app.move_debounce_seconds = 60
+    schedule_move(worker_app, "home-uuid")
+
+    with (
+        patch("source.mealie_bring_api.sys.exit"),
+        patch.object(worker_app, "_move_ingredients_from_shopping_list_to_bring_async") as mock_move,
+    ):
+        worker_app._handle_stop_signal(signal_number=2, _frame=None)
+
+    mock_move.assert_awaited_once_with("home-uuid")
+    assert worker_app.worker_state.pending_moves() == {}
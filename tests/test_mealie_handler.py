@@ -1,17 +1,60 @@
+import asyncio
+import json
 import logging
-from unittest.mock import MagicMock, patch
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
 
+import aiohttp
 import pytest
-import requests
-from requests import JSONDecodeError
+from aiohttp import web
+from aiohttp.test_utils import TestServer
 from source.environment_variable_getter import EnvironmentVariableGetter
-from source.mealie_handler import MealieHandler
+from source.mealie_handler import MealieHandler, chunk_item_ids_by_url_length
+from source.metrics import UPSTREAM_ERRORS
+
+
+class FakeMealie:
+    def __init__(self):
+        self.items: list[dict] = []
+        self.responses: list[tuple[int, str]] = []
+        self.requests: list[web.Request] = []
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests.append(request)
+        if self.responses:
+            status, body = self.responses.pop(0)
+        else:
+            status, body = 200, json.dumps(self._get_page(request))
+        return web.Response(status=status, text=body)
+
+    def _get_page(self, request: web.Request) -> dict:
+        per_page = int(request.query.get("perPage", -1))
+        if per_page == -1:
+            return {"items": self.items}
+        page = int(request.query.get("page", 1))
+        return {
+            "page": page,
+            "per_page": per_page,
+            "total_pages": -(-len(self.items) // per_page),
+            "items": self.items[(page - 1) * per_page : page * per_page],
+        }
+
+    def deleted_ids(self) -> list[list[str]]:
+        return [request.query.getall("ids") for request in self.requests if request.method == "DELETE"]
 
 
 def setup_handler_with_credentials(handler):
     handler.log = logging.getLogger("MealieHandler")
     handler.mealie_base_url = "https://mealie.example.com"
     handler.mealie_api_key = "test_api_key"
+    handler.session = None
+    handler.pool_size = 10
+    handler.retries = 2
+    handler.backoff_factor = 0
+    handler.page_size = -1
+    handler.incremental_sync = False
+    handler.synced_until = {}
+    handler.synced_item_ids = {}
     return handler
 
 
@@ -38,64 +81,74 @@ def mock_env_getter(mock_env_vars):
 
 
 @pytest.fixture
-def mock_response():
-    response = MagicMock(spec=requests.Response)
-    response.raise_for_status = MagicMock()
-    response.status_code = 200
-    response.json.return_value = {"items": []}
-    return response
-
-
-@pytest.fixture
-def mock_requests(mock_response):
-    with patch("requests.get", return_value=mock_response) as mock_get:
-        with patch("requests.delete", return_value=mock_response) as mock_delete:
-            yield mock_get, mock_delete
+def event_loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
 
 
 @pytest.fixture
-def mealie_handler(monkeypatch, mock_env_getter, mock_requests):
-    monkeypatch.setattr(MealieHandler, "_try_api_key", MagicMock())
+def mealie_handler(mock_env_getter):
     with patch.object(MealieHandler, "__init__", lambda self: None):
         handler = MealieHandler()
         setup_handler_with_credentials(handler)
         handler.shopping_list_uuid = "test_uuid"
+        handler.routed_shopping_list_uuids = []
         handler.mealie_is_setup = True
         return handler
 
 
-def test_init_with_complete_config(mock_env_getter, mock_requests, mock_env_vars, caplog):
+@pytest.fixture
+def fake_mealie():
+    return FakeMealie()
+
+
+def run_against_fake_mealie(mealie_handler, fake_mealie, coroutine_function):
+    async def run():
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", fake_mealie.handle)
+        async with TestServer(app) as server:
+            mealie_handler.mealie_base_url = str(server.make_url("")).rstrip("/")
+            mealie_handler.session = MealieHandler._create_session(mealie_handler.mealie_api_key, 10)
+            try:
+                return await coroutine_function()
+            finally:
+                await mealie_handler.close()
+
+    return asyncio.run(run())
+
+
+def test_init_with_complete_config(mock_env_vars, caplog):
     with patch.object(
         EnvironmentVariableGetter, "get", side_effect=lambda var_name, default="": mock_env_vars.get(var_name, default)
     ):
-        with patch.object(MealieHandler, "_try_api_key"):
-            handler = MealieHandler()
+        handler = MealieHandler()
 
         assert handler.mealie_base_url == "https://mealie.example.com"
         assert handler.mealie_api_key == "test_api_key"
         assert handler.shopping_list_uuid == "test_uuid"
         assert handler.mealie_is_setup is True
+        assert handler.session is None
         assert f"Will filter items for shopping list with UUID {handler.shopping_list_uuid}" in caplog.text
 
 
 def test_init_with_incomplete_config(mock_env_getter, caplog):
     with patch.object(EnvironmentVariableGetter, "get", side_effect=lambda var_name, default="": ""):
-        with patch.object(MealieHandler, "_try_api_key") as mock_try_api_key:
-            handler = MealieHandler()
-
-            assert handler.mealie_base_url == ""
-            assert handler.mealie_api_key == ""
-            assert handler.mealie_is_setup is False
-            mock_try_api_key.assert_not_called()
-            assert (
-                "The configuration for Mealie is incomplete. "
-                "If you want to add the items from the shopping list to Bring you have to set the environment "
-                'variables "MEALIE_BASE_URL" and "MEALIE_API_KEY" (check out the README for more information). '
-                "If you don't need this feature you can safely ignore this message."
-            ) in caplog.text
-
-
-def test_init_with_mealie_set_up_but_no_shopping_list_uuid(mock_env_getter, mock_env_vars, mock_requests, caplog):
+        handler = MealieHandler()
+
+        assert handler.mealie_base_url == ""
+        assert handler.mealie_api_key == ""
+        assert handler.mealie_is_setup is False
+        assert handler.session is None
+        assert (
+            "The configuration for Mealie is incomplete. "
+            "If you want to add the items from the shopping list to Bring you have to set the environment "
+            'variables "MEALIE_BASE_URL" and "MEALIE_API_KEY" (check out the README for more information). '
+            "If you don't need this feature you can safely ignore this message."
+        ) in caplog.text
+
+
+def test_init_with_mealie_set_up_but_no_shopping_list_uuid(mock_env_getter, mock_env_vars, caplog):
     env_vars_without_uuid = mock_env_vars.copy()
     del env_vars_without_uuid["MEALIE_SHOPPING_LIST_UUID"]
 
@@ -104,128 +157,407 @@ def test_init_with_mealie_set_up_but_no_shopping_list_uuid(mock_env_getter, mock
         "get",
         side_effect=lambda var_name, default="": env_vars_without_uuid.get(var_name, default),
     ):
-        with patch.object(MealieHandler, "_try_api_key") as mock_try_api_key:
-            handler = MealieHandler()
+        handler = MealieHandler()
 
-            assert handler.mealie_base_url == "https://mealie.example.com"
-            assert handler.mealie_api_key == "test_api_key"
-            assert handler.shopping_list_uuid == ""
-            assert handler.mealie_is_setup is True
-            mock_try_api_key.assert_called_once()
-            assert ("No shopping list UUID specified --> Will add the ingredients of all shopping lists") in caplog.text
+        assert handler.mealie_base_url == "https://mealie.example.com"
+        assert handler.mealie_api_key == "test_api_key"
+        assert handler.shopping_list_uuid == ""
+        assert handler.mealie_is_setup is True
+        assert ("No shopping list UUID specified --> Will add the ingredients of all shopping lists") in caplog.text
 
 
-def test_try_api_key_success(mock_env_getter, mock_response):
-    with patch("requests.get", return_value=mock_response):
-        with patch.object(MealieHandler, "_try_api_key"):
-            handler = MealieHandler()
+def test_init_reads_connection_settings(mock_env_getter, mock_env_vars):
+    mock_env_vars.update(
+        {"MEALIE_HTTP_POOL_SIZE": "4", "MEALIE_HTTP_RETRIES": "2", "MEALIE_HTTP_BACKOFF_FACTOR": "0.25"}
+    )
+    handler = MealieHandler()
 
-        setup_handler_with_credentials(handler)
+    assert (handler.pool_size, handler.retries, handler.backoff_factor) == (4, 2, 0.25)
 
-        MealieHandler._try_api_key(handler)
 
-        mock_response.raise_for_status.assert_called_once()
+def test_init_reads_routed_shopping_lists(mock_env_getter, mock_env_vars):
+    mock_env_vars["MEALIE_SHOPPING_LIST_ROUTES"] = '{"office_uuid": "Office"}'
 
+    assert MealieHandler().routed_shopping_list_uuids == ["office_uuid"]
 
-def test_try_api_key_failure(mock_env_getter, mock_response):
-    mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError("API key invalid")
 
-    with patch("requests.get", return_value=mock_response):
-        with patch("sys.exit") as mock_exit:
-            with patch.object(MealieHandler, "_try_api_key"):
-                handler = MealieHandler()
+def test_create_session_pools_connections_and_sets_auth_header(event_loop):
+    async def create_session() -> aiohttp.ClientSession:
+        return MealieHandler._create_session("test_api_key", 4)
 
-            MealieHandler._try_api_key(handler)
+    session = event_loop.run_until_complete(create_session())
 
-            mock_exit.assert_called_once_with(1)
+    assert session.headers["Authorization"] == "Bearer test_api_key"
+    assert session.connector.limit == 4
+    event_loop.run_until_complete(session.close())
 
 
-def test_get_items_on_shopping_list_with_uuid(mealie_handler, mock_requests):
-    mock_get, _ = mock_requests
-    mock_response = mock_get.return_value
-    mock_response.json.return_value = {
-        "items": [
-            {"id": "item1", "shoppingListId": "test_uuid", "display": "1 gram Berry"},
-            {"id": "item2", "shoppingListId": "other_uuid", "display": "2 Apples"},
-        ]
-    }
+def test_try_api_key_success(mealie_handler, fake_mealie, caplog):
+    run_against_fake_mealie(mealie_handler, fake_mealie, mealie_handler._try_api_key)
 
-    result = mealie_handler.get_items_on_shopping_list()
+    assert fake_mealie.requests[0].path_qs == "/api/households/shopping/items?perPage=1"
+    assert fake_mealie.requests[0].headers["Authorization"] == "Bearer test_api_key"
+    assert "Connection to Mealie successful" in caplog.text
 
-    mock_get.assert_called_once_with(
-        f"{mealie_handler.mealie_base_url}/api/households/shopping/items?perPage=-1",
-        headers={"Authorization": f"Bearer {mealie_handler.mealie_api_key}"},
-        timeout=20,
-    )
+
+def test_try_api_key_failure(mealie_handler, fake_mealie):
+    fake_mealie.responses = [(401, "API key invalid")]
+
+    with pytest.raises(RuntimeError, match="Invalid Mealie URL or API key"):
+        run_against_fake_mealie(mealie_handler, fake_mealie, mealie_handler._try_api_key)
+
+
+def test_connect_creates_session_and_tries_api_key(mealie_handler):
+    with patch.object(mealie_handler, "_try_api_key", new_callable=AsyncMock) as mock_try_api_key:
+
+        async def connect():
+            await mealie_handler.connect()
+            await mealie_handler.close()
+
+        asyncio.run(connect())
+
+    assert mealie_handler.session.headers["Authorization"] == "Bearer test_api_key"
+    mock_try_api_key.assert_awaited_once()
+
+
+def test_request_retries_server_errors(mealie_handler, fake_mealie):
+    fake_mealie.responses = [(503, "Unavailable"), (502, "Bad Gateway")]
+
+    run_against_fake_mealie(mealie_handler, fake_mealie, mealie_handler.get_items_on_shopping_list)
+
+    assert len(fake_mealie.requests) == 3
+
+
+def test_request_raises_after_last_retry(mealie_handler, fake_mealie):
+    fake_mealie.responses = [(500, "Error")] * 3
+    errors_before = UPSTREAM_ERRORS.values.get("mealie", 0)
+
+    with pytest.raises(aiohttp.ClientResponseError):
+        run_against_fake_mealie(mealie_handler, fake_mealie, mealie_handler.get_items_on_shopping_list)
+
+    assert len(fake_mealie.requests) == 3
+    assert UPSTREAM_ERRORS.values["mealie"] == errors_before + 1
+
+
+def test_request_does_not_retry_client_errors(mealie_handler, fake_mealie):
+    fake_mealie.responses = [(404, "Not Found")]
+
+    with pytest.raises(aiohttp.ClientResponseError):
+        run_against_fake_mealie(mealie_handler, fake_mealie, mealie_handler.get_items_on_shopping_list)
+
+    assert len(fake_mealie.requests) == 1
+
+
+def test_get_items_on_shopping_list_with_uuid(mealie_handler, fake_mealie):
+    fake_mealie.items = [
+        {"id": "item1", "shoppingListId": "test_uuid", "display": "1 gram Berry"},
+        {"id": "item2", "shoppingListId": "other_uuid", "display": "2 Apples"},
+    ]
+
+    result = run_against_fake_mealie(mealie_handler, fake_mealie, mealie_handler.get_items_on_shopping_list)
+
+    assert fake_mealie.requests[0].path_qs == "/api/households/shopping/items?perPage=-1"
     assert len(result) == 1
     assert result[0]["id"] == "item1"
     assert result[0]["shoppingListId"] == "test_uuid"
 
 
-def test_get_items_on_shopping_list_without_uuid(mealie_handler, mock_requests):
+def test_get_items_on_shopping_list_without_uuid(mealie_handler, fake_mealie):
     mealie_handler.shopping_list_uuid = ""
-    mock_get, _ = mock_requests
-    mock_response = mock_get.return_value
-    mock_response.json.return_value = {
-        "items": [
-            {"id": "item1", "shoppingListId": "uuid1", "display": "1 gram Berry"},
-            {"id": "item2", "shoppingListId": "uuid2", "display": "2 grams Apple"},
-        ]
-    }
+    fake_mealie.items = [
+        {"id": "item1", "shoppingListId": "uuid1", "display": "1 gram Berry"},
+        {"id": "item2", "shoppingListId": "uuid2", "display": "2 grams Apple"},
+    ]
 
-    result = mealie_handler.get_items_on_shopping_list()
+    result = run_against_fake_mealie(mealie_handler, fake_mealie, mealie_handler.get_items_on_shopping_list)
 
-    mock_get.assert_called_once_with(
-        f"{mealie_handler.mealie_base_url}/api/households/shopping/items?perPage=-1",
-        headers={"Authorization": f"Bearer {mealie_handler.mealie_api_key}"},
-        timeout=20,
-    )
     assert len(result) == 2
     assert result[0]["id"] == "item1"
     assert result[1]["id"] == "item2"
 
 
-def test_get_items_on_shopping_list_with_invalid_response(mealie_handler, mock_requests, caplog):
-    mock_get, _ = mock_requests
-    mock_response = mock_get.return_value
-    mock_response.text = "Something happened"
-    mock_response.json.side_effect = JSONDecodeError("Expecting value: line 1 column 1 (char 0)", "{}", 0)
+def test_get_items_on_shopping_list_with_invalid_response(mealie_handler, fake_mealie):
+    fake_mealie.responses = [(200, "Something happened")]
 
-    with pytest.raises(JSONDecodeError):
-        mealie_handler.get_items_on_shopping_list()
+    with pytest.raises(json.JSONDecodeError):
+        run_against_fake_mealie(mealie_handler, fake_mealie, mealie_handler.get_items_on_shopping_list)
 
 
-def test_get_items_on_shopping_list_with_html_as_response(mealie_handler, mock_requests, caplog):
-    mock_get, _ = mock_requests
-    mock_response = mock_get.return_value
-    mock_response.text = (
-        '<!doctype html><html lang="en-US" dir="ltr"><head><base href="https://accounts.google.com/v3/signin/">'
-    )
-    mock_response.json.side_effect = JSONDecodeError("Expecting value: line 1 column 1 (char 0)", "{}", 0)
+def test_get_items_on_shopping_list_with_html_as_response(mealie_handler, fake_mealie, caplog):
+    fake_mealie.responses = [
+        (200, '<!doctype html><html lang="en-US" dir="ltr"><head><base href="https://accounts.google.com/v3/signin/">')
+    ]
 
-    result = mealie_handler.get_items_on_shopping_list()
+    result = run_against_fake_mealie(mealie_handler, fake_mealie, mealie_handler.get_items_on_shopping_list)
 
     assert result == []
     assert "The response from Mealie seems to be HTML. Please check your Mealie URL and API key." in caplog.text
 
 
-def test_delete_items_from_shopping_list(mealie_handler, mock_requests):
-    _, mock_delete = mock_requests
+def test_iterate_pages_of_shopping_list(mealie_handler, fake_mealie):
+    mealie_handler.page_size = 2
+    fake_mealie.items = [{"id": f"item{i}", "shoppingListId": "test_uuid"} for i in range(5)]
+
+    async def collect_pages() -> list[list[dict]]:
+        return [page async for page in mealie_handler.iterate_pages_of_shopping_list()]
+
+    pages = run_against_fake_mealie(mealie_handler, fake_mealie, collect_pages)
+
+    assert [[item["id"] for item in page] for page in pages] == [["item0", "item1"], ["item2", "item3"], ["item4"]]
+    assert [request.query["page"] for request in fake_mealie.requests] == ["1", "2", "3"]
+    assert fake_mealie.requests[0].query["perPage"] == "2"
+    assert (fake_mealie.requests[0].query["orderBy"], fake_mealie.requests[0].query["orderDirection"]) == ("id", "asc")
+    assert fake_mealie.requests[0].query["queryFilter"] == 'shopping_list_id="test_uuid"'
+
+
+def test_iterate_pages_of_shopping_list_filters_items_of_other_lists(mealie_handler, fake_mealie):
+    mealie_handler.page_size = 10
+    fake_mealie.items = [{"id": "item1", "shoppingListId": "test_uuid"}, {"id": "item2", "shoppingListId": "other"}]
+
+    result = run_against_fake_mealie(mealie_handler, fake_mealie, mealie_handler.get_items_on_shopping_list)
+
+    assert [item["id"] for item in result] == ["item1"]
+
+
+def test_iterate_pages_of_shopping_list_fetches_routed_shopping_lists(mealie_handler, fake_mealie):
+    mealie_handler.page_size = 10
+    mealie_handler.routed_shopping_list_uuids = ["office_uuid", "test_uuid"]
+    fake_mealie.items = [
+        {"id": "item1", "shoppingListId": "test_uuid"},
+        {"id": "item2", "shoppingListId": "office_uuid"},
+        {"id": "item3", "shoppingListId": "other"},
+    ]
+
+    result = run_against_fake_mealie(mealie_handler, fake_mealie, mealie_handler.get_items_on_shopping_list)
+
+    assert [item["id"] for item in result] == ["item1", "item2"]
+    assert fake_mealie.requests[0].query["queryFilter"] == 'shopping_list_id IN ["test_uuid", "office_uuid"]'
+
+
+def test_iterate_pages_of_shopping_list_without_uuid_does_not_filter(mealie_handler, fake_mealie):
+    mealie_handler.page_size = 10
+    mealie_handler.shopping_list_uuid = ""
+    fake_mealie.items = [{"id": "item1", "shoppingListId": "uuid1"}]
+
+    run_against_fake_mealie(mealie_handler, fake_mealie, mealie_handler.get_items_on_shopping_list)
+
+    assert "queryFilter" not in fake_mealie.requests[0].query
+
+
+def test_iterate_pages_of_shopping_list_with_empty_list(mealie_handler, fake_mealie):
+    mealie_handler.page_size = 10
+
+    result = run_against_fake_mealie(mealie_handler, fake_mealie, mealie_handler.get_items_on_shopping_list)
+
+    assert result == []
+    assert len(fake_mealie.requests) == 1
+
+
+def shopping_list_item(item_id: str, updated_at: str, shopping_list_uuid: str = "test_uuid") -> dict:
+    return {"id": item_id, "shoppingListId": shopping_list_uuid, "updateAt": updated_at}
+
+
+def test_mark_as_synced_remembers_newest_update_time(mealie_handler):
+    mealie_handler.incremental_sync = True
+
+    mealie_handler.mark_as_synced(
+        [
+            shopping_list_item("item1", "2024-05-20T12:00:00"),
+            shopping_list_item("item2", "2024-05-20T12:30:00"),
+            shopping_list_item("item3", "2024-05-20T12:30:00"),
+            {"id": "item4", "shoppingListId": "test_uuid"},
+        ]
+    )
+
+    assert mealie_handler.synced_until == {"test_uuid": datetime(2024, 5, 20, 12, 30)}
+    assert mealie_handler.synced_item_ids == {"test_uuid": {"item2", "item3"}}
+
+
+def test_mark_as_synced_without_incremental_sync(mealie_handler):
+    mealie_handler.mark_as_synced([shopping_list_item("item1", "2024-05-20T12:00:00")])
+
+    assert mealie_handler.synced_until == {}
+
+
+def test_iterate_pages_of_shopping_list_fetches_only_changed_items_after_sync(mealie_handler, fake_mealie):
+    mealie_handler.page_size = 10
+    mealie_handler.incremental_sync = True
+    mealie_handler.mark_as_synced([shopping_list_item("item1", "2024-05-20T12:00:00")])
+    # The fake ignores the query filter like older versions of Mealie, so the items are filtered by the handler
+    fake_mealie.items = [
+        shopping_list_item("item0", "2024-05-20T11:00:00"),
+        shopping_list_item("item1", "2024-05-20T12:00:00"),
+        shopping_list_item("item2", "2024-05-20T12:00:00"),
+        shopping_list_item("item3", "2024-05-20T13:00:00"),
+        {"id": "item4", "shoppingListId": "test_uuid"},
+    ]
+
+    result = run_against_fake_mealie(mealie_handler, fake_mealie, mealie_handler.get_items_on_shopping_list)
+
+    assert [item["id"] for item in result] == ["item2", "item3", "item4"]
+    assert (
+        fake_mealie.requests[0].query["queryFilter"]
+        == 'shopping_list_id="test_uuid" AND update_at >= "2024-05-20T12:00:00"'
+    )
+
+
+def test_iterate_pages_of_shopping_list_on_one_page_filters_by_update_time(mealie_handler, fake_mealie):
+    mealie_handler.incremental_sync = True
+    mealie_handler.mark_as_synced([shopping_list_item("item1", "2024-05-20T12:00:00+00:00")])
+
+    run_against_fake_mealie(mealie_handler, fake_mealie, mealie_handler.get_items_on_shopping_list)
+
+    assert fake_mealie.requests[0].query["queryFilter"] == 'update_at >= "2024-05-20T12:00:00+00:00"'
+
+
+def test_mark_as_synced_keeps_a_mark_per_shopping_list(mealie_handler):
+    mealie_handler.incremental_sync = True
+
+    mealie_handler.mark_as_synced(
+        [
+            shopping_list_item("item1", "2024-05-20T12:00:00"),
+            shopping_list_item("item2", "2024-05-20T09:00:00", "office_uuid"),
+        ]
+    )
+
+    assert mealie_handler.synced_until == {
+        "test_uuid": datetime(2024, 5, 20, 12, 0),
+        "office_uuid": datetime(2024, 5, 20, 9, 0),
+    }
+
+
+def test_iterate_pages_of_shopping_list_filters_by_update_time_of_each_list(mealie_handler, fake_mealie):
+    mealie_handler.page_size = 10
+    mealie_handler.routed_shopping_list_uuids = ["office_uuid"]
+    mealie_handler.incremental_sync = True
+    mealie_handler.mark_as_synced([shopping_list_item("item1", "2024-05-20T12:00:00")])
+    fake_mealie.items = [
+        shopping_list_item("item1", "2024-05-20T12:00:00"),
+        shopping_list_item("item2", "2024-05-20T09:00:00", "office_uuid"),
+    ]
+
+    result = run_against_fake_mealie(mealie_handler, fake_mealie, mealie_handler.get_items_on_shopping_list)
+
+    assert [item["id"] for item in result] == ["item2"]
+    # The mark of one list must not hide the older items of the other list
+    assert "update_at" not in fake_mealie.requests[0].query["queryFilter"]
+
+
+def test_iterate_pages_of_shopping_list_of_one_shopping_list(mealie_handler, fake_mealie):
+    mealie_handler.page_size = 10
+    mealie_handler.routed_shopping_list_uuids = ["office_uuid"]
+    fake_mealie.items = [
+        {"id": "item1", "shoppingListId": "test_uuid"},
+        {"id": "item2", "shoppingListId": "office_uuid"},
+    ]
+
+    async def get_items_of_office() -> list[dict]:
+        return await mealie_handler.get_items_on_shopping_list("office_uuid")
+
+    result = run_against_fake_mealie(mealie_handler, fake_mealie, get_items_of_office)
+
+    assert [item["id"] for item in result] == ["item2"]
+    assert fake_mealie.requests[0].query["queryFilter"] == 'shopping_list_id="office_uuid"'
+
+
+@pytest.mark.parametrize(
+    "shopping_list_uuid, routed_shopping_list_uuids, shopping_list_uuid_to_check, expected",
+    [
+        ("test_uuid", [], "test_uuid", True),
+        ("test_uuid", ["office_uuid"], "office_uuid", True),
+        ("test_uuid", [], "other", False),
+        ("", [], "other", True),
+    ],
+)
+def test_handles_shopping_list(
+    mealie_handler, shopping_list_uuid, routed_shopping_list_uuids, shopping_list_uuid_to_check, expected
+):
+    mealie_handler.shopping_list_uuid = shopping_list_uuid
+    mealie_handler.routed_shopping_list_uuids = routed_shopping_list_uuids
+
+    assert mealie_handler.handles_shopping_list(shopping_list_uuid_to_check) is expected
+
+
+def test_delete_items_from_shopping_list(mealie_handler, fake_mealie):
     items_on_shopping_list = [
         {"id": "item1", "shoppingListId": "uuid1", "display": "1 gram Berry"},
         {"id": "item2", "shoppingListId": "uuid2", "display": "2 grams Apple"},
         {"id": "item3", "shoppingListId": "uuid3", "display": "3 grams Orange"},
     ]
 
-    mealie_handler.delete_items_from_shopping_list(items_on_shopping_list)
+    run_against_fake_mealie(
+        mealie_handler, fake_mealie, lambda: mealie_handler.delete_items_from_shopping_list(items_on_shopping_list)
+    )
 
-    assert mock_delete.call_count == 3
-    for i, item in enumerate(items_on_shopping_list):
-        assert (
-            mock_delete.call_args_list[i][1]["url"]
-            == f"{mealie_handler.mealie_base_url}/api/households/shopping/items?ids={item['id']}"
+    assert fake_mealie.deleted_ids() == [["item1", "item2", "item3"]]
+    assert fake_mealie.requests[0].path == "/api/households/shopping/items"
+    assert fake_mealie.requests[0].headers["Authorization"] == "Bearer test_api_key"
+
+
+def test_delete_items_from_shopping_list_splits_long_urls(mealie_handler, fake_mealie):
+    items_on_shopping_list = [{"id": f"{i:036d}"} for i in range(100)]
+
+    run_against_fake_mealie(
+        mealie_handler, fake_mealie, lambda: mealie_handler.delete_items_from_shopping_list(items_on_shopping_list)
+    )
+
+    deleted_ids = fake_mealie.deleted_ids()
+    assert len(deleted_ids) == 3
+    assert [item_id for chunk in deleted_ids for item_id in chunk] == [item["id"] for item in items_on_shopping_list]
+
+
+def test_delete_items_from_shopping_list_falls_back_to_single_deletes(mealie_handler, fake_mealie):
+    fake_mealie.responses = [(422, "Unprocessable Entity")]
+    items_on_shopping_list = [{"id": "item1"}, {"id": "item2"}, {"id": "item3"}]
+
+    run_against_fake_mealie(
+        mealie_handler, fake_mealie, lambda: mealie_handler.delete_items_from_shopping_list(items_on_shopping_list)
+    )
+
+    deleted_ids = fake_mealie.deleted_ids()
+    assert len(deleted_ids) == 4
+    assert sorted(chunk[0] for chunk in deleted_ids[1:]) == ["item1", "item2", "item3"]
+
+
+def test_delete_items_from_shopping_list_raises_if_single_delete_fails(mealie_handler, fake_mealie):
+    fake_mealie.responses = [(404, "Not Found")] * 3
+
+    with pytest.raises(aiohttp.ClientResponseError):
+        run_against_fake_mealie(
+            mealie_handler,
+            fake_mealie,
+            lambda: mealie_handler.delete_items_from_shopping_list([{"id": "item1"}, {"id": "item2"}]),
         )
-        assert mock_delete.call_args_list[i][1]["headers"] == {
-            "Authorization": f"Bearer {mealie_handler.mealie_api_key}"
-        }
-        assert mock_delete.call_args_list[i][1]["timeout"] == 20
+
+
+def test_close_without_session(mealie_handler):
+    asyncio.run(mealie_handler.close())
+
+
+def test_chunk_item_ids_by_url_length():
+    chunks = chunk_item_ids_by_url_length("https://mealie", ["a" * 10, "b" * 10, "c" * 10], max_url_length=45)
+
+    assert chunks == [["a" * 10, "b" * 10], ["c" * 10]]
+
+
+def test_chunk_item_ids_by_url_length_keeps_oversized_id_in_own_chunk():
+    assert chunk_item_ids_by_url_length("https://mealie", ["a" * 50, "b"], max_url_length=30) == [["a" * 50], ["b"]]
+
+
+def test_connect_again_closes_the_session_of_the_failed_attempt(mealie_handler):
+    with patch.object(
+        mealie_handler, "_try_api_key", new_callable=AsyncMock, side_effect=[RuntimeError("Mealie is down"), None]
+    ):
+
+        async def connect_twice() -> aiohttp.ClientSession:
+            with pytest.raises(RuntimeError):
+                await mealie_handler.connect()
+            failed_session = mealie_handler.session
+            await mealie_handler.connect()
+            await mealie_handler.close()
+            return failed_session
+
+        failed_session = asyncio.run(connect_twice())
+
+    assert failed_session.closed
+    assert failed_session is not mealie_handler.session
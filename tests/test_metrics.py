@@ -0,0 +1,48 @@
+from source.metrics import Counter, Histogram, _registry, render_metrics
+
+
+def test_histogram_counts_observations_in_cumulative_buckets():
+    histogram = Histogram("test_latency_seconds", "Latency of the test", (0.1, 1))
+    _registry.remove(histogram)
+
+    for value in (0.05, 0.1, 0.5, 5):
+        histogram.observe(value)
+
+    assert histogram.render() == [
+        "# HELP test_latency_seconds Latency of the test",
+        "# TYPE test_latency_seconds histogram",
+        'test_latency_seconds_bucket{le="0.1"} 2',
+        'test_latency_seconds_bucket{le="1"} 3',
+        'test_latency_seconds_bucket{le="+Inf"} 4',
+        "test_latency_seconds_sum 5.65",
+        "test_latency_seconds_count 4",
+    ]
+
+
+def test_histogram_times_block():
+    histogram = Histogram("test_block_seconds", "Duration of the block")
+    _registry.remove(histogram)
+
+    with histogram.time():
+        pass
+
+    assert sum(histogram.bucket_counts) == 1
+
+
+def test_counter_counts_per_label():
+    counter = Counter("test_errors_total", "Errors of the test", "upstream")
+    _registry.remove(counter)
+
+    counter.inc("bring")
+    counter.inc("bring")
+    counter.inc("mealie")
+
+    assert counter.render()[2:] == ['test_errors_total{upstream="bring"} 2', 'test_errors_total{upstream="mealie"} 1']
+
+
+def test_render_metrics_contains_all_metrics():
+    metrics = render_metrics()
+
+    for name in ("bring_batch_update_seconds", "bring_notify_seconds", "mealie_fetch_seconds", "debounce_wait_seconds"):
+        assert f"# TYPE {name} histogram" in metrics
+    assert metrics.endswith("\n")
@@ -0,0 +1,46 @@
+import json
+
+import pytest
+from source.recipe_payload import extract_recipe_data
+
+
+def test_extract_recipe_data_keeps_only_the_needed_fields(example_request):
+    example_request["recipe_scale"] = 2
+    example_request["content"]["recipe_instructions"] = [{"text": 'Mix "everything" {carefully} [a, b]'}] * 3
+    example_request["content"]["nutrition"] = {"calories": "250", "fat": None, "nested": [[{}], []]}
+
+    recipe_data = extract_recipe_data(json.dumps(example_request, indent=2))
+
+    assert recipe_data == {
+        "content": {
+            "name": example_request["content"]["name"],
+            "settings": example_request["content"]["settings"],
+            "recipe_ingredient": example_request["content"]["recipe_ingredient"],
+        },
+        "recipe_scale": 2,
+    }
+
+
+def test_extract_recipe_data_drops_unused_scalars_and_strings():
+    body = '{"id": 42, "slug": "a \\"quoted\\" } slug", "flag": true, "content": {"name": "Pizza", "rating": -1.5e3}}'
+
+    assert extract_recipe_data(body) == {"content": {"name": "Pizza"}}
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        "",
+        "[]",
+        '{"content": ',
+        '{"content": {"name": "Pizza"}',
+        '{"content": {}} trailing',
+        '{"a" 1}',
+        "{1: 2}",
+        '{"content": []}',
+        '{"skipped": [1,], "content": {}}',
+    ],
+)
+def test_extract_recipe_data_rejects_invalid_json(body):
+    with pytest.raises(ValueError):
+        extract_recipe_data(body)
@@ -0,0 +1,56 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+from source.ingredient import Ingredient
+from source.recipe_queue import RecipeQueue
+
+
+def test_submitted_recipes_are_processed_by_workers():
+    process = AsyncMock()
+    recipe_queue = RecipeQueue(process, max_size=10, number_of_workers=2)
+    butter, flour = [Ingredient("Butter", "")], [Ingredient("Mehl", "")]
+
+    async def submit_and_drain() -> list[bool]:
+        await recipe_queue.start()
+        accepted = [await recipe_queue.submit(butter), await recipe_queue.submit(flour, "Office")]
+        await recipe_queue.drain()
+        return accepted
+
+    assert asyncio.run(submit_and_drain()) == [True, True]
+    assert [call.args for call in process.await_args_list] == [(butter, None, None), (flour, "Office", None)]
+    statistics = recipe_queue.to_dict()
+    assert (statistics["depth"], statistics["processed"], statistics["failed"]) == (0, 2, 0)
+    assert statistics["average_latency_seconds"] >= 0
+
+
+def test_recipes_are_rejected_if_queue_is_full(caplog):
+    recipe_queue = RecipeQueue(AsyncMock(), max_size=1, number_of_workers=1)
+
+    async def submit_without_workers() -> list[bool]:
+        await recipe_queue.start()
+        # The worker has not taken the first recipe from the queue yet, as the loop was not yielded to it
+        return [await recipe_queue.submit([]), await recipe_queue.submit([])]
+
+    assert asyncio.run(submit_without_workers()) == [True, False]
+    assert recipe_queue.to_dict()["rejected"] == 1
+    assert "Rejecting recipe as the queue is full (1 recipes)" in caplog.text
+
+
+def test_failing_recipe_does_not_stop_the_worker(caplog):
+    process = AsyncMock(side_effect=[RuntimeError("Bring is down"), None])
+    recipe_queue = RecipeQueue(process, max_size=10, number_of_workers=1)
+
+    async def submit_and_drain() -> None:
+        await recipe_queue.start()
+        await recipe_queue.submit([])
+        await recipe_queue.submit([])
+        await recipe_queue.drain()
+
+    asyncio.run(submit_and_drain())
+
+    assert (recipe_queue.processed, recipe_queue.failed) == (1, 1)
+    assert "Could not add the ingredients of a queued recipe to Bring" in caplog.text
+
+
+def test_to_dict_before_start():
+    assert RecipeQueue(AsyncMock(), max_size=5, number_of_workers=1).to_dict()["depth"] == 0
@@ -0,0 +1,70 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+from source.startup_tracker import StartupTracker
+
+
+async def succeed() -> None:
+    pass
+
+
+async def fail() -> None:
+    raise RuntimeError("Invalid Mealie URL or API key")
+
+
+def test_status_is_starting_while_handshakes_are_pending():
+    tracker = StartupTracker()
+    tracker.register("Bring")
+
+    assert tracker.status == "starting"
+    assert tracker.is_successful("Bring") is False
+
+
+def test_status_is_ready_after_all_handshakes_succeeded():
+    tracker = StartupTracker()
+    tracker.register("Bring")
+    tracker.register("Mealie")
+
+    asyncio.run(tracker.run("Bring", succeed()))
+    assert tracker.status == "starting"
+    asyncio.run(tracker.run("Mealie", succeed()))
+
+    assert tracker.status == "ready"
+    assert tracker.is_successful("Bring") is True
+    assert tracker.handshakes["Bring"].duration_seconds is not None
+
+
+def test_failed_handshake_degrades_status(caplog):
+    tracker = StartupTracker()
+    tracker.register("Bring")
+    tracker.register("Mealie")
+
+    asyncio.run(tracker.run("Bring", succeed()))
+    asyncio.run(tracker.run("Mealie", fail()))
+
+    assert tracker.status == "degraded"
+    assert tracker.is_successful("Mealie") is False
+    assert tracker.to_dict()["handshakes"]["Mealie"]["error"] == "Invalid Mealie URL or API key"
+    assert "Connecting to Mealie failed: Invalid Mealie URL or API key" in caplog.text
+
+
+def test_unregistered_handshake_is_not_successful():
+    assert StartupTracker().is_successful("Mealie") is False
+
+
+def test_failed_handshake_is_retried_until_it_succeeds(caplog):
+    tracker = StartupTracker()
+    tracker.register("Mealie")
+    connect = AsyncMock(side_effect=[RuntimeError("Mealie is down"), RuntimeError("Mealie is down"), None])
+
+    async def connect_and_retry() -> None:
+        await tracker.run("Mealie", connect())
+        assert tracker.status == "degraded"
+        await tracker.retry("Mealie", connect, 0.01)
+
+    asyncio.run(connect_and_retry())
+
+    assert tracker.status == "ready"
+    assert tracker.to_dict()["handshakes"]["Mealie"]["attempts"] == 3
+    assert tracker.to_dict()["handshakes"]["Mealie"]["error"] is None
+    assert "Retrying to connect to Mealie in 0.02s" in caplog.text
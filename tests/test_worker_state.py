@@ -0,0 +1,117 @@
+import pytest
+from source.worker_state import WorkerState
+
+
+@pytest.fixture
+def worker_state_file(tmp_path):
+    return str(tmp_path / "workers.sqlite3")
+
+
+@pytest.fixture
+def worker_states(worker_state_file):
+    first_worker, second_worker = WorkerState(worker_state_file, "1"), WorkerState(worker_state_file, "2")
+    yield first_worker, second_worker
+    first_worker.close()
+    second_worker.close()
+
+
+def test_schedule_move_returns_the_debounce(worker_states):
+    first_worker, _ = worker_states
+
+    assert first_worker.schedule_move("home-uuid", 2, 30) == pytest.approx(2, abs=0.1)
+
+
+def test_schedule_move_does_not_wait_longer_than_the_maximum(worker_states):
+    first_worker, second_worker = worker_states
+    first_worker.schedule_move("home-uuid", 2, 30)
+    first_worker.connection.execute("UPDATE move_debounce SET started_at = started_at - 29.5")
+
+    assert second_worker.schedule_move("home-uuid", 2, 30) == pytest.approx(0.5, abs=0.1)
+
+
+def test_claim_move_only_succeeds_once(worker_states):
+    first_worker, second_worker = worker_states
+    first_worker.schedule_move("home-uuid", 0, 30)
+
+    assert first_worker.claim_move("home-uuid") == pytest.approx(0, abs=0.1)
+    assert second_worker.claim_move("home-uuid") is None
+
+
+def test_claim_move_waits_for_a_later_change_at_another_worker(worker_states):
+    first_worker, second_worker = worker_states
+    first_worker.schedule_move("home-uuid", 0, 30)
+    second_worker.schedule_move("home-uuid", 60, 60)
+
+    assert first_worker.claim_move("home-uuid") is None
+    assert first_worker.claim_move("home-uuid", ignore_due_time=True) is not None
+    assert second_worker.claim_move("home-uuid") is None
+
+
+def test_moves_of_different_shopping_lists_are_claimed_independently(worker_states):
+    first_worker, second_worker = worker_states
+    first_worker.schedule_move("home-uuid", 0, 30)
+    second_worker.schedule_move(None, 0, 30)
+
+    assert second_worker.claim_move("home-uuid") is not None
+    assert first_worker.claim_move(None) is not None
+
+
+def test_pending_moves(worker_states):
+    first_worker, second_worker = worker_states
+    first_worker.schedule_move("home-uuid", 60, 60)
+    first_worker.schedule_move(None, 0, 60)
+
+    pending_moves = second_worker.pending_moves()
+
+    assert pending_moves.keys() == {"home-uuid", None}
+    assert pending_moves["home-uuid"] == pytest.approx(60, abs=0.1)
+    assert pending_moves[None] == 0
+
+
+def test_move_lease_excludes_other_workers_until_released(worker_states):
+    first_worker, second_worker = worker_states
+
+    assert first_worker.acquire_move_lease("home-uuid", 60)
+    assert not second_worker.acquire_move_lease("home-uuid", 60)
+    assert second_worker.acquire_move_lease("office-uuid", 60)
+
+    first_worker.release_move_lease("home-uuid")
+
+    assert second_worker.acquire_move_lease("home-uuid", 60)
+
+
+def test_move_lease_of_all_shopping_lists_excludes_every_other_move(worker_states):
+    first_worker, second_worker = worker_states
+
+    assert first_worker.acquire_move_lease(None, 60)
+    assert not second_worker.acquire_move_lease("home-uuid", 60)
+    first_worker.release_move_lease(None)
+    assert second_worker.acquire_move_lease("home-uuid", 60)
+    assert not first_worker.acquire_move_lease(None, 60)
+
+
+def test_expired_move_lease_is_taken_over(worker_states):
+    first_worker, second_worker = worker_states
+    first_worker.acquire_move_lease("home-uuid", -1)
+
+    assert second_worker.acquire_move_lease("home-uuid", 60)
+
+
+def test_release_move_lease_keeps_the_lease_of_other_workers(worker_states):
+    first_worker, second_worker = worker_states
+    first_worker.acquire_move_lease("home-uuid", 60)
+
+    second_worker.release_move_lease("home-uuid")
+
+    assert not second_worker.acquire_move_lease("home-uuid", 60)
+
+
+def test_clear_leases_keeps_pending_moves(worker_states):
+    first_worker, second_worker = worker_states
+    first_worker.schedule_move("home-uuid", 60, 60)
+    first_worker.acquire_move_lease("office-uuid", 60)
+
+    second_worker.clear_leases()
+
+    assert second_worker.acquire_move_lease("office-uuid", 60)
+    assert list(second_worker.pending_moves()) == ["home-uuid"]
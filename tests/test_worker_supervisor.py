@@ -0,0 +1,77 @@
+import signal
+from unittest.mock import MagicMock, patch
+
+import pytest
+from source.worker_supervisor import WorkerSupervisor
+
+
+@pytest.fixture
+def supervisor_environment(monkeypatch, tmp_path):
+    monkeypatch.setenv("HTTP_SERVER_MODE", "async")
+    monkeypatch.setenv("WORKER_STATE_FILE", str(tmp_path / "workers.sqlite3"))
+
+
+def create_worker(return_codes: list[int | None]) -> MagicMock:
+    worker = MagicMock()
+    worker.poll.side_effect = return_codes
+    worker.returncode = return_codes[-1]
+    return worker
+
+
+def run_supervisor(workers: list[MagicMock], monotonic_times: list[float]) -> tuple[int, MagicMock]:
+    with (
+        patch("source.worker_supervisor.subprocess.Popen", side_effect=workers) as mock_popen,
+        patch("source.worker_supervisor.signal.signal"),
+        patch("source.worker_supervisor.time.sleep"),
+        patch("source.worker_supervisor.time.monotonic", side_effect=monotonic_times),
+    ):
+        supervisor = WorkerSupervisor(2)
+        original_start_worker = supervisor._start_worker
+
+        def start_worker(worker_id: int) -> None:
+            original_start_worker(worker_id)
+            # Stops the supervisor after the first restart, so the test does not loop forever
+            if len(mock_popen.call_args_list) > 2:
+                supervisor._handle_stop_signal(signal.SIGTERM, None)
+
+        supervisor._start_worker = start_worker
+        return supervisor.run(), mock_popen
+
+
+def test_run_requires_the_async_server(monkeypatch, caplog):
+    monkeypatch.setenv("HTTP_SERVER_MODE", "flask")
+
+    with patch("source.worker_supervisor.subprocess.Popen") as mock_popen:
+        assert WorkerSupervisor(2).run() == 1
+
+    mock_popen.assert_not_called()
+    assert "HTTP_WORKERS requires HTTP_SERVER_MODE=async" in caplog.text
+
+
+def test_run_starts_workers_with_shared_state_and_restarts_crashed_ones(supervisor_environment, tmp_path):
+    crashed_worker = create_worker([-9, -9])
+    workers = [crashed_worker, create_worker([None, None]), create_worker([None])]
+
+    exit_code, mock_popen = run_supervisor(workers, monotonic_times=[0, 0, 60, 60])
+
+    assert exit_code == 0
+    assert mock_popen.call_count == 3
+    environments = [call.kwargs["env"] for call in mock_popen.call_args_list]
+    assert [environment["HTTP_WORKER_ID"] for environment in environments] == ["1", "2", "1"]
+    assert all(environment["HTTP_WORKERS"] == "1" for environment in environments)
+    assert all(environment["WORKER_STATE_FILE"] == str(tmp_path / "workers.sqlite3") for environment in environments)
+    workers[1].send_signal.assert_called_once_with(signal.SIGTERM)
+
+
+def test_run_stops_if_a_worker_fails_during_its_startup(supervisor_environment, caplog):
+    failed_worker = create_worker([1, 1])
+    running_worker = create_worker([None, None])
+
+    exit_code, mock_popen = run_supervisor([failed_worker, running_worker], monotonic_times=[0, 0, 1])
+
+    assert exit_code == 1
+    assert mock_popen.call_count == 2
+    failed_worker.send_signal.assert_not_called()
+    running_worker.send_signal.assert_called_once_with(signal.SIGTERM)
+    running_worker.wait.assert_called_once()
+    assert "Worker 1 exited during its startup with code 1" in caplog.text